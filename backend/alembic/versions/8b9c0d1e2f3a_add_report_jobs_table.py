@@ -0,0 +1,53 @@
+"""add_report_jobs_table
+
+Revision ID: 8b9c0d1e2f3a
+Revises: 7a8b9c0d1e2f
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8b9c0d1e2f3a'
+down_revision = '7a8b9c0d1e2f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('report_jobs',
+    sa.Column('job_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('requested_by_user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('report_type', sa.String(length=50), nullable=False),
+    sa.Column('report_format', sa.String(length=20), nullable=False),
+    sa.Column('parameters', sa.JSON(), nullable=True),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'EXPIRED', name='report_job_status'), nullable=False),
+    sa.Column('progress_percent', sa.Integer(), nullable=True),
+    sa.Column('rows_processed', sa.Integer(), nullable=True),
+    sa.Column('file_path', sa.String(length=500), nullable=True),
+    sa.Column('file_name', sa.String(length=255), nullable=True),
+    sa.Column('file_size_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('queue_wait_ms', sa.Integer(), nullable=True),
+    sa.Column('render_ms', sa.Integer(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['requested_by_user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index('idx_report_jobs_user', 'report_jobs', ['requested_by_user_id'], unique=False)
+    op.create_index('idx_report_jobs_status', 'report_jobs', ['status'], unique=False)
+    op.create_index('idx_report_jobs_expires', 'report_jobs', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_report_jobs_expires', table_name='report_jobs')
+    op.drop_index('idx_report_jobs_status', table_name='report_jobs')
+    op.drop_index('idx_report_jobs_user', table_name='report_jobs')
+    op.drop_table('report_jobs')
+    op.execute("DROP TYPE IF EXISTS report_job_status")
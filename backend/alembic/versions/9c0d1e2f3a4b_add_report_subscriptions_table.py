@@ -0,0 +1,57 @@
+"""add_report_subscriptions_table
+
+Revision ID: 9c0d1e2f3a4b
+Revises: 8b9c0d1e2f3a
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9c0d1e2f3a4b'
+down_revision = '8b9c0d1e2f3a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Subscriptions are delivered as in-app alerts of this type
+    op.execute("ALTER TYPE alert_type ADD VALUE IF NOT EXISTS 'REPORT_READY'")
+    
+    op.create_table('report_subscriptions',
+    sa.Column('subscription_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('created_by_user_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('report_type', sa.String(length=50), nullable=False),
+    sa.Column('report_format', sa.String(length=20), nullable=False),
+    sa.Column('parameters', sa.JSON(), nullable=True),
+    sa.Column('lookback_days', sa.Integer(), nullable=True),
+    sa.Column('cadence', sa.Enum('DAILY', 'WEEKLY', 'MONTHLY', name='report_subscription_cadence'), nullable=False),
+    sa.Column('recipient_user_ids', postgresql.ARRAY(postgresql.UUID(as_uuid=True)), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('next_run_at', sa.DateTime(), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(), nullable=True),
+    sa.Column('last_status', sa.String(length=20), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('file_path', sa.String(length=500), nullable=True),
+    sa.Column('file_name', sa.String(length=255), nullable=True),
+    sa.Column('file_size_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('rows_rendered', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by_user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('subscription_id')
+    )
+    op.create_index('idx_report_subscriptions_due', 'report_subscriptions', ['is_active', 'next_run_at'], unique=False)
+    op.create_index('idx_report_subscriptions_user', 'report_subscriptions', ['created_by_user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_report_subscriptions_user', table_name='report_subscriptions')
+    op.drop_index('idx_report_subscriptions_due', table_name='report_subscriptions')
+    op.drop_table('report_subscriptions')
+    op.execute("DROP TYPE IF EXISTS report_subscription_cadence")
+    # Note: REPORT_READY stays in the alert_type enum (PostgreSQL can't drop enum values)
@@ -0,0 +1,51 @@
+"""add_background_jobs_table
+
+Revision ID: ad1e2f3a4b5c
+Revises: 9c0d1e2f3a4b
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'ad1e2f3a4b5c'
+down_revision = '9c0d1e2f3a4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('background_jobs',
+    sa.Column('job_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('queue', sa.String(length=50), nullable=False),
+    sa.Column('job_type', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED', name='background_job_status'), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('dedupe_key', sa.String(length=255), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('locked_by', sa.String(length=255), nullable=True),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_index('idx_background_jobs_ready', 'background_jobs', ['queue', 'priority', 'run_at'], unique=False, postgresql_where=sa.text("status = 'QUEUED'"))
+    op.create_index('idx_background_jobs_status', 'background_jobs', ['status'], unique=False)
+    op.create_index('idx_background_jobs_dedupe', 'background_jobs', ['dedupe_key'], unique=True, postgresql_where=sa.text("status = 'QUEUED'"))
+
+
+def downgrade() -> None:
+    op.drop_index('idx_background_jobs_dedupe', table_name='background_jobs')
+    op.drop_index('idx_background_jobs_status', table_name='background_jobs')
+    op.drop_index('idx_background_jobs_ready', table_name='background_jobs')
+    op.drop_table('background_jobs')
+    op.execute("DROP TYPE IF EXISTS background_job_status")
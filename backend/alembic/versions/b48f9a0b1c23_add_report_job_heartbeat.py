@@ -0,0 +1,27 @@
+"""add_report_job_heartbeat
+
+Revision ID: b48f9a0b1c23
+Revises: a37e8f9a0b12
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b48f9a0b1c23'
+down_revision = 'a37e8f9a0b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Report job liveness and progress estimate (see services/report_jobs.py)
+    op.add_column('report_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.add_column('report_jobs', sa.Column('rows_estimated', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('report_jobs', 'rows_estimated')
+    op.drop_column('report_jobs', 'heartbeat_at')
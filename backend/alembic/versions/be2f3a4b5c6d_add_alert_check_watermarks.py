@@ -0,0 +1,41 @@
+"""add_alert_check_watermarks
+
+Revision ID: be2f3a4b5c6d
+Revises: ad1e2f3a4b5c
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'be2f3a4b5c6d'
+down_revision = 'ad1e2f3a4b5c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('alert_check_watermarks',
+    sa.Column('check_name', sa.String(length=50), nullable=False),
+    sa.Column('last_run_at', sa.DateTime(), nullable=False),
+    sa.Column('last_full_sweep_at', sa.DateTime(), nullable=True),
+    sa.Column('last_created', sa.Integer(), nullable=True),
+    sa.Column('last_duration_ms', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('check_name')
+    )
+    
+    # Incremental alert checks filter on what changed since the watermark
+    op.create_index('idx_buildings_updated_at', 'buildings', ['updated_at'], unique=False)
+    op.create_index('idx_tasks_updated_at', 'tasks', ['updated_at'], unique=False)
+    op.create_index('idx_signatures_status_created', 'document_signatures', ['signature_status', 'created_at'], unique=False)
+    op.create_index('idx_signatures_updated_at', 'document_signatures', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_signatures_updated_at', table_name='document_signatures')
+    op.drop_index('idx_signatures_status_created', table_name='document_signatures')
+    op.drop_index('idx_tasks_updated_at', table_name='tasks')
+    op.drop_index('idx_buildings_updated_at', table_name='buildings')
+    op.drop_table('alert_check_watermarks')
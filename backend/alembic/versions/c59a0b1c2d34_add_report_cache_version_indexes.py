@@ -0,0 +1,31 @@
+"""add_report_cache_version_indexes
+
+Revision ID: c59a0b1c2d34
+Revises: b48f9a0b1c23
+Create Date: 2026-10-19 21:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c59a0b1c2d34'
+down_revision = 'b48f9a0b1c23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Index-backed MAX(updated_at/created_at) for the report cache version stamp
+    op.create_index('idx_owners_updated_at', 'owners', ['updated_at'], unique=False)
+    op.create_index('idx_interactions_created_at', 'interactions_log', ['created_at'], unique=False)
+    op.create_index('idx_projects_updated_at', 'projects', ['updated_at'], unique=False)
+    op.create_index('idx_users_updated_at', 'users', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_users_updated_at', table_name='users')
+    op.drop_index('idx_projects_updated_at', table_name='projects')
+    op.drop_index('idx_interactions_created_at', table_name='interactions_log')
+    op.drop_index('idx_owners_updated_at', table_name='owners')
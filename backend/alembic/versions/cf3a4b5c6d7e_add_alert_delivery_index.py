@@ -0,0 +1,25 @@
+"""add_alert_delivery_index
+
+Revision ID: cf3a4b5c6d7e
+Revises: be2f3a4b5c6d
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cf3a4b5c6d7e'
+down_revision = 'be2f3a4b5c6d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Alerts waiting for the delivery pipeline
+    op.create_index('idx_alerts_undelivered', 'alerts', ['created_at'], unique=False, postgresql_where=sa.text("status = 'ACTIVE' AND delivered_at IS NULL"))
+
+
+def downgrade() -> None:
+    op.drop_index('idx_alerts_undelivered', table_name='alerts')
@@ -0,0 +1,52 @@
+"""add_alert_inbox_counters
+
+Revision ID: d04b5c6d7e8f
+Revises: cf3a4b5c6d7e
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd04b5c6d7e8f'
+down_revision = 'cf3a4b5c6d7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('alert_inbox_counters',
+    sa.Column('inbox_key', sa.String(length=64), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('inbox_key')
+    )
+    
+    # Seed the counters from the current ACTIVE alerts (see services/alert_inbox.py)
+    op.execute("""
+        INSERT INTO alert_inbox_counters (inbox_key, unread_count, updated_at)
+        SELECT inbox_key, count(*), now() AT TIME ZONE 'UTC'
+        FROM (
+            SELECT 'ALL' AS inbox_key, a.alert_id
+            FROM alerts a
+            WHERE a.status = 'ACTIVE'
+            UNION
+            SELECT CAST(a.agent_id AS VARCHAR), a.alert_id
+            FROM alerts a
+            JOIN users u ON u.user_id = a.agent_id
+            WHERE a.status = 'ACTIVE' AND u.role = 'AGENT'
+            UNION
+            SELECT CAST(b.assigned_agent_id AS VARCHAR), a.alert_id
+            FROM alerts a
+            JOIN buildings b ON b.building_id = a.building_id
+            JOIN users u ON u.user_id = b.assigned_agent_id
+            WHERE a.status = 'ACTIVE' AND u.role = 'AGENT'
+        ) memberships
+        GROUP BY inbox_key
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('alert_inbox_counters')
@@ -0,0 +1,30 @@
+"""add_alert_delivery_attempts
+
+Revision ID: d6ab1c2d3e45
+Revises: c59a0b1c2d34
+Create Date: 2026-10-19 21:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6ab1c2d3e45'
+down_revision = 'c59a0b1c2d34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Alert delivery retries with backoff (see services/alert_delivery.py)
+    op.add_column('alerts', sa.Column('delivery_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('alerts', sa.Column('next_delivery_at', sa.DateTime(), nullable=True))
+    op.add_column('alerts', sa.Column('delivered_to', postgresql.ARRAY(sa.String()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('alerts', 'delivered_to')
+    op.drop_column('alerts', 'next_delivery_at')
+    op.drop_column('alerts', 'delivery_attempts')
@@ -0,0 +1,32 @@
+"""add_signature_approval_claims
+
+Revision ID: e15c6d7e8f90
+Revises: d04b5c6d7e8f
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e15c6d7e8f90'
+down_revision = 'd04b5c6d7e8f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Approval queue claims (see services/signature_approval.py)
+    op.add_column('document_signatures', sa.Column('claimed_by_user_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('document_signatures', sa.Column('claim_expires_at', sa.DateTime(), nullable=True))
+    op.create_foreign_key('fk_signatures_claimed_by_user', 'document_signatures', 'users', ['claimed_by_user_id'], ['user_id'])
+    op.create_index('idx_signatures_pending_approval', 'document_signatures', ['signed_at'], unique=False, postgresql_where=sa.text("signature_status = 'SIGNED_PENDING_APPROVAL'"))
+
+
+def downgrade() -> None:
+    op.drop_index('idx_signatures_pending_approval', table_name='document_signatures')
+    op.drop_constraint('fk_signatures_claimed_by_user', 'document_signatures', type_='foreignkey')
+    op.drop_column('document_signatures', 'claim_expires_at')
+    op.drop_column('document_signatures', 'claimed_by_user_id')
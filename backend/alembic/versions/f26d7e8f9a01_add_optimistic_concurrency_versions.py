@@ -0,0 +1,29 @@
+"""add_optimistic_concurrency_versions
+
+Revision ID: f26d7e8f9a01
+Revises: e15c6d7e8f90
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f26d7e8f9a01'
+down_revision = 'e15c6d7e8f90'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ['owners', 'units', 'buildings', 'document_signatures']
+
+
+def upgrade() -> None:
+    # Row versions for ETag / If-Match (see app/api/concurrency.py)
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.drop_column(table, 'version')
@@ -0,0 +1,75 @@
+"""
+Optimistic Concurrency (ETag / If-Match)
+Owners, units, buildings and signatures carry a version that writes through
+the API advance. Responses send it as the ETag. A write that sends If-Match is
+only applied if the row is still at that version, and fails with 409 Conflict
+otherwise, so a retried or racing request never overwrites changes its client
+has not seen. Writes without If-Match behave as before.
+
+Derived fields (unit status, signature counts, majority rollups) are
+recalculated in place and do not advance the version.
+"""
+from typing import Optional
+from fastapi import HTTPException, Response, status
+from sqlalchemy import inspect, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+
+def etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def set_etag(response: Response, entity) -> None:
+    response.headers["ETag"] = etag(entity.version)
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """The version an If-Match header expects, or None if it is absent or *"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.split(",")[0].strip()  # We only ever issue one tag per resource
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid If-Match header: {if_match}"
+        )
+
+
+def version_conflict(name: str, current_version: Optional[int]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"{name} was modified by another request; reload it and retry",
+        headers={"ETag": etag(current_version)} if current_version is not None else None
+    )
+
+
+def advance_version(db: Session, entity, expected: Optional[int], name: str) -> int:
+    """
+    Move the entity's row to its next version, checking first that it is still
+    at `expected` (when given); raises 409 if it is not.
+    
+    Compare and increment are one UPDATE, which also holds the row until the
+    caller commits its change, so call this before modifying the entity.
+    Returns the new version.
+    """
+    state = inspect(entity)
+    model = state.mapper.class_
+    key = state.mapper.primary_key[0]
+    statement = update(model).where(key == state.identity[0]).values(version=model.version + 1)
+    if expected is not None:
+        statement = statement.where(model.version == expected)
+    
+    new_version = db.execute(
+        statement.returning(model.version).execution_options(synchronize_session=False)
+    ).scalar()
+    if new_version is None:
+        current_version = db.execute(select(model.version).where(key == state.identity[0])).scalar()
+        raise version_conflict(name, current_version)
+    
+    set_committed_value(entity, "version", new_version)
+    return new_version
@@ -3,8 +3,20 @@ API Middleware
 """
 import uuid
 import time
+from typing import Optional
 from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Scope, Receive, Send, Message
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.security import decode_token
+from app.services.idempotency import (
+    request_fingerprint, begin_request, complete_request, abandon_request,
+    REPLAY, IN_PROGRESS, MISMATCH
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -68,3 +80,152 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
             )
             raise
 
+
+class IdempotencyMiddleware:
+    """
+    Replay the stored response when a POST/PUT/PATCH is retried with the same
+    Idempotency-Key header (see services/idempotency.py)
+    
+    Keys are scoped to the authenticated user; requests without a key or a
+    valid bearer token pass through untouched. Reusing a key for a different
+    request gets 422, and a retry while the first request is still running
+    gets 409. Server errors are not stored, so those requests can be retried.
+    """
+    
+    METHODS = {"POST", "PUT", "PATCH"}
+    MAX_KEY_LENGTH = 255
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    @staticmethod
+    def _user_id(headers: Headers) -> Optional[uuid.UUID]:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        payload = decode_token(token)
+        try:
+            return uuid.UUID(payload["sub"]) if payload and payload.get("sub") else None
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _with_session(function, *args):
+        db = SessionLocal()
+        try:
+            return function(db, *args)
+        finally:
+            db.close()
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in self.METHODS:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        user_id = self._user_id(headers) if key else None
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > self.MAX_KEY_LENGTH:
+            response = JSONResponse(
+                status_code=400,
+                content={"detail": f"Idempotency-Key must be at most {self.MAX_KEY_LENGTH} characters"}
+            )
+            await response(scope, receive, send)
+            return
+        
+        # Buffer the body so it can be fingerprinted and then handed to the app
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        # Multipart boundaries change between retries of the same upload, so only the route is compared
+        compared_body = None if headers.get("content-type", "").startswith("multipart/") else body
+        fingerprint = request_fingerprint(scope["method"], scope["path"], scope.get("query_string", b"").decode(), compared_body)
+        
+        try:
+            outcome, record = await run_in_threadpool(self._with_session, begin_request, user_id, key, fingerprint)
+        except Exception as e:
+            # Don't block writes when the key store is unavailable
+            logger.error(f"Idempotency key lookup failed, running request without it: {e}", exc_info=True)
+            outcome, record = None, None
+            user_id = None
+        
+        if outcome == REPLAY:
+            response = Response(
+                content=record.response_body or b"",
+                status_code=record.response_status_code,
+                headers={**(record.response_headers or {}), "Idempotent-Replayed": "true"}
+            )
+            await response(scope, receive, send)
+            return
+        if outcome == IN_PROGRESS:
+            response = JSONResponse(
+                status_code=409,
+                content={"detail": "A request with this Idempotency-Key is still being processed"},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        if outcome == MISMATCH:
+            response = JSONResponse(
+                status_code=422,
+                content={"detail": "Idempotency-Key was already used for a different request"}
+            )
+            await response(scope, receive, send)
+            return
+        
+        body_delivered = False
+        
+        async def receive_buffered() -> Message:
+            nonlocal body_delivered
+            if not body_delivered:
+                body_delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+        
+        captured = {"status": None, "headers": {}, "chunks": [], "size": 0, "too_large": False}
+        
+        async def send_captured(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = {
+                    name.decode("latin-1").lower(): value.decode("latin-1")
+                    for name, value in message.get("headers", [])
+                }
+            elif message["type"] == "http.response.body" and not captured["too_large"]:
+                chunk = message.get("body", b"")
+                captured["size"] += len(chunk)
+                if captured["size"] > settings.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+                    captured["too_large"] = True
+                    captured["chunks"] = []
+                else:
+                    captured["chunks"].append(chunk)
+            await send(message)
+        
+        if user_id is None:
+            await self.app(scope, receive_buffered, send)
+            return
+        
+        try:
+            await self.app(scope, receive_buffered, send_captured)
+        except Exception:
+            await run_in_threadpool(self._with_session, abandon_request, user_id, key)
+            raise
+        
+        try:
+            if captured["status"] is None or captured["status"] >= 500 or captured["too_large"]:
+                await run_in_threadpool(self._with_session, abandon_request, user_id, key)
+            else:
+                await run_in_threadpool(
+                    self._with_session, complete_request, user_id, key,
+                    captured["status"], captured["headers"], b"".join(captured["chunks"])
+                )
+        except Exception as e:
+            # The response was already sent; a retry will run the request again
+            logger.error(f"Could not store idempotent response: {e}", exc_info=True)
@@ -3,11 +3,11 @@ Alerts API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_
+from sqlalchemy import desc, and_, or_, update, true
 from datetime import datetime, timedelta, date
 from typing import Optional, List
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import logging
 
 from app.core.database import get_db
@@ -19,6 +19,10 @@ from app.models.document import DocumentSignature
 from app.models.interaction import Interaction
 from app.api.dependencies import get_current_user
 from app.services.alert_engine import run_alert_checks
+from app.services.alert_rules import compile_rule, AlertRuleError, RULE_ENTITIES
+from app.services.alert_inbox import get_unread_count, remove_unread
+from app.services.alert_delivery import DELIVERY_CHANNELS
+from app.services.job_queue import enqueue_job
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/alerts", tags=["alerts"])
@@ -53,6 +57,87 @@ class AlertResolveRequest(BaseModel):
     resolution_notes: Optional[str] = None
 
 
+class AlertBulkRequest(BaseModel):
+    alert_ids: List[str] = Field(..., min_length=1, max_length=500)
+
+
+class AlertRuleRequest(BaseModel):
+    rule_name: str
+    rule_type: str
+    condition_logic: dict = Field(..., description="Condition tree, see app/services/alert_rules.py")
+    severity: str = "MEDIUM"
+    delivery_channels: List[str] = ["IN_APP"]
+    is_active: bool = True
+
+
+class AlertRuleResponse(BaseModel):
+    rule_id: str
+    rule_name: str
+    rule_type: str
+    condition_logic: Optional[dict] = None
+    severity: Optional[str] = None
+    delivery_channels: Optional[List[str]] = None
+    is_active: bool
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+
+def _rule_response(rule: AlertRule) -> AlertRuleResponse:
+    return AlertRuleResponse(
+        rule_id=str(rule.rule_id),
+        rule_name=rule.rule_name,
+        rule_type=rule.rule_type,
+        condition_logic=rule.condition_logic,
+        severity=rule.severity,
+        delivery_channels=rule.delivery_channels,
+        is_active=bool(rule.is_active),
+        created_at=rule.created_at.isoformat() if rule.created_at else None,
+        updated_at=rule.updated_at.isoformat() if rule.updated_at else None
+    )
+
+
+def _apply_rule_request(rule: AlertRule, request: AlertRuleRequest) -> None:
+    """Copy the request onto the rule, rejecting conditions that don't compile"""
+    if request.rule_type not in RULE_ENTITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"rule_type must be one of: {', '.join(RULE_ENTITIES)}"
+        )
+    if request.severity not in ("LOW", "MEDIUM", "HIGH", "CRITICAL"):
+        raise HTTPException(status_code=400, detail="severity must be LOW, MEDIUM, HIGH or CRITICAL")
+    unknown_channels = [channel for channel in request.delivery_channels if channel not in DELIVERY_CHANNELS]
+    if unknown_channels:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown delivery channels: {', '.join(unknown_channels)} (use {', '.join(DELIVERY_CHANNELS)})"
+        )
+    
+    rule.rule_name = request.rule_name
+    rule.rule_type = request.rule_type
+    rule.condition_logic = request.condition_logic
+    rule.severity = request.severity
+    rule.delivery_channels = request.delivery_channels or ["IN_APP"]
+    rule.is_active = request.is_active
+    try:
+        compile_rule(rule)
+    except AlertRuleError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid condition_logic: {e}")
+
+
+def _visible_to(db: Session, current_user: User):
+    """Filter for the alerts a user can see: agents see their own and their buildings' alerts"""
+    if current_user.role != "AGENT":
+        return true()
+    return or_(
+        Alert.agent_id == current_user.user_id,
+        Alert.building_id.in_(
+            db.query(Building.building_id).filter(
+                Building.assigned_agent_id == current_user.user_id
+            )
+        )
+    )
+
+
 @router.get("", response_model=List[AlertResponse])
 async def get_alerts(
     status: Optional[str] = Query(None, description="Filter by status: ACTIVE, ACKNOWLEDGED, RESOLVED, DISMISSED"),
@@ -124,7 +209,18 @@ async def get_alert_count(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get count of alerts (default: ACTIVE alerts)"""
+    """
+    Get count of alerts (default: ACTIVE alerts)
+    
+    The ACTIVE count is read from the user's inbox counter; other statuses are
+    counted from the alerts table.
+    """
+    if status == "ACTIVE":
+        return {
+            "count": get_unread_count(db, current_user),
+            "status": status
+        }
+    
     query = db.query(Alert)
     
     # Role-based filtering
@@ -204,6 +300,73 @@ async def get_alert_history(
     ]
 
 
+def _bulk_transition(
+    db: Session,
+    current_user: User,
+    alert_ids: List[str],
+    from_statuses: List[str],
+    to_status: str
+) -> dict:
+    """
+    Move the given alerts the user can see from `from_statuses` to `to_status`
+    in one transaction, keeping the inbox counters in step
+    
+    Rows are locked in alert_id order so concurrent bulk calls can't deadlock.
+    """
+    try:
+        ids = sorted({UUID(alert_id) for alert_id in alert_ids})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid alert id")
+    
+    locked = db.query(Alert.alert_id, Alert.status).filter(
+        Alert.alert_id.in_(ids),
+        Alert.status.in_(from_statuses),
+        _visible_to(db, current_user)
+    ).order_by(Alert.alert_id).with_for_update().all()
+    
+    now = datetime.utcnow()
+    updated_ids = [alert_id for alert_id, _ in locked]
+    if updated_ids:
+        remove_unread(db, [alert_id for alert_id, status in locked if status == "ACTIVE"])
+        db.execute(
+            update(Alert)
+            .where(Alert.alert_id.in_(updated_ids))
+            .values(status=to_status, acknowledged_by_user_id=current_user.user_id, acknowledged_at=now, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    
+    logger.info(f"{len(updated_ids)} alerts set to {to_status} by user {current_user.user_id}")
+    
+    return {
+        "status": to_status,
+        "updated": len(updated_ids),
+        "alert_ids": [str(alert_id) for alert_id in updated_ids],
+        "skipped": len(ids) - len(updated_ids),
+        "unread_count": get_unread_count(db, current_user)
+    }
+
+
+@router.post("/acknowledge")
+async def acknowledge_alerts(
+    request: AlertBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Acknowledge several ACTIVE alerts at once; alerts the user can't see or that aren't ACTIVE are skipped"""
+    return _bulk_transition(db, current_user, request.alert_ids, ["ACTIVE"], "ACKNOWLEDGED")
+
+
+@router.post("/dismiss")
+async def dismiss_alerts(
+    request: AlertBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Dismiss several alerts at once; resolved alerts and alerts the user can't see are skipped"""
+    return _bulk_transition(db, current_user, request.alert_ids, ["ACTIVE", "ACKNOWLEDGED"], "DISMISSED")
+
+
 @router.post("/{alert_id}/acknowledge")
 async def acknowledge_alert(
     alert_id: str,
@@ -212,7 +375,7 @@ async def acknowledge_alert(
     current_user: User = Depends(get_current_user)
 ):
     """Acknowledge an alert"""
-    alert = db.query(Alert).filter(Alert.alert_id == UUID(alert_id)).first()
+    alert = db.query(Alert).filter(Alert.alert_id == UUID(alert_id)).with_for_update().first()
     
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
@@ -228,6 +391,7 @@ async def acknowledge_alert(
             if not building or building.assigned_agent_id != current_user.user_id:
                 raise HTTPException(status_code=403, detail="Not authorized to acknowledge this alert")
     
+    remove_unread(db, [alert.alert_id])
     alert.status = "ACKNOWLEDGED"
     alert.acknowledged_by_user_id = current_user.user_id
     alert.acknowledged_at = datetime.utcnow()
@@ -252,7 +416,7 @@ async def resolve_alert(
     current_user: User = Depends(get_current_user)
 ):
     """Resolve an alert"""
-    alert = db.query(Alert).filter(Alert.alert_id == UUID(alert_id)).first()
+    alert = db.query(Alert).filter(Alert.alert_id == UUID(alert_id)).with_for_update().first()
     
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
@@ -264,6 +428,8 @@ async def resolve_alert(
     if current_user.role not in ["SUPER_ADMIN", "PROJECT_MANAGER"]:
         raise HTTPException(status_code=403, detail="Only managers can resolve alerts")
     
+    if alert.status == "ACTIVE":
+        remove_unread(db, [alert.alert_id])
     alert.status = "RESOLVED"
     alert.resolved_by_user_id = current_user.user_id
     alert.resolved_at = datetime.utcnow()
@@ -289,7 +455,7 @@ async def dismiss_alert(
     current_user: User = Depends(get_current_user)
 ):
     """Dismiss an alert (mark as dismissed)"""
-    alert = db.query(Alert).filter(Alert.alert_id == UUID(alert_id)).first()
+    alert = db.query(Alert).filter(Alert.alert_id == UUID(alert_id)).with_for_update().first()
     
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
@@ -297,6 +463,8 @@ async def dismiss_alert(
     if alert.status == "RESOLVED":
         raise HTTPException(status_code=400, detail="Cannot dismiss a resolved alert")
     
+    if alert.status == "ACTIVE":
+        remove_unread(db, [alert.alert_id])
     alert.status = "DISMISSED"
     alert.acknowledged_by_user_id = current_user.user_id
     alert.acknowledged_at = datetime.utcnow()
@@ -313,8 +481,72 @@ async def dismiss_alert(
     }
 
 
+@router.get("/rules", response_model=List[AlertRuleResponse])
+async def get_alert_rules(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List alert rules (admin/manager only)"""
+    if current_user.role not in ["SUPER_ADMIN", "PROJECT_MANAGER"]:
+        raise HTTPException(status_code=403, detail="Only managers can view alert rules")
+    
+    rules = db.query(AlertRule).order_by(AlertRule.rule_type, AlertRule.rule_name).all()
+    return [_rule_response(rule) for rule in rules]
+
+
+@router.post("/rules", response_model=AlertRuleResponse, status_code=201)
+async def create_alert_rule(
+    request: AlertRuleRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create an alert rule (admin/manager only)
+    
+    Active rules of a type replace the built-in check for that type on the
+    next alert run.
+    """
+    if current_user.role not in ["SUPER_ADMIN", "PROJECT_MANAGER"]:
+        raise HTTPException(status_code=403, detail="Only managers can manage alert rules")
+    
+    rule = AlertRule(created_by_user_id=current_user.user_id)
+    _apply_rule_request(rule, request)
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    
+    logger.info(f"Alert rule {rule.rule_id} created by user {current_user.user_id}")
+    return _rule_response(rule)
+
+
+@router.put("/rules/{rule_id}", response_model=AlertRuleResponse)
+async def update_alert_rule(
+    rule_id: str,
+    request: AlertRuleRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Update an alert rule (admin/manager only); its cached compilation is dropped"""
+    if current_user.role not in ["SUPER_ADMIN", "PROJECT_MANAGER"]:
+        raise HTTPException(status_code=403, detail="Only managers can manage alert rules")
+    
+    rule = db.query(AlertRule).filter(AlertRule.rule_id == UUID(rule_id)).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    
+    _apply_rule_request(rule, request)
+    rule.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(rule)
+    
+    logger.info(f"Alert rule {rule_id} updated by user {current_user.user_id}")
+    return _rule_response(rule)
+
+
 @router.post("/check")
 async def trigger_alert_checks(
+    background: bool = Query(False, description="Queue the checks for a job worker instead of running them now"),
+    full: bool = Query(False, description="Re-evaluate every entity instead of only those changed since the last run"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -322,8 +554,20 @@ async def trigger_alert_checks(
     if current_user.role not in ["SUPER_ADMIN", "PROJECT_MANAGER"]:
         raise HTTPException(status_code=403, detail="Only managers can trigger alert checks")
     
+    if background:
+        job_id = enqueue_job(
+            db,
+            "alerts.run_checks",
+            payload={"full": full},
+            dedupe_key="alerts.run_checks:full" if full else "alerts.run_checks"
+        )
+        return {
+            "message": "Alert checks queued",
+            "job_id": str(job_id)
+        }
+    
     try:
-        result = run_alert_checks(db)
+        result = run_alert_checks(db, full_sweep=full)
         return {
             "message": "Alert checks completed",
             "result": result
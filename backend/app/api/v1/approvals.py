@@ -2,10 +2,10 @@
 Approval Workflow API endpoints
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Header, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
 from pathlib import Path
@@ -15,6 +15,8 @@ from app.models.user import User
 from app.models.document import DocumentSignature, Document
 from app.models.owner import Owner
 from app.api.dependencies import get_current_user, require_role
+from app.api.concurrency import parse_if_match, set_etag, advance_version
+from app.services.signature_approval import decide_signatures, claim_signatures, release_claims, APPROVE, REJECT
 import logging
 import uuid
 
@@ -36,6 +38,29 @@ class ApprovalRequest(BaseModel):
     reason: Optional[str] = None  # Optional for approval, required for rejection
 
 
+class ClaimReleaseRequest(BaseModel):
+    signature_ids: Optional[List[str]] = None  # Default: all of the user's claims
+
+
+class SignatureBatchRequest(BaseModel):
+    signature_ids: List[str] = Field(..., min_length=1, max_length=200)
+    reason: Optional[str] = None  # Optional for approval, required for rejection
+
+
+class SignatureBatchResult(BaseModel):
+    signature_id: str
+    success: bool
+    signature_status: Optional[str] = None
+    error: Optional[str] = None
+
+
+class SignatureBatchResponse(BaseModel):
+    results: List[SignatureBatchResult]
+    processed: int
+    failed: int
+    buildings_recalculated: int
+
+
 class SignatureResponse(BaseModel):
     signature_id: str
     document_id: str
@@ -48,6 +73,9 @@ class SignatureResponse(BaseModel):
     task_id: Optional[str] = None
     signed_document_id: Optional[str] = None
     signed_document_name: Optional[str] = None
+    claimed_by_user_id: Optional[str] = None
+    claim_expires_at: Optional[datetime] = None
+    version: Optional[int] = None  # Send as If-Match to approve/reject
     
     class Config:
         from_attributes = True
@@ -164,6 +192,7 @@ async def initiate_signature(
     db.flush()  # Flush to get signature_id
     
     # Update owner status
+    advance_version(db, owner, None, "Owner")
     owner.owner_status = "WAIT_FOR_SIGN"
     owner.signature_session_id = signature.signature_id
     
@@ -178,7 +207,6 @@ async def initiate_signature(
                 owner_id=UUID(owner_id),
                 building_id=unit.building_id,
                 requested_by_agent_id=current_user.user_id,
-                signature_id=signature.signature_id,
                 db=db
             )
             # Link signature to task (bidirectional)
@@ -214,6 +242,7 @@ async def initiate_signature(
         task_id=str(signature.task_id) if signature.task_id else None,
         signed_document_id=str(signature.signed_document_id) if signature.signed_document_id else None,
         signed_document_name=signed_document_name,
+        version=signature.version,
     )
 
 
@@ -245,6 +274,7 @@ async def get_waiting_signatures(
             signed_at=s.signed_at,
             approved_at=s.approved_at,
             created_at=s.created_at,
+            version=s.version,
         )
         for s in signatures
     ]
@@ -323,20 +353,26 @@ async def sign_document_by_token(
             detail="Invalid signing token"
         )
     
+    # Advance the owner, then the signature (the lock order of the approval
+    # queue); a concurrent signing of the same token fails with 409
+    owner = db.query(Owner).filter(Owner.owner_id == signature.owner_id).first()
+    if owner:
+        advance_version(db, owner, None, "Owner")
+    advance_version(db, signature, signature.version, "Signature")
+    
     # Update signature
     signature.signature_status = "SIGNED_PENDING_APPROVAL"
     signature.signature_data = sign_data.signature_data
     signature.signed_at = datetime.utcnow()
     
     # Update owner status
-    owner = db.query(Owner).filter(Owner.owner_id == signature.owner_id).first()
     if owner:
         owner.owner_status = "SIGNED"
         owner.signature_date = datetime.utcnow().date()
         
-        # Update unit status based on all owners
-        from app.services.unit_status import update_unit_status
-        update_unit_status(str(owner.unit_id), db)
+        # Queue recalculation of the unit status (based on all owners) and its rollups
+        from app.services.signature_approval import queue_recalculation
+        queue_recalculation(db, {owner.unit_id})
     
     db.commit()
     db.refresh(signature)
@@ -359,6 +395,7 @@ async def sign_document_by_token(
         signed_at=signature.signed_at,
         approved_at=signature.approved_at,
         created_at=signature.created_at,
+        version=signature.version,
     )
 
 
@@ -366,11 +403,27 @@ async def sign_document_by_token(
 async def get_approval_queue(
     owner_id: Optional[UUID] = Query(None),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Default 50, or APPROVAL_CLAIM_BATCH_SIZE when claiming"),
+    claim: bool = Query(False, description="Claim a batch of the queue for the current manager"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get approval queue (signatures pending manager approval)"""
+    """Get approval queue (signatures pending manager approval)
+    
+    With claim=true a manager gets a batch (up to `limit`, default
+    APPROVAL_CLAIM_BATCH_SIZE) leased to them for APPROVAL_CLAIM_LEASE_SECONDS:
+    managers claiming concurrently get disjoint batches, and only the claim
+    holder can approve or reject a claimed signature until the lease expires.
+    """
+    if claim:
+        if current_user.role not in ["SUPER_ADMIN", "PROJECT_MANAGER"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only managers and admins can claim approvals"
+            )
+        signatures = claim_signatures(db, current_user, limit=limit, owner_id=owner_id)
+        return _queue_response(signatures, db)
+    
     query = db.query(DocumentSignature).filter(
         DocumentSignature.signature_status == "SIGNED_PENDING_APPROVAL"
     )
@@ -391,8 +444,30 @@ async def get_approval_queue(
         if owner_id:
             query = query.filter(DocumentSignature.owner_id == owner_id)
     
-    signatures = query.order_by(desc(DocumentSignature.signed_at)).offset(skip).limit(limit).all()
-    
+    signatures = query.order_by(desc(DocumentSignature.signed_at)).offset(skip).limit(limit or 50).all()
+    return _queue_response(signatures, db)
+
+
+@router.post("/queue/release")
+async def release_approval_claims(
+    release_data: ClaimReleaseRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Hand claimed signatures back to the queue before their lease expires"""
+    signature_ids = None
+    if release_data.signature_ids is not None:
+        try:
+            signature_ids = [UUID(signature_id) for signature_id in release_data.signature_ids]
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid signature id"
+            )
+    return {"released": release_claims(db, current_user, signature_ids)}
+
+
+def _queue_response(signatures: List[DocumentSignature], db: Session) -> List[SignatureResponse]:
     # Get signed document names for signatures that have signed_document_id
     signed_doc_map = {}
     signed_doc_ids = [s.signed_document_id for s in signatures if s.signed_document_id]
@@ -414,78 +489,121 @@ async def get_approval_queue(
             task_id=str(s.task_id) if s.task_id else None,
             signed_document_id=str(s.signed_document_id) if s.signed_document_id else None,
             signed_document_name=signed_doc_map.get(str(s.signed_document_id)) if s.signed_document_id else None,
+            claimed_by_user_id=str(s.claimed_by_user_id) if s.claimed_by_user_id else None,
+            claim_expires_at=s.claim_expires_at,
+            version=s.version,
         )
         for s in signatures
     ]
 
 
-@router.post("/{signature_id}/approve", response_model=SignatureResponse)
-async def approve_signature(
+def _decide_one(
+    db: Session,
     signature_id: UUID,
-    approval_data: ApprovalRequest,
+    action: str,
+    current_user: User,
+    reason: Optional[str],
+    if_match: Optional[str],
+    response: Response
+) -> DocumentSignature:
+    """Approve or reject a single signature, mapping decision errors to HTTP errors"""
+    expected_version = parse_if_match(if_match)
+    decided, errors, _ = decide_signatures(
+        db, [signature_id], action, current_user, reason,
+        expected_versions={signature_id: expected_version} if expected_version is not None else None
+    )
+    if signature_id in errors:
+        error = errors[signature_id]
+        raise HTTPException(
+            status_code=(
+                status.HTTP_404_NOT_FOUND if error.not_found
+                else status.HTTP_409_CONFLICT if error.conflict
+                else status.HTTP_400_BAD_REQUEST
+            ),
+            detail=str(error)
+        )
+    signature = decided[signature_id]
+    db.refresh(signature)
+    set_etag(response, signature)
+    return signature
+
+
+def _decide_batch(db: Session, request: SignatureBatchRequest, action: str, current_user: User) -> SignatureBatchResponse:
+    signature_ids = []
+    results = {}
+    for signature_id in request.signature_ids:
+        try:
+            signature_ids.append(UUID(signature_id))
+        except ValueError:
+            results[signature_id] = SignatureBatchResult(signature_id=signature_id, success=False, error="Invalid signature id")
+    
+    decided, errors, buildings_recalculated = decide_signatures(db, signature_ids, action, current_user, request.reason)
+    for signature_id in signature_ids:
+        if signature_id in decided:
+            result = SignatureBatchResult(
+                signature_id=str(signature_id),
+                success=True,
+                signature_status=decided[signature_id].signature_status
+            )
+        else:
+            result = SignatureBatchResult(signature_id=str(signature_id), success=False, error=str(errors[signature_id]))
+        results[str(signature_id)] = result
+    
+    ordered = list(results.values())
+    return SignatureBatchResponse(
+        results=ordered,
+        processed=len(decided),
+        failed=len(ordered) - len(decided),
+        buildings_recalculated=buildings_recalculated
+    )
+
+
+@router.post("/batch/approve", response_model=SignatureBatchResponse)
+async def batch_approve_signatures(
+    request: SignatureBatchRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
 ):
-    """Manager approves signature (changes status to FINALIZED)"""
-    # Reason is optional for approval
-    signature = db.query(DocumentSignature).filter(
-        DocumentSignature.signature_id == signature_id
-    ).first()
-    
-    if not signature:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Signature not found"
-        )
+    """Approve many signatures in one transaction
     
-    if signature.signature_status != "SIGNED_PENDING_APPROVAL":
+    Signatures that are missing or no longer pending approval are reported and
+    skipped. Each affected building is recalculated once in the background.
+    """
+    return _decide_batch(db, request, APPROVE, current_user)
+
+
+@router.post("/batch/reject", response_model=SignatureBatchResponse)
+async def batch_reject_signatures(
+    request: SignatureBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Reject many signatures in one transaction (returns them to WAIT_FOR_SIGN)"""
+    # Reason is required for rejection
+    if not request.reason or len(request.reason.strip()) < 10:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Signature is not pending approval. Current status: {signature.signature_status}"
+            detail="Rejection reason is required and must be at least 10 characters"
         )
+    return _decide_batch(db, request, REJECT, current_user)
+
+
+@router.post("/{signature_id}/approve", response_model=SignatureResponse)
+async def approve_signature(
+    signature_id: UUID,
+    approval_data: ApprovalRequest,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Manager approves signature (changes status to FINALIZED)
     
-    # Approve signature
-    signature.signature_status = "FINALIZED"
-    signature.approved_by_user_id = current_user.user_id
-    signature.approved_at = datetime.utcnow()
-    signature.approval_reason = approval_data.reason if approval_data.reason else None
-    
-    # Mark linked task as completed if exists
-    if signature.task_id:
-        from app.models.task import Task
-        task = db.query(Task).filter(Task.task_id == signature.task_id).first()
-        if task:
-            task.status = "COMPLETED"
-            task.completed_at = datetime.utcnow()
-            if approval_data.reason:
-                task.notes = (task.notes or "") + f"\n[Approval Notes]: {approval_data.reason}"
-    
-    # Update owner status
-    owner = db.query(Owner).filter(Owner.owner_id == signature.owner_id).first()
-    if owner:
-        owner.owner_status = "SIGNED"
-        
-        # Update unit status based on all owners
-        from app.services.unit_status import update_unit_status
-        update_unit_status(str(owner.unit_id), db)
-    
-    db.commit()
-    
-    # Trigger majority recalculation
-    from app.services.majority import calculate_building_majority, calculate_project_majority
-    from app.models.unit import Unit
-    from app.models.building import Building
-    owner = db.query(Owner).filter(Owner.owner_id == signature.owner_id).first()
-    if owner:
-        unit = db.query(Unit).filter(Unit.unit_id == owner.unit_id).first()
-        if unit:
-            try:
-                calculate_building_majority(str(unit.building_id), db)
-                building = db.query(Building).filter(Building.building_id == unit.building_id).first()
-                if building:
-                    calculate_project_majority(str(building.project_id), db)
-            except Exception as e:
-                logger.error(f"Failed to recalculate majority: {e}")
+    With If-Match (the signature's ETag) the approval fails with 409 if the
+    signature changed since it was read.
+    """
+    # Reason is optional for approval
+    signature = _decide_one(db, signature_id, APPROVE, current_user, approval_data.reason, if_match, response)
     
     logger.info(
         "Signature approved",
@@ -497,7 +615,6 @@ async def approve_signature(
         }
     )
     
-    db.refresh(signature)
     # Convert UUIDs to strings for response
     return SignatureResponse(
         signature_id=str(signature.signature_id),
@@ -508,6 +625,7 @@ async def approve_signature(
         signed_at=signature.signed_at,
         approved_at=signature.approved_at,
         created_at=signature.created_at,
+        version=signature.version,
     )
 
 
@@ -515,6 +633,8 @@ async def approve_signature(
 async def reject_signature(
     signature_id: UUID,
     rejection_data: ApprovalRequest,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
 ):
@@ -526,37 +646,7 @@ async def reject_signature(
             detail="Rejection reason is required and must be at least 10 characters"
         )
     
-    signature = db.query(DocumentSignature).filter(
-        DocumentSignature.signature_id == signature_id
-    ).first()
-    
-    if not signature:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Signature not found"
-        )
-    
-    signature.signature_status = "WAIT_FOR_SIGN"
-    signature.rejected_by_user_id = current_user.user_id
-    signature.rejected_at = datetime.utcnow()
-    signature.rejection_reason = rejection_data.reason
-    
-    # Mark linked task as completed if exists
-    if signature.task_id:
-        from app.models.task import Task
-        task = db.query(Task).filter(Task.task_id == signature.task_id).first()
-        if task:
-            task.status = "COMPLETED"
-            task.completed_at = datetime.utcnow()
-            task.notes = (task.notes or "") + f"\n[Rejection Notes]: {rejection_data.reason}"
-    
-    # Update owner status
-    owner = db.query(Owner).filter(Owner.owner_id == signature.owner_id).first()
-    if owner:
-        owner.owner_status = "WAIT_FOR_SIGN"
-    
-    db.commit()
-    db.refresh(signature)
+    signature = _decide_one(db, signature_id, REJECT, current_user, rejection_data.reason, if_match, response)
     
     # Get signed document name if exists
     signed_document_name = None
@@ -578,5 +668,6 @@ async def reject_signature(
         task_id=str(signature.task_id) if signature.task_id else None,
         signed_document_id=str(signature.signed_document_id) if signature.signed_document_id else None,
         signed_document_name=signed_document_name,
+        version=signature.version,
     )
 
@@ -2,7 +2,7 @@
 Buildings API endpoints
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from uuid import UUID
@@ -12,6 +12,7 @@ from app.models.user import User
 from app.models.building import Building
 from app.models.project import Project
 from app.api.dependencies import get_current_user, require_role
+from app.api.concurrency import advance_version, parse_if_match, set_etag
 import logging
 
 logger = logging.getLogger(__name__)
@@ -175,6 +176,7 @@ async def create_building(
 @router.get("/{building_id}", response_model=BuildingResponse)
 async def get_building(
     building_id: UUID,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -204,6 +206,7 @@ async def get_building(
         assigned_agent = db.query(User).filter(User.user_id == building.assigned_agent_id).first()
     
     # Convert UUIDs to strings for response
+    set_etag(response, building)
     return BuildingResponse(
         building_id=str(building.building_id),
         project_id=str(building.project_id),
@@ -238,6 +241,8 @@ class BuildingUpdate(BaseModel):
 async def update_building(
     building_id: UUID,
     building_data: BuildingUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
 ):
@@ -253,6 +258,9 @@ async def update_building(
             detail="Building not found"
         )
     
+    # With If-Match (the building's ETag), fail with 409 if it changed since it was read
+    advance_version(db, building, parse_if_match(if_match), "Building")
+    
     # Update fields
     if building_data.building_name is not None:
         building.building_name = building_data.building_name
@@ -266,6 +274,7 @@ async def update_building(
         building.total_units = building_data.total_units
     
     # Handle agent assignment
+    previous_agent_id = building.assigned_agent_id
     if building_data.assigned_agent_id is not None:
         if building_data.assigned_agent_id == "":
             # Unassign agent
@@ -287,6 +296,14 @@ async def update_building(
             
             building.assigned_agent_id = UUID(building_data.assigned_agent_id)
     
+    if building.assigned_agent_id != previous_agent_id:
+        # The building's alerts move from one agent's inbox to the other's
+        from app.services.alert_inbox import rebuild_unread_counts
+        db.flush()
+        rebuild_unread_counts(db, [
+            str(agent_id) for agent_id in (previous_agent_id, building.assigned_agent_id) if agent_id
+        ])
+    
     db.commit()
     db.refresh(building)
     
@@ -305,6 +322,7 @@ async def update_building(
         assigned_agent = db.query(User).filter(User.user_id == building.assigned_agent_id).first()
     
     # Convert UUIDs to strings for response
+    set_etag(response, building)
     return BuildingResponse(
         building_id=str(building.building_id),
         project_id=str(building.project_id),
@@ -0,0 +1,149 @@
+"""
+Background job status routes
+"""
+from fastapi import APIRouter, Depends, Query, HTTPException, status
+from sqlalchemy.orm import Session
+from sqlalchemy import desc
+from datetime import datetime
+from typing import Optional, List, Any
+from uuid import UUID
+from pydantic import BaseModel
+import logging
+
+from app.core.database import get_db
+from app.models.user import User
+from app.models.background_job import BackgroundJob
+from app.api.dependencies import require_role
+from app.services.job_queue import get_job_queue_metrics
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+class BackgroundJobResponse(BaseModel):
+    job_id: str
+    queue: str
+    job_type: str
+    payload: Optional[dict] = None
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str] = None
+    result: Optional[Any] = None
+    locked_by: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+def build_background_job_response(job: BackgroundJob) -> BackgroundJobResponse:
+    return BackgroundJobResponse(
+        job_id=str(job.job_id),
+        queue=job.queue,
+        job_type=job.job_type,
+        payload=job.payload,
+        status=job.status,
+        priority=job.priority,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        run_at=job.run_at,
+        last_error=job.last_error,
+        result=job.result,
+        locked_by=job.locked_by,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+def _get_job(job_id: UUID, db: Session) -> BackgroundJob:
+    job = db.query(BackgroundJob).filter(BackgroundJob.job_id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.get("", response_model=List[BackgroundJobResponse])
+async def list_background_jobs(
+    queue: Optional[str] = Query(None),
+    job_status: Optional[str] = Query(None, alias="status"),
+    job_type: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """List background jobs, newest first"""
+    query = db.query(BackgroundJob)
+    if queue:
+        query = query.filter(BackgroundJob.queue == queue)
+    if job_status:
+        query = query.filter(BackgroundJob.status == job_status)
+    if job_type:
+        query = query.filter(BackgroundJob.job_type == job_type)
+    
+    jobs = query.order_by(desc(BackgroundJob.created_at)).offset(skip).limit(limit).all()
+    return [build_background_job_response(job) for job in jobs]
+
+
+@router.get("/metrics")
+async def background_job_metrics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Job counts per queue and status, and how long the oldest ready job has waited"""
+    return get_job_queue_metrics(db)
+
+
+@router.get("/{job_id}", response_model=BackgroundJobResponse)
+async def get_background_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Get a background job's status, attempts and result"""
+    return build_background_job_response(_get_job(job_id, db))
+
+
+@router.post("/{job_id}/retry", response_model=BackgroundJobResponse)
+async def retry_background_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN"))
+):
+    """Queue a FAILED or CANCELLED job again with a fresh attempt budget"""
+    job = _get_job(job_id, db)
+    if job.status not in ["FAILED", "CANCELLED"]:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Only failed or cancelled jobs can be retried (status: {job.status})")
+    
+    job.status = "QUEUED"
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.finished_at = None
+    db.commit()
+    db.refresh(job)
+    return build_background_job_response(job)
+
+
+@router.post("/{job_id}/cancel", response_model=BackgroundJobResponse)
+async def cancel_background_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN"))
+):
+    """Cancel a job that hasn't started yet"""
+    updated = db.query(BackgroundJob).filter(
+        BackgroundJob.job_id == job_id,
+        BackgroundJob.status == "QUEUED"
+    ).update(
+        {"status": "CANCELLED", "finished_at": datetime.utcnow(), "dedupe_key": None},
+        synchronize_session=False
+    )
+    db.commit()
+    
+    job = _get_job(job_id, db)
+    if not updated:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Only queued jobs can be cancelled (status: {job.status})")
+    return build_background_job_response(job)
@@ -2,10 +2,10 @@
 Owners API endpoints with multi-unit support
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Header, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from uuid import UUID
 from datetime import datetime
 from pathlib import Path
@@ -16,7 +16,8 @@ from app.models.user import User
 from app.models.owner import Owner
 from app.models.unit import Unit
 from app.models.building import Building
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, require_role
+from app.api.concurrency import advance_version, parse_if_match, set_etag
 import logging
 import uuid
 
@@ -297,6 +298,7 @@ async def create_owner(
 @router.get("/{owner_id}", response_model=OwnerResponse)
 async def get_owner(
     owner_id: UUID,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -312,6 +314,7 @@ async def get_owner(
             detail="Owner not found"
         )
     
+    set_etag(response, owner)
     # Convert UUIDs to strings for response
     return OwnerResponse(
         owner_id=str(owner.owner_id),
@@ -428,18 +431,133 @@ class OwnerStatusUpdateResponse(BaseModel):
     message: str
 
 
+def _request_signature_approval(
+    db: Session,
+    owner_id: UUID,
+    unit: Unit,
+    building: Building,
+    current_user: User,
+    signed_document_id: Optional[UUID]
+) -> Optional[str]:
+    """
+    Find or create the owner's pending signature for a WAIT_FOR_SIGN change and,
+    once a signed contract is attached, create the manager approval task.
+    
+    Only flushes: the caller commits together with the status change. Returns
+    the approval task id, if one was created.
+    """
+    from app.services.task_creation import create_signature_approval_task
+    from app.models.document import DocumentSignature, Document
+    
+    approval_task_id = None
+    # First, check if a DocumentSignature exists for this owner
+    # Look for either pending approval or wait for sign status
+    signature = db.query(DocumentSignature).filter(
+        DocumentSignature.owner_id == owner_id,
+        DocumentSignature.signature_status.in_(["SIGNED_PENDING_APPROVAL", "WAIT_FOR_SIGN"])
+    ).order_by(DocumentSignature.created_at.desc()).first()
+    
+    if not signature:
+        # Find or create a document for this owner (use first CONTRACT document or create placeholder)
+        document = db.query(Document).filter(
+            Document.owner_id == owner_id,
+            Document.document_type == "CONTRACT"
+        ).first()
+    
+        if not document:
+            # Create a placeholder document for status change workflow
+            document = Document(
+                owner_id=owner_id,
+                building_id=unit.building_id,
+                project_id=building.project_id,
+                document_type="CONTRACT",
+                file_name="Status Change Request",
+                file_path="",  # No file for status change
+                file_size_bytes=0,
+                mime_type="application/pdf",
+                description=f"Placeholder document created for owner status change to WAIT_FOR_SIGN",
+                uploaded_by_user_id=current_user.user_id,
+            )
+            db.add(document)
+            db.flush()
+    
+        # Create DocumentSignature for status change workflow
+        # If signed_document_id is provided, owner has already signed - needs manager approval
+        # If not provided, we're waiting for owner to sign
+        signature_status = "SIGNED_PENDING_APPROVAL" if signed_document_id else "WAIT_FOR_SIGN"
+        signature = DocumentSignature(
+            document_id=document.document_id,
+            owner_id=owner_id,
+            signature_status=signature_status,
+            signing_token=str(uuid.uuid4()),
+            signed_at=datetime.utcnow() if signed_document_id else None,  # Set signed_at if document provided
+            signed_document_id=signed_document_id,  # Link to uploaded signed contract
+        )
+        db.add(signature)
+        db.flush()
+    else:
+        # Update existing signature with signed document if provided
+        if signed_document_id:
+            signature.signed_document_id = signed_document_id
+            signature.version = signature.version + 1  # Callers hold the owner's row lock, taken before signatures
+            # If we're adding a signed document, update status to pending approval
+            if signature.signature_status == "WAIT_FOR_SIGN":
+                signature.signature_status = "SIGNED_PENDING_APPROVAL"
+                signature.signed_at = datetime.utcnow()
+            db.flush()
+    
+    # Only create approval task if signature is pending approval (signed document provided)
+    if signature.signature_status == "SIGNED_PENDING_APPROVAL":
+        approval_task = create_signature_approval_task(
+            owner_id=owner_id,
+            building_id=unit.building_id,
+            requested_by_agent_id=current_user.user_id,
+            db=db,
+            commit=False
+        )
+        approval_task_id = str(approval_task.task_id)
+    
+        # Link the signature to the task (bidirectional)
+        signature.task_id = approval_task.task_id
+        db.flush()
+    
+        logger.info(
+            "Approval task created for owner status change",
+            extra={
+                "owner_id": str(owner_id),
+                "task_id": approval_task_id,
+                "signature_id": str(signature.signature_id),
+                "requested_by": str(current_user.user_id),
+            }
+        )
+    else:
+        logger.info(
+            "Signature created in WAIT_FOR_SIGN status - no approval task needed yet",
+            extra={
+                "owner_id": str(owner_id),
+                "signature_id": str(signature.signature_id),
+            }
+        )
+    
+    return approval_task_id
+
+
 @router.put("/{owner_id}/status", response_model=OwnerStatusUpdateResponse)
 async def update_owner_status(
     owner_id: UUID,
     owner_status: str = Form(...),
     notes: Optional[str] = Form(None),
     signed_contract_file: Optional[UploadFile] = File(None),
+    response: Response = None,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update owner status (agent only, with approval workflow for SIGN)
     
     When status is WAIT_FOR_SIGN, a signed contract PDF file is required.
+    With If-Match (the owner's ETag) the update fails with 409 if the owner
+    changed since it was read.
     """
     # Get owner
     owner = db.query(Owner).filter(
@@ -499,6 +617,9 @@ async def update_owner_status(
                 detail=f"Invalid status for agent: {owner_status}"
             )
     
+    expected_version = parse_if_match(if_match)
+    advance_version(db, owner, expected_version, "Owner")
+    
     # If setting to WAIT_FOR_SIGN, require signed contract file
     signed_document_id = None
     if owner_status == "WAIT_FOR_SIGN":
@@ -570,96 +691,10 @@ async def update_owner_status(
     # If setting to WAIT_FOR_SIGN or requesting SIGN, create approval task
     approval_task_id = None
     if owner_status == "WAIT_FOR_SIGN":
-        from app.services.task_creation import create_signature_approval_task
-        from app.models.document import DocumentSignature, Document
-        
         try:
-            # First, check if a DocumentSignature exists for this owner
-            # Look for either pending approval or wait for sign status
-            signature = db.query(DocumentSignature).filter(
-                DocumentSignature.owner_id == owner_id,
-                DocumentSignature.signature_status.in_(["SIGNED_PENDING_APPROVAL", "WAIT_FOR_SIGN"])
-            ).order_by(DocumentSignature.created_at.desc()).first()
-            
-            if not signature:
-                # Find or create a document for this owner (use first CONTRACT document or create placeholder)
-                document = db.query(Document).filter(
-                    Document.owner_id == owner_id,
-                    Document.document_type == "CONTRACT"
-                ).first()
-                
-                if not document:
-                    # Create a placeholder document for status change workflow
-                    document = Document(
-                        owner_id=owner_id,
-                        building_id=unit.building_id,
-                        project_id=building.project_id,
-                        document_type="CONTRACT",
-                        file_name="Status Change Request",
-                        file_path="",  # No file for status change
-                        file_size_bytes=0,
-                        mime_type="application/pdf",
-                        description=f"Placeholder document created for owner status change to WAIT_FOR_SIGN",
-                        uploaded_by_user_id=current_user.user_id,
-                    )
-                    db.add(document)
-                    db.flush()
-                
-                # Create DocumentSignature for status change workflow
-                # If signed_document_id is provided, owner has already signed - needs manager approval
-                # If not provided, we're waiting for owner to sign
-                signature_status = "SIGNED_PENDING_APPROVAL" if signed_document_id else "WAIT_FOR_SIGN"
-                signature = DocumentSignature(
-                    document_id=document.document_id,
-                    owner_id=owner_id,
-                    signature_status=signature_status,
-                    signing_token=str(uuid.uuid4()),
-                    signed_at=datetime.utcnow() if signed_document_id else None,  # Set signed_at if document provided
-                    signed_document_id=signed_document_id,  # Link to uploaded signed contract
-                )
-                db.add(signature)
-                db.flush()
-            else:
-                # Update existing signature with signed document if provided
-                if signed_document_id:
-                    signature.signed_document_id = signed_document_id
-                    # If we're adding a signed document, update status to pending approval
-                    if signature.signature_status == "WAIT_FOR_SIGN":
-                        signature.signature_status = "SIGNED_PENDING_APPROVAL"
-                        signature.signed_at = datetime.utcnow()
-                    db.flush()
-            
-            # Only create approval task if signature is pending approval (signed document provided)
-            if signature.signature_status == "SIGNED_PENDING_APPROVAL":
-                approval_task = create_signature_approval_task(
-                    owner_id=owner_id,
-                    building_id=unit.building_id,
-                    requested_by_agent_id=current_user.user_id,
-                    db=db
-                )
-                approval_task_id = str(approval_task.task_id)
-                
-                # Link the signature to the task (bidirectional)
-                signature.task_id = approval_task.task_id
-                db.flush()
-                
-                logger.info(
-                    "Approval task created for owner status change",
-                    extra={
-                        "owner_id": str(owner_id),
-                        "task_id": approval_task_id,
-                        "signature_id": str(signature.signature_id),
-                        "requested_by": str(current_user.user_id),
-                    }
-                )
-            else:
-                logger.info(
-                    "Signature created in WAIT_FOR_SIGN status - no approval task needed yet",
-                    extra={
-                        "owner_id": str(owner_id),
-                        "signature_id": str(signature.signature_id),
-                    }
-                )
+            approval_task_id = _request_signature_approval(
+                db, owner_id, unit, building, current_user, signed_document_id
+            )
         except Exception as e:
             logger.error(f"Failed to create approval task: {e}", exc_info=True)
             raise HTTPException(
@@ -674,22 +709,19 @@ async def update_owner_status(
         # Store notes in owner record if needed (could add notes field to Owner model)
         pass
     
+    # Queue cascade recalculation with the change (unless status is WAIT_FOR_SIGN, which waits for approval)
+    if owner_status != "WAIT_FOR_SIGN":
+        from app.services.majority import queue_progress_recalculation
+        queue_progress_recalculation(
+            db,
+            unit_ids=[unit.unit_id],
+            building_ids=[unit.building_id],
+            project_ids=[building.project_id]
+        )
+    
     db.commit()
     db.refresh(owner)
     
-    # Trigger cascade recalculation (unless status is WAIT_FOR_SIGN, which waits for approval)
-    if owner_status != "WAIT_FOR_SIGN":
-        from app.services.unit_status import update_unit_status
-        from app.services.majority import calculate_building_majority, calculate_project_majority
-        
-        try:
-            update_unit_status(str(unit.unit_id), db)
-            calculate_building_majority(str(unit.building_id), db)
-            calculate_project_majority(str(building.project_id), db)
-        except Exception as e:
-            logger.error(f"Failed to recalculate progress: {e}")
-            # Don't fail the request, just log the error
-    
     message = f"Owner status updated from {old_status} to {owner_status}"
     if approval_task_id:
         message += ". Approval task created for manager review."
@@ -708,6 +740,7 @@ async def update_owner_status(
         }
     )
     
+    set_etag(response, owner)
     return OwnerStatusUpdateResponse(
         owner_id=str(owner_id),
         owner_status=owner_status,
@@ -716,6 +749,193 @@ async def update_owner_status(
     )
 
 
+class OwnerStatusBulkItem(BaseModel):
+    owner_id: str
+    owner_status: str
+    signed_document_id: Optional[str] = None  # Required for WAIT_FOR_SIGN: the owner's uploaded signed contract
+    notes: Optional[str] = None
+    version: Optional[int] = None  # The owner's ETag version; skips the owner if it has changed since
+
+
+class OwnerStatusBulkRequest(BaseModel):
+    updates: List[OwnerStatusBulkItem] = Field(..., min_length=1, max_length=500)
+
+
+class OwnerStatusBulkResult(BaseModel):
+    owner_id: str
+    success: bool
+    old_status: Optional[str] = None
+    owner_status: Optional[str] = None
+    approval_task_id: Optional[str] = None
+    version: Optional[int] = None
+    error: Optional[str] = None
+
+
+class OwnerStatusBulkResponse(BaseModel):
+    results: List[OwnerStatusBulkResult]
+    updated: int
+    failed: int
+    units_recalculated: int
+    buildings_recalculated: int
+    projects_recalculated: int
+
+
+@router.post("/status/bulk", response_model=OwnerStatusBulkResponse)
+async def bulk_update_owner_status(
+    request: OwnerStatusBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Update the status of many owners at once (e.g. after a building meeting)
+    
+    Same rules as PUT /owners/{owner_id}/status, except that WAIT_FOR_SIGN takes
+    the id of a signed contract already uploaded for the owner instead of a
+    file. Owners that fail validation are reported and skipped; the rest are
+    applied, with their approval tasks, in one transaction, together with one
+    background recalculation of each affected unit, building and project.
+    """
+    from app.models.document import Document
+    from app.services.majority import queue_progress_recalculation
+    
+    if current_user.role not in ["AGENT", "SUPER_ADMIN", "PROJECT_MANAGER"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only agents, managers, and admins can update owner status"
+        )
+    
+    workflow_statuses = ["NOT_CONTACTED", "NEGOTIATING", "AGREED_TO_SIGN", "WAIT_FOR_SIGN"]
+    restricted_statuses = ["SIGNED", "REFUSED"]
+    all_statuses = workflow_statuses + restricted_statuses
+    
+    results = {}
+    updates = {}
+    for item in request.updates:
+        try:
+            updates[UUID(item.owner_id)] = item
+        except ValueError:
+            results[item.owner_id] = OwnerStatusBulkResult(owner_id=item.owner_id, success=False, error="Invalid owner id")
+    
+    # Owners with their unit and building in one query, locked in owner_id order
+    rows = db.query(Owner, Unit, Building).join(
+        Unit, Unit.unit_id == Owner.unit_id
+    ).join(
+        Building, Building.building_id == Unit.building_id
+    ).filter(
+        Owner.owner_id.in_(list(updates)),
+        Owner.is_deleted == False
+    ).order_by(Owner.owner_id).with_for_update(of=Owner).all() if updates else []
+    found = {owner.owner_id: (owner, unit, building) for owner, unit, building in rows}
+    
+    # Signed contracts referenced by WAIT_FOR_SIGN changes, in one query
+    document_ids = set()
+    for item in updates.values():
+        if item.signed_document_id:
+            try:
+                document_ids.add(UUID(item.signed_document_id))
+            except ValueError:
+                pass
+    documents = {
+        document_id: owner_id
+        for document_id, owner_id in db.query(Document.document_id, Document.owner_id).filter(
+            Document.document_id.in_(document_ids),
+            Document.is_deleted == False
+        )
+    } if document_ids else {}
+    
+    unit_ids, building_ids, project_ids = set(), set(), set()
+    for owner_id, item in updates.items():
+        key = str(owner_id)
+        
+        def fail(error: str):
+            results[key] = OwnerStatusBulkResult(owner_id=key, success=False, owner_status=item.owner_status, error=error)
+        
+        if owner_id not in found:
+            fail("Owner not found")
+            continue
+        owner, unit, building = found[owner_id]
+        
+        if current_user.role == "AGENT" and not (
+            owner.assigned_agent_id == current_user.user_id
+            or (building.assigned_agent_id == current_user.user_id and not unit.is_deleted and not building.is_deleted)
+        ):
+            fail("You can only update owners in buildings assigned to you")
+            continue
+        if item.owner_status not in all_statuses:
+            fail(f"Invalid status: {item.owner_status}")
+            continue
+        if current_user.role == "AGENT" and item.owner_status in restricted_statuses:
+            fail(f"Agents cannot set status to {item.owner_status}. Use WAIT_FOR_SIGN to request approval.")
+            continue
+        if item.version is not None and item.version != owner.version:
+            fail(f"Owner was modified by another request (now at version {owner.version})")
+            continue
+        
+        signed_document_id = None
+        if item.owner_status == "WAIT_FOR_SIGN":
+            try:
+                signed_document_id = UUID(item.signed_document_id) if item.signed_document_id else None
+            except ValueError:
+                signed_document_id = None
+            if not signed_document_id or documents.get(signed_document_id) != owner_id:
+                fail("WAIT_FOR_SIGN requires signed_document_id of a contract uploaded for this owner")
+                continue
+        
+        # Each owner in a savepoint, so one failure doesn't undo the others
+        try:
+            with db.begin_nested():
+                approval_task_id = None
+                if item.owner_status == "WAIT_FOR_SIGN":
+                    approval_task_id = _request_signature_approval(
+                        db, owner_id, unit, building, current_user, signed_document_id
+                    )
+                old_status = owner.owner_status
+                owner.owner_status = item.owner_status
+                owner.version = owner.version + 1  # Row is locked above
+        except Exception as e:
+            logger.error(f"Bulk status update failed for owner {owner_id}: {e}", exc_info=True)
+            fail(f"Failed to update status: {str(e)}")
+            continue
+        
+        results[key] = OwnerStatusBulkResult(
+            owner_id=key,
+            success=True,
+            old_status=old_status,
+            owner_status=item.owner_status,
+            approval_task_id=approval_task_id,
+            version=owner.version
+        )
+        if item.owner_status != "WAIT_FOR_SIGN":
+            unit_ids.add(unit.unit_id)
+            building_ids.add(unit.building_id)
+            project_ids.add(building.project_id)
+    
+    # One recalculation per affected unit, building and project
+    queue_progress_recalculation(db, unit_ids=unit_ids, building_ids=building_ids, project_ids=project_ids)
+    db.commit()
+    
+    ordered = [results[item.owner_id] if item.owner_id in results else results[str(UUID(item.owner_id))] for item in request.updates]
+    updated = sum(1 for result in ordered if result.success)
+    
+    logger.info(
+        "Owner statuses updated in bulk",
+        extra={
+            "user_id": str(current_user.user_id),
+            "requested": len(request.updates),
+            "updated": updated,
+            "buildings_recalculated": len(building_ids),
+        }
+    )
+    
+    return OwnerStatusBulkResponse(
+        results=ordered,
+        updated=updated,
+        failed=len(ordered) - updated,
+        units_recalculated=len(unit_ids),
+        buildings_recalculated=len(building_ids),
+        projects_recalculated=len(project_ids)
+    )
+
+
 @router.delete("/{owner_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_owner(
     owner_id: UUID,
@@ -1,55 +1,186 @@
 """
 Reports API endpoints
 """
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, or_
-from datetime import datetime, timedelta, date
-from typing import Optional, List, Tuple
-from enum import Enum
-from io import BytesIO
+from sqlalchemy import desc, or_
+from datetime import datetime, date
+from typing import Optional, List, Literal
+from uuid import UUID
+from pydantic import BaseModel, Field
+import os
+import tempfile
 import logging
 
-from app.core.database import get_db
+from app.core.database import get_db, get_report_db
 from app.models.user import User
-from app.models.project import Project
-from app.models.building import Building
-from app.models.owner import Owner
-from app.models.interaction import Interaction
-from app.models.unit import Unit
-from app.models.task import Task
-from app.models.document import DocumentSignature
-from app.api.dependencies import get_current_user
-from pydantic import BaseModel
+from app.models.report_job import ReportJob
+from app.models.report_subscription import ReportSubscription
+from app.api.dependencies import get_current_user, require_role
+from app.services.report_generation import (
+    ReportType,
+    ReportFormat,
+    ReportRequest,
+    REPORT_FILE_TYPES,
+    STREAMING_FORMATS,
+    render_report,
+    iter_text_report,
+    gzip_chunks,
+    report_filename,
+    iter_file_chunks,
+    iter_open_file_chunks,
+    get_agent_performance_data,
+)
+from app.services.report_cache import (
+    is_cacheable,
+    report_cache_key,
+    open_cached_report,
+    store_cached_report,
+    get_report_cache_metrics,
+)
+from app.services.matrix_export import write_matrix_workbook
+from app.services.analytics_snapshot import (
+    SNAPSHOT_TABLES,
+    export_analytics_snapshot,
+    load_manifest,
+    snapshot_file_path,
+)
+from app.services.report_jobs import (
+    ReportJobLimitError,
+    submit_report_job,
+    get_report_job_metrics,
+)
+from app.services.report_subscriptions import (
+    next_run_time,
+    can_access_subscription,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
-class ReportType(str, Enum):
-    """Available report types"""
-    BUILDING_PROGRESS = "building_progress"
-    AGENT_PERFORMANCE = "agent_performance"
-    INTERACTION_HISTORY = "interaction_history"
-    COMPLIANCE_AUDIT = "compliance_audit"
-
-
-class ReportFormat(str, Enum):
-    """Available export formats"""
-    PDF = "pdf"
-    EXCEL = "excel"
-
-
-class ReportRequest(BaseModel):
-    """Report generation request"""
+class ReportJobResponse(BaseModel):
+    job_id: str
+    report_type: str
+    format: str
+    status: str
+    progress_percent: int
+    rows_processed: int
+    rows_estimated: Optional[int] = None
+    file_name: Optional[str] = None
+    file_size_bytes: Optional[int] = None
+    error_message: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    queue_wait_ms: Optional[int] = None
+    render_ms: Optional[int] = None
+    expires_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+
+
+def build_report_job_response(job: ReportJob) -> ReportJobResponse:
+    """Build ReportJobResponse, including the download URL once the artifact exists"""
+    return ReportJobResponse(
+        job_id=str(job.job_id),
+        report_type=job.report_type,
+        format=job.report_format,
+        status=job.status,
+        progress_percent=job.progress_percent or 0,
+        rows_processed=job.rows_processed or 0,
+        rows_estimated=job.rows_estimated,
+        file_name=job.file_name,
+        file_size_bytes=job.file_size_bytes,
+        error_message=job.error_message,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        queue_wait_ms=job.queue_wait_ms,
+        render_ms=job.render_ms,
+        expires_at=job.expires_at,
+        download_url=f"/api/v1/reports/jobs/{job.job_id}/download" if job.status == "COMPLETED" else None,
+    )
+
+
+class ReportSubscriptionCreate(BaseModel):
+    name: str
     report_type: ReportType
     format: ReportFormat = ReportFormat.PDF
+    cadence: Literal["DAILY", "WEEKLY", "MONTHLY"] = "WEEKLY"
     project_id: Optional[str] = None
     building_id: Optional[str] = None
     agent_id: Optional[str] = None
-    start_date: Optional[date] = None
-    end_date: Optional[date] = None
+    lookback_days: Optional[int] = Field(None, ge=1, le=366)
+    recipient_user_ids: List[UUID] = []
+
+
+class ReportSubscriptionResponse(BaseModel):
+    subscription_id: str
+    name: str
+    report_type: str
+    format: str
+    cadence: str
+    parameters: dict
+    lookback_days: Optional[int] = None
+    recipient_user_ids: List[str]
+    is_active: bool
+    next_run_at: datetime
+    last_run_at: Optional[datetime] = None
+    last_status: Optional[str] = None
+    last_error: Optional[str] = None
+    file_name: Optional[str] = None
+    file_size_bytes: Optional[int] = None
+    rows_rendered: Optional[int] = None
+    created_at: datetime
+    download_url: Optional[str] = None
+
+
+def build_report_subscription_response(subscription: ReportSubscription) -> ReportSubscriptionResponse:
+    """Build ReportSubscriptionResponse, including the download URL once a report was rendered"""
+    return ReportSubscriptionResponse(
+        subscription_id=str(subscription.subscription_id),
+        name=subscription.name,
+        report_type=subscription.report_type,
+        format=subscription.report_format,
+        cadence=subscription.cadence,
+        parameters=subscription.parameters or {},
+        lookback_days=subscription.lookback_days,
+        recipient_user_ids=[str(user_id) for user_id in subscription.recipient_user_ids or []],
+        is_active=subscription.is_active,
+        next_run_at=subscription.next_run_at,
+        last_run_at=subscription.last_run_at,
+        last_status=subscription.last_status,
+        last_error=subscription.last_error,
+        file_name=subscription.file_name,
+        file_size_bytes=subscription.file_size_bytes,
+        rows_rendered=subscription.rows_rendered,
+        created_at=subscription.created_at,
+        download_url=f"/api/v1/reports/subscriptions/{subscription.subscription_id}/download" if subscription.file_path else None,
+    )
+
+
+def _accepts_gzip(http_request: Request) -> bool:
+    """Whether the client advertised gzip in Accept-Encoding"""
+    accept_encoding = http_request.headers.get("accept-encoding", "")
+    return any(
+        encoding.split(";")[0].strip().lower() == "gzip" and "q=0" not in encoding.replace(" ", "")
+        for encoding in accept_encoding.split(",")
+    )
+
+
+def _get_visible_job(job_id: UUID, db: Session, current_user: User) -> ReportJob:
+    """Load a report job, allowing access to the requester and super admins only"""
+    job = db.query(ReportJob).filter(ReportJob.job_id == job_id).first()
+    
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report job not found")
+    
+    if job.requested_by_user_id != current_user.user_id and current_user.role != "SUPER_ADMIN":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this report job")
+    
+    return job
 
 
 @router.get("/types")
@@ -63,716 +194,378 @@ async def get_report_types(
                 "id": "building_progress",
                 "name": "Building Progress Report",
                 "description": "Shows signature progress and status for buildings",
-                "formats": ["pdf", "excel"]
+                "formats": ["pdf", "excel", "csv", "ndjson"]
             },
             {
                 "id": "agent_performance",
                 "name": "Agent Performance Report",
                 "description": "Shows agent KPIs and interaction statistics",
-                "formats": ["pdf", "excel"]
+                "formats": ["pdf", "excel", "csv", "ndjson"]
             },
             {
                 "id": "interaction_history",
                 "name": "Interaction History Report",
                 "description": "Detailed log of all interactions with owners",
-                "formats": ["pdf", "excel"]
+                "formats": ["pdf", "excel", "csv", "ndjson"]
             },
             {
                 "id": "compliance_audit",
                 "name": "Compliance Audit Report",
                 "description": "Audit trail of all approvals and signatures",
-                "formats": ["pdf", "excel"]
+                "formats": ["pdf", "excel", "csv", "ndjson"]
             }
         ]
     }
 
 
+
 @router.post("/generate")
 async def generate_report(
     request: ReportRequest,
-    db: Session = Depends(get_db),
+    http_request: Request,
+    db: Session = Depends(get_report_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Generate a report in the specified format
     
-    Returns the generated file as a download
+    Returns the generated file as a download. PDF/Excel rendering runs in the
+    threadpool so the event loop stays responsive; large reports should use
+    POST /reports/jobs. CSV and NDJSON are streamed row by row from the database
+    cursor without a row cap, gzip-encoded when the client accepts it.
     """
+    if request.format in STREAMING_FORMATS:
+        return _stream_text_report(request, http_request, db, current_user)
+    
+    _, media_type = REPORT_FILE_TYPES[request.format]
+    headers = {"Content-Disposition": f'attachment; filename="{report_filename(request)}"'}
+    
+    # Identical request over unchanged data: serve the previously rendered file
+    cache_key = None
+    if is_cacheable(request):
+        cache_key = await run_in_threadpool(report_cache_key, request, db, current_user)
+        cached = open_cached_report(cache_key, request)
+        if cached:
+            headers["X-Report-Cache"] = "HIT"
+            return StreamingResponse(iter_open_file_chunks(cached), media_type=media_type, headers=headers)
+        headers["X-Report-Cache"] = "MISS"
+    
+    fd, file_path = tempfile.mkstemp(suffix="." + REPORT_FILE_TYPES[request.format][0])
+    os.close(fd)
     try:
-        if request.format == ReportFormat.PDF:
-            file_content, filename = await generate_pdf_report(
-                request, db, current_user
-            )
-            return StreamingResponse(
-                BytesIO(file_content),
-                media_type="application/pdf",
-                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-            )
-        elif request.format == ReportFormat.EXCEL:
-            file_content, filename = await generate_excel_report(
-                request, db, current_user
-            )
-            return StreamingResponse(
-                BytesIO(file_content),
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-            )
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported format")
+        await run_in_threadpool(render_report, request, db, current_user, file_path)
     except Exception as e:
+        os.unlink(file_path)
         logger.error(f"Error generating report: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
-
-
-async def generate_pdf_report(
-    request: ReportRequest,
-    db: Session,
-    current_user: User
-) -> Tuple[bytes, str]:
-    """Generate PDF report"""
-    try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.lib import colors
-        from reportlab.lib.units import inch
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Title style
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#0D9488'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        # Header
-        title_text = request.report_type.value.replace('_', ' ').title() + " Report"
-        story.append(Paragraph(title_text, title_style))
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Report metadata
-        metadata_style = ParagraphStyle(
-            'Metadata',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.grey
-        )
-        story.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", metadata_style))
-        story.append(Paragraph(f"Generated by: {current_user.full_name or current_user.email}", metadata_style))
-        if request.start_date or request.end_date:
-            date_range = f"{request.start_date or 'Start'} to {request.end_date or 'End'}"
-            story.append(Paragraph(f"Date Range: {date_range}", metadata_style))
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Generate report content based on type
-        if request.report_type == ReportType.BUILDING_PROGRESS:
-            content = await _get_building_progress_data(request, db, current_user)
-            story.extend(_build_building_progress_pdf(content, styles))
-        elif request.report_type == ReportType.AGENT_PERFORMANCE:
-            content = await _get_agent_performance_data(request, db, current_user)
-            story.extend(_build_agent_performance_pdf(content, styles))
-        elif request.report_type == ReportType.INTERACTION_HISTORY:
-            content = await _get_interaction_history_data(request, db, current_user)
-            story.extend(_build_interaction_history_pdf(content, styles))
-        elif request.report_type == ReportType.COMPLIANCE_AUDIT:
-            content = await _get_compliance_audit_data(request, db, current_user)
-            story.extend(_build_compliance_audit_pdf(content, styles))
-        
-        doc.build(story)
-        buffer.seek(0)
-        
-        filename = f"{request.report_type.value}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        return buffer.getvalue(), filename
-        
-    except ImportError:
-        logger.error("reportlab not installed. Install with: pip install reportlab")
-        raise HTTPException(status_code=500, detail="PDF generation not available. Please install reportlab.")
-
-
-async def generate_excel_report(
-    request: ReportRequest,
-    db: Session,
-    current_user: User
-) -> Tuple[bytes, str]:
-    """Generate Excel report"""
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from openpyxl.utils import get_column_letter
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = request.report_type.value.replace('_', ' ').title()
-        
-        # Header style
-        header_fill = PatternFill(start_color="0D9488", end_color="0D9488", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Title row
-        ws['A1'] = request.report_type.value.replace('_', ' ').title() + " Report"
-        ws['A1'].font = Font(bold=True, size=16, color="0D9488")
-        ws.merge_cells('A1:D1')
-        ws['A1'].alignment = Alignment(horizontal='center')
-        
-        # Metadata rows
-        ws['A2'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        ws['A3'] = f"Generated by: {current_user.full_name or current_user.email}"
-        if request.start_date or request.end_date:
-            date_range = f"{request.start_date or 'Start'} to {request.end_date or 'End'}"
-            ws['A4'] = f"Date Range: {date_range}"
-        
-        # Generate report content based on type
-        start_row = 6
-        if request.report_type == ReportType.BUILDING_PROGRESS:
-            data = await _get_building_progress_data(request, db, current_user)
-            start_row = _build_building_progress_excel(ws, data, start_row, header_fill, header_font, border)
-        elif request.report_type == ReportType.AGENT_PERFORMANCE:
-            data = await _get_agent_performance_data(request, db, current_user)
-            start_row = _build_agent_performance_excel(ws, data, start_row, header_fill, header_font, border)
-        elif request.report_type == ReportType.INTERACTION_HISTORY:
-            data = await _get_interaction_history_data(request, db, current_user)
-            start_row = _build_interaction_history_excel(ws, data, start_row, header_fill, header_font, border)
-        elif request.report_type == ReportType.COMPLIANCE_AUDIT:
-            data = await _get_compliance_audit_data(request, db, current_user)
-            start_row = _build_compliance_audit_excel(ws, data, start_row, header_fill, header_font, border)
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        filename = f"{request.report_type.value}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return buffer.getvalue(), filename
-        
-    except ImportError:
-        logger.error("openpyxl not installed. Install with: pip install openpyxl")
-        raise HTTPException(status_code=500, detail="Excel generation not available. Please install openpyxl.")
-
-
-# Data retrieval functions
-
-async def _get_building_progress_data(request: ReportRequest, db: Session, current_user: User) -> dict:
-    """Get building progress data for report"""
-    query = db.query(Building).filter(Building.is_deleted == False)
-    
-    if request.project_id:
-        query = query.filter(Building.project_id == request.project_id)
-    if request.building_id:
-        query = query.filter(Building.building_id == request.building_id)
-    
-    # Role-based filtering
-    if current_user.role == "AGENT":
-        query = query.filter(
-            or_(
-                Building.assigned_agent_id == current_user.user_id,
-                Building.assigned_agent_id.is_(None)
-            )
-        )
-    
-    buildings = query.order_by(desc(Building.signature_percentage)).all()
     
-    # Get project names
-    project_ids = {b.project_id for b in buildings}
-    projects = {p.project_id: p.project_name for p in db.query(Project).filter(Project.project_id.in_(project_ids)).all()}
-    
-    return {
-        "buildings": [
-            {
-                "building_name": b.building_name,
-                "building_code": b.building_code,
-                "project_name": projects.get(b.project_id, "Unknown"),
-                "address": b.address,
-                "total_units": b.total_units or 0,
-                "signature_percentage": float(b.signature_percentage) if b.signature_percentage else 0.0,
-                "traffic_light_status": b.traffic_light_status,
-                "current_status": b.current_status,
-                "created_at": b.created_at.isoformat() if b.created_at else None
-            }
-            for b in buildings
-        ],
-        "total_buildings": len(buildings),
-        "avg_signature_percentage": sum(float(b.signature_percentage) if b.signature_percentage else 0.0 for b in buildings) / len(buildings) if buildings else 0.0
+    if cache_key:
+        await run_in_threadpool(store_cached_report, cache_key, request, file_path)
+    
+    return StreamingResponse(
+        iter_file_chunks(file_path, delete=True),
+        media_type=media_type,
+        headers=headers
+    )
+
+
+def _stream_text_report(request: ReportRequest, http_request: Request, db: Session, current_user: User) -> StreamingResponse:
+    """Stream a CSV/NDJSON report; the sync generator is iterated in the threadpool by Starlette"""
+    def rows():
+        try:
+            yield from iter_text_report(request, db, current_user)
+        except Exception as e:
+            # Headers are already sent, so the client only sees a truncated body
+            logger.error(f"Error streaming {request.format.value} report: {e}", exc_info=True)
+            raise
+    
+    _, media_type = REPORT_FILE_TYPES[request.format]
+    headers = {
+        "Content-Disposition": f'attachment; filename="{report_filename(request)}"',
+        "Vary": "Accept-Encoding",
     }
-
-
-async def _get_agent_performance_data(request: ReportRequest, db: Session, current_user: User) -> dict:
-    """Get agent performance data for report"""
-    # Get all agents
-    agents_query = db.query(User).filter(User.role == "AGENT", User.is_active == True)
-    if request.agent_id:
-        agents_query = agents_query.filter(User.user_id == request.agent_id)
-    
-    agents = agents_query.all()
-    
-    # Date range filter
-    date_filter = None
-    if request.start_date or request.end_date:
-        conditions = []
-        if request.start_date:
-            conditions.append(Interaction.interaction_date >= request.start_date)
-        if request.end_date:
-            conditions.append(Interaction.interaction_date <= request.end_date)
-        date_filter = and_(*conditions) if conditions else None
+    body = rows()
+    if _accepts_gzip(http_request):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
     
-    agent_stats = []
-    for agent in agents:
-        # Count interactions
-        interactions_query = db.query(Interaction).filter(Interaction.agent_id == agent.user_id)
-        if date_filter:
-            interactions_query = interactions_query.filter(date_filter)
-        
-        total_interactions = interactions_query.count()
-        
-        # Count signed documents
-        signatures_query = db.query(DocumentSignature).join(Owner).filter(
-            Owner.assigned_agent_id == agent.user_id,
-            DocumentSignature.status == "FINALIZED"
-        )
-        if date_filter:
-            signatures_query = signatures_query.filter(
-                DocumentSignature.approved_at >= request.start_date if request.start_date else True,
-                DocumentSignature.approved_at <= request.end_date if request.end_date else True
-            )
-        
-        signed_documents = signatures_query.count()
-        
-        # Count assigned buildings
-        assigned_buildings = db.query(Building).filter(
-            Building.assigned_agent_id == agent.user_id,
-            Building.is_deleted == False
-        ).count()
-        
-        # Count assigned owners
-        assigned_owners = db.query(Owner).filter(
-            Owner.assigned_agent_id == agent.user_id,
-            Owner.is_deleted == False,
-            Owner.is_current_owner == True
-        ).count()
-        
-        agent_stats.append({
-            "agent_name": agent.full_name or agent.email,
-            "email": agent.email,
-            "total_interactions": total_interactions,
-            "signed_documents": signed_documents,
-            "assigned_buildings": assigned_buildings,
-            "assigned_owners": assigned_owners,
-            "success_rate": (signed_documents / assigned_owners * 100) if assigned_owners > 0 else 0.0
-        })
-    
-    return {
-        "agents": agent_stats,
-        "total_agents": len(agent_stats),
-        "period_start": request.start_date.isoformat() if request.start_date else None,
-        "period_end": request.end_date.isoformat() if request.end_date else None
-    }
+    return StreamingResponse(body, media_type=media_type, headers=headers)
 
 
-async def _get_interaction_history_data(request: ReportRequest, db: Session, current_user: User) -> dict:
-    """Get interaction history data for report"""
-    query = db.query(Interaction).join(Owner).filter(Owner.is_deleted == False)
-    
-    if request.start_date:
-        query = query.filter(Interaction.interaction_date >= request.start_date)
-    if request.end_date:
-        query = query.filter(Interaction.interaction_date <= request.end_date)
-    if request.agent_id:
-        query = query.filter(Interaction.agent_id == request.agent_id)
-    
-    # Role-based filtering
-    if current_user.role == "AGENT":
-        query = query.filter(Interaction.agent_id == current_user.user_id)
-    
-    interactions = query.order_by(desc(Interaction.interaction_date)).limit(1000).all()
+@router.get("/matrix")
+async def export_matrix(
+    project_id: Optional[str] = Query(None),
+    building_id: Optional[str] = Query(None),
+    db: Session = Depends(get_report_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Units × owners matrix for a project or building as an Excel workbook
     
-    # Get related data
-    owner_ids = {i.owner_id for i in interactions}
-    agent_ids = {i.agent_id for i in interactions if i.agent_id}
+    One row per unit with its current owners pivoted into columns, owner and
+    unit statuses and interaction counts.
+    """
+    if not project_id and not building_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="project_id or building_id is required")
     
-    owners = {o.owner_id: o for o in db.query(Owner).filter(Owner.owner_id.in_(owner_ids)).all()}
-    agents = {u.user_id: u for u in db.query(User).filter(User.user_id.in_(agent_ids)).all()}
+    fd, file_path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await run_in_threadpool(write_matrix_workbook, db, current_user, file_path, project_id, building_id)
+    except Exception as e:
+        os.unlink(file_path)
+        logger.error(f"Error generating matrix export: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to generate matrix export: {str(e)}")
+    
+    _, media_type = REPORT_FILE_TYPES[ReportFormat.EXCEL]
+    scope = f"building_{building_id}" if building_id else f"project_{project_id}"
+    return StreamingResponse(
+        iter_file_chunks(file_path, delete=True),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="matrix_{scope}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'}
+    )
+
+
+@router.get("/agent-performance")
+async def get_agent_performance(
+    agent_id: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: Session = Depends(get_report_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Agent KPI table as JSON (same data as the agent performance PDF/Excel report)"""
+    request = ReportRequest(
+        report_type=ReportType.AGENT_PERFORMANCE,
+        agent_id=agent_id,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    return await run_in_threadpool(get_agent_performance_data, request, db, current_user)
+
+
+@router.post("/jobs", response_model=ReportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_report_job(
+    request: ReportRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Queue a report for background rendering; poll GET /reports/jobs/{job_id} for progress"""
+    try:
+        job = submit_report_job(request, current_user, db)
+    except ReportJobLimitError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
     
-    return {
-        "interactions": [
-            {
-                "interaction_date": i.interaction_date.isoformat() if i.interaction_date else None,
-                "interaction_type": i.interaction_type,
-                "owner_name": owners.get(i.owner_id).full_name if owners.get(i.owner_id) else "Unknown",
-                "owner_phone": owners.get(i.owner_id).phone_number if owners.get(i.owner_id) else None,
-                "agent_name": agents.get(i.agent_id).full_name if i.agent_id and agents.get(i.agent_id) else "Unknown",
-                "summary": i.call_summary,
-                "sentiment": i.sentiment,
-                "next_action": i.next_action
-            }
-            for i in interactions
-        ],
-        "total_interactions": len(interactions)
-    }
+    return build_report_job_response(job)
 
 
-async def _get_compliance_audit_data(request: ReportRequest, db: Session, current_user: User) -> dict:
-    """Get compliance audit data for report"""
-    query = db.query(DocumentSignature).join(Owner).filter(Owner.is_deleted == False)
-    
-    if request.start_date:
-        query = query.filter(DocumentSignature.created_at >= datetime.combine(request.start_date, datetime.min.time()))
-    if request.end_date:
-        query = query.filter(DocumentSignature.created_at <= datetime.combine(request.end_date, datetime.max.time()))
-    
-    signatures = query.order_by(desc(DocumentSignature.created_at)).limit(1000).all()
-    
-    # Get related data
-    owner_ids = {s.owner_id for s in signatures}
-    approver_ids = {s.approved_by_user_id for s in signatures if s.approved_by_user_id}
-    
-    owners = {o.owner_id: o for o in db.query(Owner).filter(Owner.owner_id.in_(owner_ids)).all()}
-    approvers = {u.user_id: u for u in db.query(User).filter(User.user_id.in_(approver_ids)).all()}
+@router.get("/jobs", response_model=List[ReportJobResponse])
+async def list_report_jobs(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List the current user's report jobs, newest first"""
+    jobs = db.query(ReportJob).filter(
+        ReportJob.requested_by_user_id == current_user.user_id
+    ).order_by(desc(ReportJob.created_at)).offset(skip).limit(limit).all()
     
-    return {
-        "signatures": [
-            {
-                "signature_date": s.created_at.isoformat() if s.created_at else None,
-                "owner_name": owners.get(s.owner_id).full_name if owners.get(s.owner_id) else "Unknown",
-                "status": s.status,
-                "approved_at": s.approved_at.isoformat() if s.approved_at else None,
-                "approver_name": approvers.get(s.approved_by_user_id).full_name if s.approved_by_user_id and approvers.get(s.approved_by_user_id) else None,
-                "approval_reason": s.approval_reason
-            }
-            for s in signatures
-        ],
-        "total_signatures": len(signatures)
-    }
+    return [build_report_job_response(job) for job in jobs]
 
 
-# PDF building functions
-
-def _build_building_progress_pdf(content: dict, styles) -> List:
-    """Build PDF content for building progress report"""
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    
-    story = []
-    
-    # Summary
-    summary_style = ParagraphStyle('Summary', parent=styles['Normal'], fontSize=11, spaceAfter=12)
-    story.append(Paragraph(f"Total Buildings: {content['total_buildings']}", summary_style))
-    story.append(Paragraph(f"Average Signature Percentage: {content['avg_signature_percentage']:.2f}%", summary_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Table data
-    data = [["Building Name", "Project", "Address", "Units", "Signature %", "Status"]]
-    
-    for building in content['buildings']:
-        status_color = {
-            "GREEN": "✓",
-            "YELLOW": "⚠",
-            "RED": "✗"
-        }.get(building['traffic_light_status'], "")
-        
-        data.append([
-            building['building_name'],
-            building['project_name'],
-            building['address'] or "",
-            str(building['total_units']),
-            f"{building['signature_percentage']:.1f}%",
-            f"{status_color} {building['traffic_light_status']}"
-        ])
-    
-    # Create table
-    table = Table(data, colWidths=[1.5*inch, 1.2*inch, 1.8*inch, 0.6*inch, 0.8*inch, 1*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0D9488')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-    ]))
-    
-    story.append(table)
-    return story
+@router.get("/jobs/metrics")
+async def report_job_metrics(
+    hours: int = Query(24, ge=1, le=720),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Report job counts and queue/render timings (manager/admin only)"""
+    return get_report_job_metrics(db, hours)
 
 
-def _build_agent_performance_pdf(content: dict, styles) -> List:
-    """Build PDF content for agent performance report"""
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import ParagraphStyle
-    
-    story = []
-    
-    # Summary
-    summary_style = ParagraphStyle('Summary', parent=styles['Normal'], fontSize=11, spaceAfter=12)
-    story.append(Paragraph(f"Total Agents: {content['total_agents']}", summary_style))
-    if content.get('period_start'):
-        story.append(Paragraph(f"Period: {content['period_start']} to {content.get('period_end', 'Present')}", summary_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Table data
-    data = [["Agent Name", "Email", "Interactions", "Signed Docs", "Buildings", "Owners", "Success Rate"]]
-    
-    for agent in content['agents']:
-        data.append([
-            agent['agent_name'],
-            agent['email'],
-            str(agent['total_interactions']),
-            str(agent['signed_documents']),
-            str(agent['assigned_buildings']),
-            str(agent['assigned_owners']),
-            f"{agent['success_rate']:.1f}%"
-        ])
-    
-    # Create table
-    table = Table(data, colWidths=[1.5*inch, 1.5*inch, 0.8*inch, 0.8*inch, 0.7*inch, 0.7*inch, 0.8*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0D9488')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-    ]))
-    
-    story.append(table)
-    return story
+@router.get("/cache/metrics")
+async def report_cache_metrics(
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Report cache hit/miss counters and size (manager/admin only)"""
+    return get_report_cache_metrics()
 
 
-def _build_interaction_history_pdf(content: dict, styles) -> List:
-    """Build PDF content for interaction history report"""
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    from reportlab.platypus import Table, TableStyle, Paragraph, Spacer, PageBreak
-    from reportlab.lib.styles import ParagraphStyle
-    
-    story = []
-    
-    # Summary
-    summary_style = ParagraphStyle('Summary', parent=styles['Normal'], fontSize=11, spaceAfter=12)
-    story.append(Paragraph(f"Total Interactions: {content['total_interactions']}", summary_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Table data
-    data = [["Date", "Type", "Owner", "Agent", "Summary", "Sentiment"]]
-    
-    for interaction in content['interactions'][:100]:  # Limit to 100 for PDF
-        data.append([
-            interaction['interaction_date'][:10] if interaction['interaction_date'] else "",
-            interaction['interaction_type'],
-            interaction['owner_name'],
-            interaction['agent_name'],
-            (interaction['summary'] or "")[:50] + "..." if interaction.get('summary') and len(interaction['summary']) > 50 else (interaction.get('summary') or ""),
-            interaction.get('sentiment', '')
-        ])
-    
-    # Create table
-    table = Table(data, colWidths=[0.8*inch, 0.8*inch, 1.2*inch, 1*inch, 2*inch, 0.8*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0D9488')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 7),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-    ]))
+@router.post("/snapshots")
+async def create_analytics_snapshot(
+    full: bool = Query(False, description="Rewrite every partition instead of only changed ones"),
+    tables: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_report_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN"))
+):
+    """Export the Parquet analytics snapshot (super admin only; normally run nightly by script)"""
+    try:
+        summary = await run_in_threadpool(export_analytics_snapshot, db, tables, full)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     
-    story.append(table)
-    return story
+    return {"tables": summary}
 
 
-def _build_compliance_audit_pdf(content: dict, styles) -> List:
-    """Build PDF content for compliance audit report"""
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import ParagraphStyle
-    
-    story = []
-    
-    # Summary
-    summary_style = ParagraphStyle('Summary', parent=styles['Normal'], fontSize=11, spaceAfter=12)
-    story.append(Paragraph(f"Total Signatures: {content['total_signatures']}", summary_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Table data
-    data = [["Date", "Owner", "Status", "Approved At", "Approver", "Reason"]]
-    
-    for signature in content['signatures']:
-        data.append([
-            signature['signature_date'][:10] if signature['signature_date'] else "",
-            signature['owner_name'],
-            signature['status'],
-            signature['approved_at'][:10] if signature['approved_at'] else "",
-            signature['approver_name'] or "",
-            (signature['approval_reason'] or "")[:40] + "..." if signature.get('approval_reason') and len(signature['approval_reason']) > 40 else (signature.get('approval_reason') or "")
-        ])
-    
-    # Create table
-    table = Table(data, colWidths=[0.8*inch, 1.2*inch, 0.8*inch, 0.8*inch, 1*inch, 1.5*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0D9488')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 7),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-    ]))
-    
-    story.append(table)
-    return story
-
+@router.get("/snapshots/manifest")
+async def get_analytics_snapshot_manifest(
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Manifest of the Parquet analytics snapshot (tables, columns, partitions)"""
+    return load_manifest()
 
-# Excel building functions
 
-def _build_building_progress_excel(ws, content: dict, start_row: int, header_fill, header_font, border) -> int:
-    """Build Excel content for building progress report"""
-    from openpyxl.styles import Alignment
-    
-    # Headers
-    headers = ["Building Name", "Project", "Address", "Units", "Signature %", "Status"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=start_row, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+@router.get("/snapshots/{table_name}/{partition}")
+async def download_analytics_snapshot_partition(
+    table_name: str,
+    partition: str,
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """Download one Parquet partition listed in the manifest"""
+    if table_name not in SNAPSHOT_TABLES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown snapshot table")
     
-    # Data rows
-    for idx, building in enumerate(content['buildings'], 1):
-        row = start_row + idx
-        ws.cell(row=row, column=1, value=building['building_name']).border = border
-        ws.cell(row=row, column=2, value=building['project_name']).border = border
-        ws.cell(row=row, column=3, value=building['address'] or "").border = border
-        ws.cell(row=row, column=4, value=building['total_units']).border = border
-        ws.cell(row=row, column=5, value=f"{building['signature_percentage']:.1f}%").border = border
-        ws.cell(row=row, column=6, value=building['traffic_light_status']).border = border
+    path = snapshot_file_path(table_name, partition)
+    if not path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Snapshot partition not found")
     
-    return start_row + len(content['buildings']) + 2
+    return FileResponse(
+        str(path),
+        media_type="application/vnd.apache.parquet",
+        filename=f"{table_name}_{partition}.parquet"
+    )
 
 
-def _build_agent_performance_excel(ws, content: dict, start_row: int, header_fill, header_font, border) -> int:
-    """Build Excel content for agent performance report"""
-    from openpyxl.styles import Alignment
-    
-    # Headers
-    headers = ["Agent Name", "Email", "Interactions", "Signed Docs", "Buildings", "Owners", "Success Rate"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=start_row, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+@router.post("/subscriptions", response_model=ReportSubscriptionResponse, status_code=status.HTTP_201_CREATED)
+async def create_report_subscription(
+    subscription_data: ReportSubscriptionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
+):
+    """
+    Subscribe to a recurring report
     
-    # Data rows
-    for idx, agent in enumerate(content['agents'], 1):
-        row = start_row + idx
-        ws.cell(row=row, column=1, value=agent['agent_name']).border = border
-        ws.cell(row=row, column=2, value=agent['email']).border = border
-        ws.cell(row=row, column=3, value=agent['total_interactions']).border = border
-        ws.cell(row=row, column=4, value=agent['signed_documents']).border = border
-        ws.cell(row=row, column=5, value=agent['assigned_buildings']).border = border
-        ws.cell(row=row, column=6, value=agent['assigned_owners']).border = border
-        ws.cell(row=row, column=7, value=f"{agent['success_rate']:.1f}%").border = border
+    The report is rendered ahead of time in the off-peak window (daily, on Mondays
+    or on the 1st of the month) and each recipient gets an in-app alert with a
+    download link. lookback_days sets a date range ending the day before each run.
+    """
+    recipient_ids = list(dict.fromkeys(subscription_data.recipient_user_ids))
+    if recipient_ids:
+        found = db.query(User.user_id).filter(User.user_id.in_(recipient_ids), User.is_active == True).count()
+        if found != len(recipient_ids):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown or inactive recipient users")
+    
+    subscription = ReportSubscription(
+        created_by_user_id=current_user.user_id,
+        name=subscription_data.name,
+        report_type=subscription_data.report_type.value,
+        report_format=subscription_data.format.value,
+        parameters={
+            "project_id": subscription_data.project_id,
+            "building_id": subscription_data.building_id,
+            "agent_id": subscription_data.agent_id,
+        },
+        lookback_days=subscription_data.lookback_days,
+        cadence=subscription_data.cadence,
+        recipient_user_ids=recipient_ids,
+        is_active=True,
+        next_run_at=next_run_time(subscription_data.cadence, datetime.utcnow()),
+    )
+    db.add(subscription)
+    db.commit()
+    db.refresh(subscription)
+    
+    return build_report_subscription_response(subscription)
+
+
+@router.get("/subscriptions", response_model=List[ReportSubscriptionResponse])
+async def list_report_subscriptions(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List subscriptions the current user created or receives (all of them for super admins)"""
+    query = db.query(ReportSubscription)
+    if current_user.role != "SUPER_ADMIN":
+        query = query.filter(
+            or_(
+                ReportSubscription.created_by_user_id == current_user.user_id,
+                ReportSubscription.recipient_user_ids.any(current_user.user_id)
+            )
+        )
+    subscriptions = query.order_by(ReportSubscription.created_at.desc()).all()
     
-    return start_row + len(content['agents']) + 2
+    return [build_report_subscription_response(s) for s in subscriptions]
 
 
-def _build_interaction_history_excel(ws, content: dict, start_row: int, header_fill, header_font, border) -> int:
-    """Build Excel content for interaction history report"""
-    from openpyxl.styles import Alignment
-    
-    # Headers
-    headers = ["Date", "Type", "Owner", "Agent", "Summary", "Sentiment"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=start_row, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Data rows
-    for idx, interaction in enumerate(content['interactions'], 1):
-        row = start_row + idx
-        ws.cell(row=row, column=1, value=interaction['interaction_date'][:10] if interaction['interaction_date'] else "").border = border
-        ws.cell(row=row, column=2, value=interaction['interaction_type']).border = border
-        ws.cell(row=row, column=3, value=interaction['owner_name']).border = border
-        ws.cell(row=row, column=4, value=interaction['agent_name']).border = border
-        ws.cell(row=row, column=5, value=interaction.get('summary', '')).border = border
-        ws.cell(row=row, column=6, value=interaction.get('sentiment', '')).border = border
-    
-    return start_row + len(content['interactions']) + 2
+@router.delete("/subscriptions/{subscription_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_report_subscription(
+    subscription_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Cancel a subscription and remove its latest report (creator or super admin)"""
+    subscription = db.query(ReportSubscription).filter(ReportSubscription.subscription_id == subscription_id).first()
+    if not subscription:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report subscription not found")
+    if subscription.created_by_user_id != current_user.user_id and current_user.role != "SUPER_ADMIN":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this subscription")
+    
+    if subscription.file_path and os.path.exists(subscription.file_path):
+        os.unlink(subscription.file_path)
+    db.delete(subscription)
+    db.commit()
+
+
+@router.get("/subscriptions/{subscription_id}/download")
+async def download_report_subscription(
+    subscription_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download the latest pre-rendered report of a subscription"""
+    subscription = db.query(ReportSubscription).filter(ReportSubscription.subscription_id == subscription_id).first()
+    if not subscription:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report subscription not found")
+    if not can_access_subscription(subscription, current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this subscription")
+    if not subscription.file_path or not os.path.exists(subscription.file_path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No report has been rendered for this subscription yet")
+    
+    _, media_type = REPORT_FILE_TYPES[ReportFormat(subscription.report_format)]
+    return FileResponse(subscription.file_path, media_type=media_type, filename=subscription.file_name)
+
+
+@router.get("/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get report job status and progress"""
+    return build_report_job_response(_get_visible_job(job_id, db, current_user))
 
 
-def _build_compliance_audit_excel(ws, content: dict, start_row: int, header_fill, header_font, border) -> int:
-    """Build Excel content for compliance audit report"""
-    from openpyxl.styles import Alignment
-    
-    # Headers
-    headers = ["Date", "Owner", "Status", "Approved At", "Approver", "Reason"]
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=start_row, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Data rows
-    for idx, signature in enumerate(content['signatures'], 1):
-        row = start_row + idx
-        ws.cell(row=row, column=1, value=signature['signature_date'][:10] if signature['signature_date'] else "").border = border
-        ws.cell(row=row, column=2, value=signature['owner_name']).border = border
-        ws.cell(row=row, column=3, value=signature['status']).border = border
-        ws.cell(row=row, column=4, value=signature['approved_at'][:10] if signature['approved_at'] else "").border = border
-        ws.cell(row=row, column=5, value=signature['approver_name'] or "").border = border
-        ws.cell(row=row, column=6, value=signature.get('approval_reason', '')).border = border
+@router.get("/jobs/{job_id}/download")
+async def download_report_job(
+    job_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Download the rendered file of a completed report job"""
+    job = _get_visible_job(job_id, db, current_user)
+    
+    if job.status == "EXPIRED":
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Report has expired, please generate it again")
+    if job.status != "COMPLETED" or not job.file_path:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Report is not ready. Current status: {job.status}"
+        )
+    if not os.path.exists(job.file_path):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Report file is no longer available")
     
-    return start_row + len(content['signatures']) + 2
-
+    _, media_type = REPORT_FILE_TYPES[ReportFormat(job.report_format)]
+    return FileResponse(job.file_path, media_type=media_type, filename=job.file_name)
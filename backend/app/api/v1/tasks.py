@@ -277,9 +277,11 @@ async def approve_signature(
             detail="Task does not have an associated owner"
         )
     
-    # Get owner
+    # Get owner, locked before the signature and the task (the order of
+    # services/signature_approval.py, so this and the approval queue endpoints
+    # wait for each other instead of deadlocking)
     from app.models.owner import Owner
-    owner = db.query(Owner).filter(Owner.owner_id == task.owner_id).first()
+    owner = db.query(Owner).filter(Owner.owner_id == task.owner_id).with_for_update().first()
     
     if not owner:
         raise HTTPException(
@@ -294,8 +296,26 @@ async def approve_signature(
             detail=f"Owner is not in WAIT_FOR_SIGN status. Current status: {owner.owner_status}"
         )
     
+    # Respect an approval queue claim on the linked signature
+    from app.services.signature_approval import claim_conflict
+    signature = db.query(DocumentSignature).filter(
+        DocumentSignature.task_id == task.task_id
+    ).with_for_update().first()
+    conflict = claim_conflict(signature, current_user) if signature else None
+    if conflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=conflict
+        )
+    if signature:
+        # The approval is decided; release the caller's queue claim on it
+        signature.claimed_by_user_id = None
+        signature.claim_expires_at = None
+        signature.version = signature.version + 1  # Rows are locked above
+    
     # Update owner status to SIGNED
     owner.owner_status = "SIGNED"
+    owner.version = owner.version + 1
     owner.signature_date = datetime.utcnow().date()
     
     # Mark task as completed
@@ -304,25 +324,11 @@ async def approve_signature(
     if approval_data and approval_data.notes:
         task.notes = (task.notes or "") + f"\n[Approval Notes]: {approval_data.notes}"
     
-    db.commit()
+    # Queue cascade recalculation with the approval
+    from app.services.signature_approval import queue_recalculation
+    queue_recalculation(db, {owner.unit_id})
     
-    # Trigger cascade recalculation
-    from app.models.unit import Unit
-    from app.models.building import Building
-    from app.services.unit_status import update_unit_status
-    from app.services.majority import calculate_building_majority, calculate_project_majority
-    
-    unit = db.query(Unit).filter(Unit.unit_id == owner.unit_id).first()
-    if unit:
-        try:
-            updated_status = update_unit_status(str(unit.unit_id), db)
-            building_result = calculate_building_majority(str(unit.building_id), db)
-            building = db.query(Building).filter(Building.building_id == unit.building_id).first()
-            if building:
-                project_result = calculate_project_majority(str(building.project_id), db)
-        except Exception as e:
-            logger.error(f"Failed to recalculate progress after signature approval: {e}")
-            # Don't fail the request, just log
+    db.commit()
     
     logger.info(
         "Signature approved via task",
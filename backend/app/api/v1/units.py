@@ -2,7 +2,7 @@
 Units API endpoints
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from uuid import UUID
@@ -12,6 +12,7 @@ from app.models.user import User
 from app.models.unit import Unit
 from app.models.building import Building
 from app.api.dependencies import get_current_user, require_role
+from app.api.concurrency import advance_version, parse_if_match, set_etag
 from app.services.unit_status import update_unit_status
 from app.services.majority import calculate_building_majority, calculate_project_majority
 from app.models.project import Project
@@ -163,6 +164,7 @@ async def create_unit(
 @router.get("/{unit_id}", response_model=UnitResponse)
 async def get_unit(
     unit_id: UUID,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -188,6 +190,7 @@ async def get_unit(
             )
     
     # Convert UUIDs to strings for response
+    set_etag(response, unit)
     return UnitResponse(
         unit_id=str(unit.unit_id),
         building_id=str(unit.building_id),
@@ -267,6 +270,8 @@ class UnitUpdate(BaseModel):
 async def update_unit(
     unit_id: UUID,
     unit_data: UnitUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_role("SUPER_ADMIN", "PROJECT_MANAGER"))
 ):
@@ -282,6 +287,9 @@ async def update_unit(
             detail="Unit not found"
         )
     
+    # With If-Match (the unit's ETag), fail with 409 if it changed since it was read
+    advance_version(db, unit, parse_if_match(if_match), "Unit")
+    
     # Update fields
     if unit_data.floor_number is not None:
         unit.floor_number = unit_data.floor_number
@@ -309,6 +317,7 @@ async def update_unit(
         }
     )
     
+    set_etag(response, unit)
     return UnitResponse(
         unit_id=str(unit.unit_id),
         building_id=str(unit.building_id),
@@ -3,7 +3,7 @@ Application configuration
 """
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from typing import List, Union
+from typing import List, Union, Dict
 import json
 import os
 
@@ -67,9 +67,79 @@ class Settings(BaseSettings):
     STORAGE_TYPE: str = "local"
     STORAGE_PATH: str = "/app/storage"
     
+    # Report read sessions (separate read-only REPEATABLE READ pool)
+    REPORT_DB_POOL_SIZE: int = 3
+    REPORT_DB_MAX_OVERFLOW: int = 2
+    REPORT_DB_STATEMENT_TIMEOUT_MS: int = 300000
+    
+    # Report jobs (background rendering into STORAGE_PATH/reports)
+    REPORT_JOB_WORKERS: int = 2
+    REPORT_JOB_MAX_ACTIVE_PER_USER: int = 3
+    REPORT_JOB_RETENTION_HOURS: int = 24
+    REPORT_JOB_HEARTBEAT_SECONDS: int = 15
+    REPORT_JOB_STALE_SECONDS: int = 120  # RUNNING jobs without a heartbeat this long are failed on startup
+    
+    # Report cache (rendered PDF/Excel artifacts in STORAGE_PATH/report_cache)
+    REPORT_CACHE_ENABLED: bool = True
+    REPORT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    
+    # PDF rendering process pool (0 renders in the calling thread)
+    REPORT_PDF_WORKERS: int = 2
+    REPORT_PDF_MAX_QUEUED: int = 8
+    
+    # Analytics engine (DuckDB over the Parquet snapshot in STORAGE_PATH/analytics)
+    ANALYTICS_ENGINE_ENABLED: bool = True
+    ANALYTICS_ENGINE_MIN_RANGE_DAYS: int = 90
+    ANALYTICS_ENGINE_THREADS: int = 2
+    ANALYTICS_SNAPSHOT_MAX_AGE_HOURS: int = 48
+    
+    # Report subscriptions (pre-rendered off-peak into STORAGE_PATH/reports/subscriptions)
+    REPORT_SUBSCRIPTION_OFF_PEAK_START_HOUR: int = 2  # UTC, inclusive
+    REPORT_SUBSCRIPTION_OFF_PEAK_END_HOUR: int = 5  # UTC, exclusive
+    
+    # Background job queue (background_jobs table, run by scripts/run_job_worker.py)
+    JOB_QUEUE_CONCURRENCY: Dict[str, int] = {"default": 4, "alerts": 1, "recalculations": 2, "reports": 2}
+    JOB_QUEUE_POLL_SECONDS: float = 2.0
+    JOB_QUEUE_MAX_ATTEMPTS: int = 5
+    JOB_QUEUE_BACKOFF_BASE_SECONDS: int = 30
+    JOB_QUEUE_BACKOFF_MAX_SECONDS: int = 3600
+    JOB_QUEUE_LEASE_SECONDS: int = 900
+    JOB_QUEUE_RETENTION_DAYS: int = 7
+    
+    # Periodic scheduler (runs in one job worker, elected through an advisory lock)
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_TICK_SECONDS: int = 15
+    SCHEDULER_DISABLED_SCHEDULES: List[str] = []
+    
+    # Alert checks (incremental from per-check watermarks, see alert_engine)
+    ALERT_FULL_SWEEP_HOURS: int = 24
+    ALERT_WATERMARK_OVERLAP_SECONDS: int = 300
+    
+    # Alert delivery (alerts.deliver job, see alert_delivery)
+    ALERT_DELIVERY_BATCH_SIZE: int = 500
+    ALERT_DIGEST_THRESHOLD: int = 5  # Alerts per recipient and channel in one batch that become a digest
+    ALERT_DELIVERY_RATE_LIMITS: Dict[str, float] = {"WHATSAPP": 10.0, "SMS": 5.0, "EMAIL": 20.0}  # Messages per second
+    ALERT_DELIVERY_CONCURRENCY: Dict[str, int] = {"WHATSAPP": 4, "SMS": 2, "EMAIL": 4}
+    ALERT_DELIVERY_MAX_ATTEMPTS: int = 5  # Failed runs after which an alert is no longer sent (it stays in the inbox)
+    ALERT_DELIVERY_BACKOFF_BASE_SECONDS: int = 60
+    ALERT_DELIVERY_BACKOFF_MAX_SECONDS: int = 3600
+    
+    # Approval queue claims (GET /approvals/queue?claim=true)
+    APPROVAL_CLAIM_LEASE_SECONDS: int = 900
+    APPROVAL_CLAIM_BATCH_SIZE: int = 10
+    
+    # Approval task assignment (see services/task_creation.py)
+    APPROVAL_TASKS_PREFER_PROJECT_MANAGER: bool = False  # Otherwise the least-loaded manager/admin
+    
+    # Idempotency-Key support for POST/PUT/PATCH (see api/middleware.py)
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS: int = 300  # Then a retry may take over the key
+    IDEMPOTENCY_MAX_RESPONSE_BYTES: int = 1024 * 1024  # Larger responses are not stored
+    
     # Mock Services (Phase 1)
     MOCK_WHATSAPP_ENABLED: bool = True
     MOCK_SMS_ENABLED: bool = True
+    MOCK_EMAIL_ENABLED: bool = True
     
     # Logging
     LOG_LEVEL: str = "DEBUG"
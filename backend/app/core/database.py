@@ -17,6 +17,20 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only engine for reports and exports: REPEATABLE READ gives every report
+# one consistent snapshot across its queries, the small separate pool keeps long
+# reads from starving API requests, and statement_timeout bounds runaway scans
+report_read_engine = create_engine(
+    settings.DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=settings.REPORT_DB_POOL_SIZE,
+    max_overflow=settings.REPORT_DB_MAX_OVERFLOW,
+    isolation_level="REPEATABLE READ",
+    connect_args={"options": f"-c statement_timeout={settings.REPORT_DB_STATEMENT_TIMEOUT_MS}"},
+).execution_options(postgresql_readonly=True)
+
+ReportSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=report_read_engine)
+
 # Base class for models
 Base = declarative_base()
 
@@ -29,3 +43,12 @@ def get_db():
     finally:
         db.close()
 
+
+def get_report_db():
+    """Dependency for getting a read-only, REPEATABLE READ report session"""
+    db = ReportSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
@@ -6,11 +6,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.logging import setup_logging
-from app.api.middleware import RequestIDMiddleware
-from app.api.v1 import auth, projects, buildings, units, owners, wizard, interactions, documents, approvals, majority, tasks, dashboard, whatsapp, files, agents, reports, alerts, users
+from app.api.middleware import RequestIDMiddleware, IdempotencyMiddleware
+from app.core.database import SessionLocal
+from app.services.report_jobs import recover_interrupted_report_jobs, shutdown_report_workers
+from app.services.report_pdf import shutdown_pdf_workers
+import logging
+from app.api.v1 import auth, projects, buildings, units, owners, wizard, interactions, documents, approvals, majority, tasks, dashboard, whatsapp, files, agents, reports, alerts, users, jobs
 
 # Setup logging first
 setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="TAMA38 API",
@@ -20,6 +25,9 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+# Idempotency-Key replay (innermost, so replayed responses still get CORS and request ID headers)
+app.add_middleware(IdempotencyMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed"],  # ETag is read by clients for If-Match (see api/concurrency.py)
 )
 
 # Request ID middleware
@@ -51,6 +60,26 @@ app.include_router(agents.router, prefix=settings.API_V1_PREFIX)
 app.include_router(reports.router, prefix=settings.API_V1_PREFIX)
 app.include_router(alerts.router, prefix=settings.API_V1_PREFIX)
 app.include_router(users.router, prefix=settings.API_V1_PREFIX)
+app.include_router(jobs.router, prefix=settings.API_V1_PREFIX)
+
+
+@app.on_event("startup")
+async def resume_report_jobs():
+    """Re-queue report jobs left behind by a previous process"""
+    db = SessionLocal()
+    try:
+        recover_interrupted_report_jobs(db)
+    except Exception as e:
+        logger.error(f"Failed to recover report jobs: {e}")
+    finally:
+        db.close()
+
+
+@app.on_event("shutdown")
+async def stop_report_workers():
+    """Stop the report worker pools"""
+    shutdown_report_workers()
+    shutdown_pdf_workers()
 
 
 @app.get("/health")
@@ -12,7 +12,11 @@ from app.models.document import Document, DocumentSignature
 from app.models.task import Task
 from app.models.wizard import WizardDraft
 from app.models.audit import AuditLog
-from app.models.alert import Alert, AlertRule
+from app.models.alert import Alert, AlertRule, AlertCheckWatermark, AlertInboxCounter
+from app.models.report_job import ReportJob
+from app.models.report_subscription import ReportSubscription
+from app.models.background_job import BackgroundJob
+from app.models.idempotency import IdempotencyKey
 
 __all__ = [
     "User",
@@ -28,4 +32,10 @@ __all__ = [
     "AuditLog",
     "Alert",
     "AlertRule",
+    "AlertCheckWatermark",
+    "AlertInboxCounter",
+    "ReportJob",
+    "ReportSubscription",
+    "BackgroundJob",
+    "IdempotencyKey",
 ]
@@ -1,7 +1,7 @@
 """
 Alert Models
 """
-from sqlalchemy import Column, String, Enum, Text, Boolean, DateTime, ForeignKey, Index, JSON, Numeric
+from sqlalchemy import Column, String, Enum, Text, Boolean, Integer, DateTime, ForeignKey, Index, JSON, Numeric, text
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
 import uuid
@@ -52,6 +52,7 @@ class Alert(Base):
         'PENDING_APPROVAL',
         'OWNERSHIP_TRANSFER',
         'SYSTEM_ERROR',
+        'REPORT_READY',
         name='alert_type'
     ), nullable=False)
     severity = Column(Enum('LOW', 'MEDIUM', 'HIGH', 'CRITICAL', name='alert_severity'), nullable=False)
@@ -79,6 +80,9 @@ class Alert(Base):
     # Delivery tracking
     delivery_channels = Column(ARRAY(String))  # Channels used to deliver this alert
     delivered_at = Column(DateTime, nullable=True)
+    delivery_attempts = Column(Integer, nullable=False, default=0, server_default='0')  # Runs in which a send failed
+    next_delivery_at = Column(DateTime, nullable=True)  # Backoff after a failed run
+    delivered_to = Column(ARRAY(String))  # 'CHANNEL:user_id' sends that succeeded on a run where others failed
     
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -102,5 +106,25 @@ class Alert(Base):
         Index('idx_alerts_project', 'project_id'),
         Index('idx_alerts_building', 'building_id'),
         Index('idx_alerts_agent', 'agent_id'),
+        Index('idx_alerts_undelivered', 'created_at', postgresql_where=text("status = 'ACTIVE' AND delivered_at IS NULL")),
     )
 
+
+class AlertCheckWatermark(Base):
+    """Alert Check Watermark model - Where each alert check's incremental evaluation resumes"""
+    __tablename__ = "alert_check_watermarks"
+    
+    check_name = Column(String(50), primary_key=True)
+    last_run_at = Column(DateTime, nullable=False)  # Start of the last run; the next one looks at changes since then
+    last_full_sweep_at = Column(DateTime)
+    last_created = Column(Integer, default=0)  # Alerts created by the last run
+    last_duration_ms = Column(Integer)
+
+
+class AlertInboxCounter(Base):
+    """Alert Inbox Counter model - Unread (ACTIVE) alerts per inbox, maintained as alerts change status"""
+    __tablename__ = "alert_inbox_counters"
+    
+    inbox_key = Column(String(64), primary_key=True)  # Agent user_id, or 'ALL' for the shared inbox of every other role
+    unread_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,43 @@
+"""
+Background Job Model
+"""
+from sqlalchemy import Column, String, Enum, Text, Integer, DateTime, Index, JSON, text
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from datetime import datetime
+from app.core.database import Base
+
+
+class BackgroundJob(Base):
+    """Background Job model - Work queued in Postgres and executed by job workers"""
+    __tablename__ = "background_jobs"
+    
+    job_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    queue = Column(String(50), nullable=False, default="default")
+    job_type = Column(String(100), nullable=False)  # Registered handler name, e.g. alerts.run_checks
+    payload = Column(JSON)
+    status = Column(Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'CANCELLED', name='background_job_status'), nullable=False, default='QUEUED')
+    priority = Column(Integer, nullable=False, default=0)  # Higher runs first
+    dedupe_key = Column(String(255))  # At most one QUEUED job per key
+    
+    # Retries
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not before (backoff after failures)
+    last_error = Column(Text)
+    result = Column(JSON)
+    
+    # Lease held by the worker running the job
+    locked_by = Column(String(255))
+    locked_at = Column(DateTime)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_background_jobs_ready', 'queue', 'priority', 'run_at', postgresql_where=text("status = 'QUEUED'")),
+        Index('idx_background_jobs_status', 'status'),
+        Index('idx_background_jobs_dedupe', 'dedupe_key', unique=True, postgresql_where=text("status = 'QUEUED'")),
+    )
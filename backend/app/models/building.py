@@ -44,6 +44,7 @@ class Building(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_deleted = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default='1')  # Advanced by API writes, sent as the ETag (see api/concurrency.py)
     
     # Relationships
     project = relationship("Project", back_populates="buildings")
@@ -55,5 +56,6 @@ class Building(Base):
         Index('idx_buildings_status', 'current_status'),
         Index('idx_buildings_signature_pct', 'signature_percentage'),
         Index('idx_buildings_traffic_light', 'traffic_light_status'),
+        Index('idx_buildings_updated_at', 'updated_at'),
     )
 
@@ -1,7 +1,7 @@
 """
 Document Model
 """
-from sqlalchemy import Column, String, Enum, Text, Integer, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy import Column, String, Enum, Text, Integer, Boolean, DateTime, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -59,10 +59,13 @@ class DocumentSignature(Base):
     rejected_by_user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'))
     rejected_at = Column(DateTime)
     rejection_reason = Column(Text)
+    claimed_by_user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), nullable=True)  # Manager working it in the approval queue
+    claim_expires_at = Column(DateTime, nullable=True)  # Lease end; an expired claim can be taken by anyone
     is_manual_override = Column(Boolean, default=False)
     manual_override_reason = Column(Text)  # Required for manual override
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default='1')  # Advanced by API writes, sent as the ETag (see api/concurrency.py)
     
     # Relationships
     document = relationship("Document", back_populates="signatures", foreign_keys="[DocumentSignature.document_id]")
@@ -72,5 +75,8 @@ class DocumentSignature(Base):
         Index('idx_signatures_owner_id', 'owner_id'),
         Index('idx_signatures_status', 'signature_status'),
         Index('idx_signatures_token', 'signing_token'),
+        Index('idx_signatures_status_created', 'signature_status', 'created_at'),
+        Index('idx_signatures_updated_at', 'updated_at'),
+        Index('idx_signatures_pending_approval', 'signed_at', postgresql_where=text("signature_status = 'SIGNED_PENDING_APPROVAL'")),
     )
 
@@ -0,0 +1,31 @@
+"""
+Idempotency Key Model
+"""
+from sqlalchemy import Column, String, Enum, Integer, DateTime, ForeignKey, Index, JSON, LargeBinary
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+    """Idempotency Key model - Stored response of a write request, replayed when the client retries with the same key"""
+    __tablename__ = "idempotency_keys"
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), primary_key=True)
+    idempotency_key = Column(String(255), primary_key=True)  # Idempotency-Key header, chosen by the client
+    request_fingerprint = Column(String(64), nullable=False)  # SHA-256 of method, path and body
+    status = Column(Enum('IN_PROGRESS', 'COMPLETED', name='idempotency_key_status'), nullable=False, default='IN_PROGRESS')
+    locked_until = Column(DateTime)  # An IN_PROGRESS key past this was abandoned and can be taken over
+    
+    # Response replayed to retries
+    response_status_code = Column(Integer)
+    response_headers = Column(JSON)
+    response_body = Column(LargeBinary)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_idempotency_keys_expires_at', 'expires_at'),
+    )
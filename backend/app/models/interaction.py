@@ -39,5 +39,6 @@ class Interaction(Base):
         Index('idx_interactions_agent_id', 'agent_id'),
         Index('idx_interactions_date', 'interaction_date'),
         Index('idx_interactions_outcome', 'outcome'),
+        Index('idx_interactions_created_at', 'created_at'),
     )
 
@@ -1,7 +1,7 @@
 """
 Owner Model
 """
-from sqlalchemy import Column, String, Enum, Text, Numeric, Boolean, Date, DateTime, ForeignKey, Index
+from sqlalchemy import Column, String, Enum, Text, Integer, Numeric, Boolean, Date, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, BYTEA
 from sqlalchemy.orm import relationship
 import uuid
@@ -44,6 +44,7 @@ class Owner(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_deleted = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default='1')  # Advanced by API writes, sent as the ETag (see api/concurrency.py)
     
     # Relationships
     unit = relationship("Unit", back_populates="owners")
@@ -53,6 +54,7 @@ class Owner(Base):
         Index('idx_owners_unit_id', 'unit_id'),
         Index('idx_owners_status', 'owner_status'),
         Index('idx_owners_agent', 'assigned_agent_id'),
+        Index('idx_owners_updated_at', 'updated_at'),
         # Indexes for multi-unit ownership lookups
         Index('idx_owners_id_hash', 'id_number_hash'),
         Index('idx_owners_phone_hash', 'phone_hash'),
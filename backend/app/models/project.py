@@ -48,5 +48,6 @@ class Project(Base):
         Index('idx_projects_city', 'location_city'),
         Index('idx_projects_status', 'project_stage'),
         Index('idx_projects_created_by', 'created_by'),
+        Index('idx_projects_updated_at', 'updated_at'),
     )
 
@@ -0,0 +1,45 @@
+"""
+Report Job Model
+"""
+from sqlalchemy import Column, String, Enum, Text, Integer, BigInteger, DateTime, ForeignKey, Index, JSON
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from datetime import datetime
+from app.core.database import Base
+
+
+class ReportJob(Base):
+    """Report Job model - Reports rendered in the background to the storage directory"""
+    __tablename__ = "report_jobs"
+    
+    job_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    requested_by_user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), nullable=False)
+    report_type = Column(String(50), nullable=False)
+    report_format = Column(String(20), nullable=False)
+    parameters = Column(JSON)  # ReportRequest fields (filters, date range)
+    status = Column(Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'EXPIRED', name='report_job_status'), nullable=False, default='QUEUED')
+    progress_percent = Column(Integer, default=0)
+    rows_processed = Column(Integer, default=0)
+    rows_estimated = Column(Integer)  # Planner estimate the progress percentage is derived from
+    
+    # Artifact
+    file_path = Column(String(500))
+    file_name = Column(String(255))
+    file_size_bytes = Column(BigInteger)
+    error_message = Column(Text)
+    
+    # Timing metrics
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # Refreshed by the worker while RUNNING
+    queue_wait_ms = Column(Integer)
+    render_ms = Column(Integer)
+    expires_at = Column(DateTime)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_report_jobs_user', 'requested_by_user_id'),
+        Index('idx_report_jobs_status', 'status'),
+        Index('idx_report_jobs_expires', 'expires_at'),
+    )
@@ -0,0 +1,45 @@
+"""
+Report Subscription Model
+"""
+from sqlalchemy import Column, String, Enum, Text, Integer, BigInteger, Boolean, DateTime, ForeignKey, Index, JSON
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
+import uuid
+from datetime import datetime
+from app.core.database import Base
+
+
+class ReportSubscription(Base):
+    """Report Subscription model - Recurring reports pre-rendered off-peak and delivered as in-app alerts"""
+    __tablename__ = "report_subscriptions"
+    
+    subscription_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    created_by_user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id'), nullable=False)
+    name = Column(String(255), nullable=False)
+    report_type = Column(String(50), nullable=False)
+    report_format = Column(String(20), nullable=False)
+    parameters = Column(JSON)  # Report filters (project_id, building_id, agent_id)
+    lookback_days = Column(Integer)  # Date range ending the day before each run; NULL = all dates
+    cadence = Column(Enum('DAILY', 'WEEKLY', 'MONTHLY', name='report_subscription_cadence'), nullable=False)
+    recipient_user_ids = Column(ARRAY(UUID(as_uuid=True)))  # Empty = the creator only
+    is_active = Column(Boolean, default=True, nullable=False)
+    
+    # Scheduling
+    next_run_at = Column(DateTime, nullable=False)
+    last_run_at = Column(DateTime)
+    last_status = Column(String(20))  # RUNNING, COMPLETED, FAILED
+    last_error = Column(Text)
+    
+    # Latest rendered artifact
+    file_path = Column(String(500))
+    file_name = Column(String(255))
+    file_size_bytes = Column(BigInteger)
+    rows_rendered = Column(Integer)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_report_subscriptions_due', 'is_active', 'next_run_at'),
+        Index('idx_report_subscriptions_user', 'created_by_user_id'),
+    )
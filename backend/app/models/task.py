@@ -37,5 +37,6 @@ class Task(Base):
         Index('idx_tasks_assigned_to', 'assigned_to_agent_id'),
         Index('idx_tasks_status', 'status'),
         Index('idx_tasks_due_date', 'due_date'),
+        Index('idx_tasks_updated_at', 'updated_at'),
     )
 
@@ -40,6 +40,7 @@ class Unit(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_deleted = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default='1')  # Advanced by API writes, sent as the ETag (see api/concurrency.py)
     
     # Relationships
     building = relationship("Building", back_populates="units")
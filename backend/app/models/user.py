@@ -29,5 +29,6 @@ class User(Base):
     __table_args__ = (
         Index('idx_users_email', 'email'),
         Index('idx_users_role', 'role'),
+        Index('idx_users_updated_at', 'updated_at'),
     )
 
@@ -0,0 +1,390 @@
+"""
+Alert Delivery Service
+Delivers new alerts over their delivery_channels (IN_APP, WHATSAPP, SMS, EMAIL)
+and stamps delivered_at. Runs as the alerts.deliver job: every minute from the
+scheduler and right after alert checks that created alerts.
+
+Pending alerts are read in batches and fanned out per (recipient, channel).
+When one recipient has ALERT_DIGEST_THRESHOLD or more alerts for a channel in
+a batch, they get a single digest message instead of one message per alert.
+Each external channel sends through its own thread pool
+(ALERT_DELIVERY_CONCURRENCY) and rate limiter (ALERT_DELIVERY_RATE_LIMITS,
+messages per second). IN_APP needs no send: the alert is already in the inbox.
+
+An alert is stamped delivered once every send to it succeeded. If any send
+failed, the sends that succeeded are remembered in delivered_to and only the
+failed (recipient, channel) pairs are retried, with exponential backoff, for up
+to ALERT_DELIVERY_MAX_ATTEMPTS runs; after that the alert is only in-app.
+
+The alerts queue runs one job at a time across all workers (see
+JOB_QUEUE_CONCURRENCY), so a batch is never delivered twice and no row locks
+are held while messages are sent.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import update, or_
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Tuple, Callable
+import threading
+import time
+import uuid
+import logging
+
+from app.core.config import settings
+from app.models.alert import Alert
+from app.models.building import Building
+from app.models.project import Project
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Most alerts a digest message lists by title
+DIGEST_MAX_TITLES = 5
+
+
+class RateLimiter:
+    """Token bucket shared by the sending threads of one channel"""
+    
+    def __init__(self, rate_per_second: float):
+        self.rate = rate_per_second
+        self.capacity = max(1.0, rate_per_second)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(channel: str) -> RateLimiter:
+    with _rate_limiters_lock:
+        if channel not in _rate_limiters:
+            _rate_limiters[channel] = RateLimiter(settings.ALERT_DELIVERY_RATE_LIMITS.get(channel, 0))
+        return _rate_limiters[channel]
+
+
+class Recipient:
+    """The contact details a channel needs"""
+    
+    def __init__(self, user: User):
+        self.user_id = user.user_id
+        self.name = user.full_name
+        self.email = user.email
+        self.phone = user.phone
+
+
+class Message:
+    """One send: a single alert or a digest of several, to one recipient on one channel"""
+    
+    def __init__(self, channel: str, recipient: Recipient, alerts: List[Alert]):
+        self.channel = channel
+        self.recipient = recipient
+        self.alert_ids = [alert.alert_id for alert in alerts]
+        self.is_digest = len(alerts) > 1
+        self.sent: Optional[bool] = False  # None when the channel is disabled
+        if self.is_digest:
+            self.subject, self.body = _digest_text(alerts)
+        else:
+            self.subject, self.body = alerts[0].title, alerts[0].message
+
+
+def _digest_text(alerts: List[Alert]) -> Tuple[str, str]:
+    by_severity: Dict[str, int] = {}
+    for alert in alerts:
+        by_severity[alert.severity] = by_severity.get(alert.severity, 0) + 1
+    counts = ", ".join(
+        f"{by_severity[severity]} {severity}"
+        for severity in ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+        if severity in by_severity
+    )
+    titles = [f"- {alert.title}" for alert in alerts[:DIGEST_MAX_TITLES]]
+    if len(alerts) > DIGEST_MAX_TITLES:
+        titles.append(f"...and {len(alerts) - DIGEST_MAX_TITLES} more")
+    return f"{len(alerts)} new alerts ({counts})", "\n".join(titles)
+
+
+def _send_mock(channel: str, address: Optional[str], message: Message) -> dict:
+    """Phase 1 stand-in for a provider call: logs the message"""
+    if not address:
+        raise ValueError(f"Recipient has no address for {channel}")
+    message_id = str(uuid.uuid4())
+    logger.info(
+        f"Mock {channel} alert message sent",
+        extra={
+            "message_id": message_id,
+            "to": address,
+            "recipient_user_id": str(message.recipient.user_id),
+            "alerts": len(message.alert_ids),
+            "digest": message.is_digest,
+        }
+    )
+    return {"message_id": message_id, "status": "QUEUED"}
+
+
+# Channels an alert or alert rule may list in delivery_channels
+DELIVERY_CHANNELS = ("IN_APP", "WHATSAPP", "SMS", "EMAIL")
+
+# Senders of external channels; a channel whose sender is disabled is skipped
+CHANNEL_SENDERS: Dict[str, Tuple[Callable[[], bool], Callable[[Message], dict]]] = {
+    "WHATSAPP": (lambda: settings.MOCK_WHATSAPP_ENABLED, lambda message: _send_mock("WHATSAPP", message.recipient.phone, message)),
+    "SMS": (lambda: settings.MOCK_SMS_ENABLED, lambda message: _send_mock("SMS", message.recipient.phone, message)),
+    "EMAIL": (lambda: settings.MOCK_EMAIL_ENABLED, lambda message: _send_mock("EMAIL", message.recipient.email, message)),
+}
+
+# The recipient detail each external channel sends to
+CHANNEL_ADDRESSES: Dict[str, Callable[[Recipient], Optional[str]]] = {
+    "WHATSAPP": lambda recipient: recipient.phone,
+    "SMS": lambda recipient: recipient.phone,
+    "EMAIL": lambda recipient: recipient.email,
+}
+
+
+def _pending_alerts(db: Session, limit: int, exclude_ids: set) -> List[Alert]:
+    query = db.query(Alert).filter(
+        Alert.status == "ACTIVE",
+        Alert.delivered_at.is_(None),
+        Alert.delivery_attempts < settings.ALERT_DELIVERY_MAX_ATTEMPTS,
+        or_(Alert.next_delivery_at.is_(None), Alert.next_delivery_at <= datetime.utcnow())
+    )
+    if exclude_ids:
+        query = query.filter(~Alert.alert_id.in_(exclude_ids))
+    return query.order_by(Alert.created_at).limit(limit).all()
+
+
+def _resolve_recipients(db: Session, alerts: List[Alert]) -> Dict[uuid.UUID, List[Recipient]]:
+    """
+    Recipients of each alert: its agent, the assigned agent of its building
+    and the manager of its project (three queries for the whole batch)
+    """
+    building_ids = {alert.building_id for alert in alerts if alert.building_id}
+    buildings = {
+        building_id: (agent_id, project_id)
+        for building_id, agent_id, project_id in db.query(
+            Building.building_id, Building.assigned_agent_id, Building.project_id
+        ).filter(Building.building_id.in_(building_ids))
+    } if building_ids else {}
+    
+    project_ids = {alert.project_id for alert in alerts if alert.project_id}
+    project_ids.update(project_id for _, project_id in buildings.values() if project_id)
+    managers = dict(
+        db.query(Project.project_id, Project.project_manager_id).filter(Project.project_id.in_(project_ids))
+    ) if project_ids else {}
+    
+    user_ids_by_alert = {}
+    for alert in alerts:
+        agent_id, building_project_id = buildings.get(alert.building_id, (None, None))
+        user_ids = [
+            alert.agent_id,
+            agent_id,
+            managers.get(alert.project_id or building_project_id),
+        ]
+        user_ids_by_alert[alert.alert_id] = list(dict.fromkeys(user_id for user_id in user_ids if user_id))
+    
+    all_user_ids = {user_id for user_ids in user_ids_by_alert.values() for user_id in user_ids}
+    users = {
+        user.user_id: Recipient(user)
+        for user in db.query(User).filter(
+            User.user_id.in_(all_user_ids),
+            User.is_active == True
+        )
+    } if all_user_ids else {}
+    
+    return {
+        alert_id: [users[user_id] for user_id in user_ids if user_id in users]
+        for alert_id, user_ids in user_ids_by_alert.items()
+    }
+
+
+def _send_key(channel: str, user_id: uuid.UUID) -> str:
+    """How a successful send is recorded in Alert.delivered_to"""
+    return f"{channel}:{user_id}"
+
+
+def build_messages(alerts: List[Alert], recipients: Dict[uuid.UUID, List[Recipient]]) -> List[Message]:
+    """
+    Group alerts per (recipient, external channel), coalescing bursts into
+    digests; sends that already succeeded on an earlier run are left out
+    """
+    groups: Dict[Tuple[uuid.UUID, str], Tuple[Recipient, List[Alert]]] = {}
+    for alert in alerts:
+        already_sent = set(alert.delivered_to or [])
+        for channel in alert.delivery_channels or ["IN_APP"]:
+            if channel not in CHANNEL_SENDERS:
+                continue
+            for recipient in recipients.get(alert.alert_id, []):
+                if not CHANNEL_ADDRESSES[channel](recipient):
+                    continue  # No phone/email on file: the in-app alert is all they get
+                if _send_key(channel, recipient.user_id) in already_sent:
+                    continue
+                groups.setdefault((recipient.user_id, channel), (recipient, []))[1].append(alert)
+    
+    messages = []
+    for (_, channel), (recipient, group) in groups.items():
+        if len(group) >= settings.ALERT_DIGEST_THRESHOLD:
+            messages.append(Message(channel, recipient, group))
+        else:
+            messages.extend(Message(channel, recipient, [alert]) for alert in group)
+    return messages
+
+
+def _send(message: Message) -> bool:
+    _, sender = CHANNEL_SENDERS[message.channel]
+    get_rate_limiter(message.channel).acquire()
+    try:
+        sender(message)
+        return True
+    except Exception as e:
+        logger.warning(
+            f"Alert delivery failed on {message.channel}: {e}",
+            extra={"recipient_user_id": str(message.recipient.user_id), "alerts": len(message.alert_ids)}
+        )
+        return False
+
+
+def send_messages(messages: List[Message]) -> Dict[str, Dict[str, int]]:
+    """
+    Send messages, each channel on its own pool, setting `message.sent`;
+    returns per-channel counts
+    """
+    by_channel: Dict[str, List[Message]] = {}
+    for message in messages:
+        by_channel.setdefault(message.channel, []).append(message)
+    
+    stats = {}
+    executors = []
+    futures = []
+    try:
+        for channel, channel_messages in by_channel.items():
+            enabled, _ = CHANNEL_SENDERS[channel]
+            if not enabled():
+                for message in channel_messages:
+                    message.sent = None
+                stats[channel] = {"sent": 0, "digests": 0, "failed": 0, "skipped": len(channel_messages)}
+                continue
+            executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.ALERT_DELIVERY_CONCURRENCY.get(channel, 1)),
+                thread_name_prefix=f"alert-{channel.lower()}"
+            )
+            executors.append(executor)
+            stats[channel] = {"sent": 0, "digests": 0, "failed": 0, "skipped": 0}
+            futures.extend((message, executor.submit(_send, message)) for message in channel_messages)
+    
+        for message, future in futures:
+            message.sent = future.result()
+            channel_stats = stats[message.channel]
+            if message.sent:
+                channel_stats["sent"] += 1
+                channel_stats["digests"] += int(message.is_digest)
+            else:
+                channel_stats["failed"] += 1
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=True)
+    return stats
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next run that retries an alert with `attempts` failed runs"""
+    delay = min(
+        settings.ALERT_DELIVERY_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.ALERT_DELIVERY_BACKOFF_MAX_SECONDS
+    )
+    return timedelta(seconds=delay)
+
+
+def deliver_pending_alerts(db: Session, max_batches: Optional[int] = None) -> dict:
+    """
+    Deliver undelivered ACTIVE alerts in batches of ALERT_DELIVERY_BATCH_SIZE
+    
+    An alert is stamped delivered once none of its sends failed (disabled
+    channels don't count); delivered_at is set with one UPDATE per batch.
+    Alerts with failed sends get one UPDATE each recording the attempt, its
+    backoff and the sends that did succeed, so a retry only resends the rest.
+    """
+    summary = {"alerts": 0, "delivered": 0, "retrying": 0, "abandoned": 0, "channels": {}}
+    batches = 0
+    retry_ids = set()
+    
+    while max_batches is None or batches < max_batches:
+        alerts = _pending_alerts(db, settings.ALERT_DELIVERY_BATCH_SIZE, retry_ids)
+        if not alerts:
+            break
+        batches += 1
+    
+        recipients = _resolve_recipients(db, alerts)
+        messages = build_messages(alerts, recipients)
+        for channel, counts in send_messages(messages).items():
+            channel_summary = summary["channels"].setdefault(channel, {"sent": 0, "digests": 0, "failed": 0, "skipped": 0})
+            for key, value in counts.items():
+                channel_summary[key] += value
+    
+        failed_ids = set()
+        succeeded: Dict[uuid.UUID, List[str]] = {}
+        for message in messages:
+            if message.sent is None:
+                continue
+            for alert_id in message.alert_ids:
+                if message.sent:
+                    succeeded.setdefault(alert_id, []).append(_send_key(message.channel, message.recipient.user_id))
+                else:
+                    failed_ids.add(alert_id)
+        delivered_ids = [alert.alert_id for alert in alerts if alert.alert_id not in failed_ids]
+    
+        now = datetime.utcnow()
+        if delivered_ids:
+            db.execute(
+                update(Alert)
+                .where(Alert.alert_id.in_(delivered_ids))
+                .values(delivered_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        for alert in alerts:
+            if alert.alert_id not in failed_ids:
+                continue
+            attempts = alert.delivery_attempts + 1
+            db.execute(
+                update(Alert)
+                .where(Alert.alert_id == alert.alert_id)
+                .values(
+                    delivery_attempts=attempts,
+                    next_delivery_at=now + retry_delay(attempts),
+                    delivered_to=list(alert.delivered_to or []) + succeeded.get(alert.alert_id, [])
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if attempts >= settings.ALERT_DELIVERY_MAX_ATTEMPTS:
+                summary["abandoned"] += 1
+                logger.warning(
+                    f"Giving up external delivery of alert {alert.alert_id} after {attempts} failed runs",
+                    extra={"alert_type": alert.alert_type}
+                )
+        db.commit()
+        db.expunge_all()
+    
+        # Failed alerts wait for their backoff, not the next batch
+        retry_ids.update(failed_ids)
+        summary["alerts"] += len(alerts)
+        summary["delivered"] += len(delivered_ids)
+    
+    summary["retrying"] = len(retry_ids) - summary["abandoned"]
+    if summary["alerts"]:
+        logger.info(
+            f"Delivered {summary['delivered']} of {summary['alerts']} alerts",
+            extra={"channels": summary["channels"], "retrying": summary["retrying"], "abandoned": summary["abandoned"]}
+        )
+    return summary
@@ -1,248 +1,346 @@
 """
 Alert Rules Engine
 Checks conditions and generates alerts
+
+Every check is a single INSERT ... SELECT: the SELECT finds all entities that
+violate the rule and anti-joins them against their ACTIVE alerts of the same
+type, so each run creates all missing alerts in one statement and returns how
+many it created.
+
+run_alert_checks evaluates incrementally: each check keeps a watermark (the
+start of its last run) in alert_check_watermarks and only looks at entities
+that changed or crossed a time threshold since then. A full sweep still runs
+every ALERT_FULL_SWEEP_HOURS to catch anything the watermark filter can't see.
+
+Active rows of alert_rules (see alert_rules) replace the built-in check of
+their rule type: the built-in thresholds are only the defaults.
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import or_, func, select, insert, exists, literal, cast, case, String, Integer
+from sqlalchemy.dialects.postgresql import array
 from datetime import datetime, timedelta, date
-from typing import List
+from typing import Optional
+import time
 import logging
 
-from app.models.alert import Alert, AlertRule
+from app.core.config import settings
+from app.models.alert import Alert, AlertCheckWatermark
+from app.models.project import Project
 from app.models.building import Building
+from app.models.unit import Unit
 from app.models.task import Task
 from app.models.document import DocumentSignature
 from app.models.interaction import Interaction
 from app.models.user import User
 from app.models.owner import Owner
+from app.services.alert_rules import get_compiled_rules, evaluate_rules
+from app.services.alert_inbox import add_unread
 
 logger = logging.getLogger(__name__)
 
+# Columns every check inserts, in order; the SELECT of each check supplies the
+# rule-specific values (see _insert_alerts)
+ALERT_COLUMNS = [
+    "alert_id", "alert_type", "severity", "title", "message",
+    "project_id", "building_id", "owner_id", "task_id", "agent_id",
+    "alert_metadata", "delivery_channels", "status", "created_at", "updated_at",
+]
+
+
+def _no_active_alert(alert_type: str, *conditions):
+    """Anti-join: no ACTIVE alert of this type exists for the entity"""
+    return ~exists().where(
+        Alert.alert_type == alert_type,
+        Alert.status == "ACTIVE",
+        *conditions
+    )
+
+
+def _insert_alerts(db: Session, alert_type: str, query, now: datetime) -> int:
+    """
+    Insert one alert per row of `query`, count them in the recipients'
+    inboxes, and return the number created
+    
+    `query` selects severity, title, message, project_id, building_id, owner_id,
+    task_id, agent_id and alert_metadata (in that order); the other columns are
+    the same for every alert.
+    """
+    severity, title, message, project_id, building_id, owner_id, task_id, agent_id, alert_metadata = query.selected_columns
+    rows = query.with_only_columns(
+        func.gen_random_uuid(),
+        cast(literal(alert_type), Alert.alert_type.type),
+        cast(severity, Alert.severity.type),
+        title,
+        message,
+        project_id,
+        building_id,
+        owner_id,
+        task_id,
+        agent_id,
+        alert_metadata,
+        array([literal("IN_APP")]),
+        cast(literal("ACTIVE"), Alert.status.type),
+        literal(now),
+        literal(now),
+        maintain_column_froms=True
+    )
+    alert_ids = db.execute(insert(Alert).from_select(ALERT_COLUMNS, rows).returning(Alert.alert_id)).scalars().all()
+    add_unread(db, alert_ids)
+    db.commit()
+    return len(alert_ids)
+
 
-def check_threshold_violations(db: Session) -> List[Alert]:
-    """Check for buildings below critical threshold"""
-    alerts = []
+def check_threshold_violations(db: Session, since: Optional[datetime] = None) -> int:
+    """
+    Check for buildings below critical threshold
     
-    # Get all active buildings
-    buildings = db.query(Building).filter(
+    With `since`, only buildings or projects updated since then are evaluated
+    (a majority recalculation updates the building row).
+    """
+    now = datetime.utcnow()
+    critical_threshold = func.coalesce(func.nullif(Project.critical_threshold_percent, 0), 50.0)
+    
+    query = select(
+        case((Building.signature_percentage < critical_threshold * 0.5, "HIGH"), else_="MEDIUM"),
+        "Building " + Building.building_name + " below critical threshold",
+        "Building " + Building.building_name + " signature percentage ("
+        + cast(func.round(Building.signature_percentage, 1), String) + "%) is below critical threshold ("
+        + cast(critical_threshold, String) + "%)",
+        Building.project_id,
+        Building.building_id,
+        literal(None),
+        literal(None),
+        literal(None),
+        func.json_build_object(
+            "signature_percentage", Building.signature_percentage,
+            "critical_threshold", critical_threshold,
+            "traffic_light_status", Building.traffic_light_status
+        ),
+    ).select_from(Building).join(
+        Project, Project.project_id == Building.project_id
+    ).where(
         Building.is_deleted == False,
-        Building.signature_percentage.isnot(None)
-    ).all()
-    
-    for building in buildings:
-        # Get project to check critical threshold
-        project = building.project
-        if not project:
-            continue
-        
-        critical_threshold = float(project.critical_threshold_percent or 50.0) if project.critical_threshold_percent else 50.0
-        signature_pct = float(building.signature_percentage or 0.0)
-        
-        # Check if building is below critical threshold
-        if signature_pct < critical_threshold:
-            # Check if alert already exists
-            existing_alert = db.query(Alert).filter(
-                Alert.building_id == building.building_id,
-                Alert.alert_type == "THRESHOLD_VIOLATION",
-                Alert.status == "ACTIVE"
-            ).first()
-            
-            if not existing_alert:
-                alert = Alert(
-                    alert_type="THRESHOLD_VIOLATION",
-                    severity="HIGH" if signature_pct < critical_threshold * 0.5 else "MEDIUM",
-                    title=f"Building {building.building_name} below critical threshold",
-                    message=f"Building {building.building_name} signature percentage ({signature_pct:.1f}%) is below critical threshold ({critical_threshold}%)",
-                    building_id=building.building_id,
-                    project_id=building.project_id,
-                    alert_metadata={
-                        "signature_percentage": signature_pct,
-                        "critical_threshold": critical_threshold,
-                        "traffic_light_status": building.traffic_light_status
-                    },
-                    delivery_channels=["IN_APP"],
-                    status="ACTIVE"
-                )
-                db.add(alert)
-                alerts.append(alert)
-                logger.info(f"Created threshold violation alert for building {building.building_id}")
+        Building.signature_percentage.isnot(None),
+        Building.signature_percentage < critical_threshold,
+        _no_active_alert("THRESHOLD_VIOLATION", Alert.building_id == Building.building_id)
+    )
+    if since:
+        query = query.where(or_(Building.updated_at >= since, Project.updated_at >= since))
     
-    db.commit()
-    return alerts
+    created = _insert_alerts(db, "THRESHOLD_VIOLATION", query, now)
+    logger.info(f"Created {created} threshold violation alerts")
+    return created
 
 
-def check_agent_inactivity(db: Session, days_threshold: int = 3) -> List[Alert]:
-    """Check for agent inactivity (no interactions for X days)"""
-    alerts = []
+def check_agent_inactivity(db: Session, days_threshold: int = 3, since: Optional[datetime] = None) -> int:
+    """
+    Check for agent inactivity (no interactions for X days)
+    
+    Always evaluates every agent: there is one row per agent, and inactivity is
+    the absence of change, which a watermark can't detect.
+    """
+    now = datetime.utcnow()
+    today = date.today()
+    cutoff_date = today - timedelta(days=days_threshold)
     
-    cutoff_date = date.today() - timedelta(days=days_threshold)
+    last_interactions = select(
+        Interaction.agent_id.label("agent_id"),
+        func.max(Interaction.interaction_date).label("last_interaction_date")
+    ).group_by(Interaction.agent_id).subquery()
+    last_date = last_interactions.c.last_interaction_date
+    agent_name = func.coalesce(User.full_name, User.email)
+    days_inactive = func.coalesce(literal(today) - last_date, days_threshold + 1)
     
-    # Get all active agents
-    agents = db.query(User).filter(
+    query = select(
+        literal("MEDIUM"),
+        "Agent " + agent_name + " inactive",
+        "Agent " + agent_name + " has no interactions for " + cast(days_inactive, String) + " days",
+        literal(None),
+        literal(None),
+        literal(None),
+        literal(None),
+        User.user_id,
+        func.json_build_object(
+            "days_inactive", days_inactive,
+            "last_interaction_date", func.to_char(last_date, "YYYY-MM-DD")
+        ),
+    ).select_from(User).outerjoin(
+        last_interactions, last_interactions.c.agent_id == User.user_id
+    ).where(
         User.role == "AGENT",
-        User.is_active == True
-    ).all()
-    
-    for agent in agents:
-        # Check last interaction
-        last_interaction = db.query(Interaction).filter(
-            Interaction.agent_id == agent.user_id
-        ).order_by(Interaction.interaction_date.desc()).first()
-        
-        if not last_interaction or last_interaction.interaction_date < cutoff_date:
-            # Check if alert already exists
-            existing_alert = db.query(Alert).filter(
-                Alert.agent_id == agent.user_id,
-                Alert.alert_type == "AGENT_INACTIVITY",
-                Alert.status == "ACTIVE"
-            ).first()
-            
-            if not existing_alert:
-                days_inactive = (date.today() - last_interaction.interaction_date).days if last_interaction else days_threshold + 1
-                
-                alert = Alert(
-                    alert_type="AGENT_INACTIVITY",
-                    severity="MEDIUM",
-                    title=f"Agent {agent.full_name or agent.email} inactive",
-                    message=f"Agent {agent.full_name or agent.email} has no interactions for {days_inactive} days",
-                    agent_id=agent.user_id,
-                    alert_metadata={
-                        "days_inactive": days_inactive,
-                        "last_interaction_date": last_interaction.interaction_date.isoformat() if last_interaction else None
-                    },
-                    delivery_channels=["IN_APP"],
-                    status="ACTIVE"
-                )
-                db.add(alert)
-                alerts.append(alert)
-                logger.info(f"Created inactivity alert for agent {agent.user_id}")
+        User.is_active == True,
+        or_(last_date.is_(None), last_date < cutoff_date),
+        _no_active_alert("AGENT_INACTIVITY", Alert.agent_id == User.user_id)
+    )
     
-    db.commit()
-    return alerts
+    created = _insert_alerts(db, "AGENT_INACTIVITY", query, now)
+    logger.info(f"Created {created} agent inactivity alerts")
+    return created
 
 
-def check_overdue_tasks(db: Session) -> List[Alert]:
-    """Check for overdue tasks"""
-    alerts = []
+def check_overdue_tasks(db: Session, since: Optional[datetime] = None) -> int:
+    """
+    Check for overdue tasks
     
+    With `since`, only tasks whose due date passed since then, or that were
+    updated since then (e.g. reopened), are evaluated.
+    """
+    now = datetime.utcnow()
     today = date.today()
+    days_overdue = literal(today) - Task.due_date
     
-    # Get overdue tasks
-    overdue_tasks = db.query(Task).filter(
+    query = select(
+        case((Task.priority == "CRITICAL", "HIGH"), else_="MEDIUM"),
+        "Overdue task: " + Task.title,
+        "Task '" + Task.title + "' assigned to agent is " + cast(days_overdue, String) + " days overdue",
+        literal(None),
+        Task.building_id,
+        Task.owner_id,
+        Task.task_id,
+        Task.assigned_to_agent_id,
+        func.json_build_object(
+            "days_overdue", days_overdue,
+            "priority", Task.priority,
+            "due_date", func.to_char(Task.due_date, "YYYY-MM-DD")
+        ),
+    ).select_from(Task).where(
         Task.due_date < today,
-        Task.status.in_(["NOT_STARTED", "IN_PROGRESS", "BLOCKED"])
-    ).all()
-    
-    for task in overdue_tasks:
-        # Check if alert already exists
-        existing_alert = db.query(Alert).filter(
-            Alert.task_id == task.task_id,
-            Alert.alert_type == "OVERDUE_TASK",
-            Alert.status == "ACTIVE"
-        ).first()
-        
-        if not existing_alert:
-            days_overdue = (today - task.due_date).days
-            
-            alert = Alert(
-                alert_type="OVERDUE_TASK",
-                severity="HIGH" if task.priority == "CRITICAL" else "MEDIUM",
-                title=f"Overdue task: {task.title}",
-                message=f"Task '{task.title}' assigned to agent is {days_overdue} days overdue",
-                task_id=task.task_id,
-                agent_id=task.assigned_to_agent_id,
-                building_id=task.building_id,
-                owner_id=task.owner_id,
-                alert_metadata={
-                    "days_overdue": days_overdue,
-                    "priority": task.priority,
-                    "due_date": task.due_date.isoformat()
-                },
-                delivery_channels=["IN_APP"],
-                status="ACTIVE"
-            )
-            db.add(alert)
-            alerts.append(alert)
-            logger.info(f"Created overdue task alert for task {task.task_id}")
+        Task.status.in_(["NOT_STARTED", "IN_PROGRESS", "BLOCKED"]),
+        _no_active_alert("OVERDUE_TASK", Alert.task_id == Task.task_id)
+    )
+    if since:
+        query = query.where(or_(Task.due_date >= since.date(), Task.updated_at >= since))
     
-    db.commit()
-    return alerts
+    created = _insert_alerts(db, "OVERDUE_TASK", query, now)
+    logger.info(f"Created {created} overdue task alerts")
+    return created
 
 
-def check_pending_approvals(db: Session, days_threshold: int = 7) -> List[Alert]:
-    """Check for pending approvals older than threshold"""
-    alerts = []
+def check_pending_approvals(db: Session, days_threshold: int = 7, since: Optional[datetime] = None) -> int:
+    """
+    Check for pending approvals older than threshold (one alert per owner, for the oldest signature)
     
-    cutoff_date = datetime.utcnow() - timedelta(days=days_threshold)
+    With `since`, only signatures that crossed the threshold since then, or
+    were updated since then, are evaluated.
+    """
+    now = datetime.utcnow()
+    cutoff_date = now - timedelta(days=days_threshold)
     
-    # Get pending approvals
-    pending_approvals = db.query(DocumentSignature).filter(
+    pending = select(
+        DocumentSignature.signature_id,
+        DocumentSignature.owner_id,
+        DocumentSignature.created_at,
+    ).where(
         DocumentSignature.signature_status == "SIGNED_PENDING_APPROVAL",
-        DocumentSignature.created_at < cutoff_date
-    ).all()
-    
-    for signature in pending_approvals:
-        # Check if alert already exists (simplified check)
-        existing_alert = db.query(Alert).filter(
-            Alert.owner_id == signature.owner_id,
-            Alert.alert_type == "PENDING_APPROVAL",
-            Alert.status == "ACTIVE"
-        ).first()
-        
-        if not existing_alert:
-            days_pending = (datetime.utcnow() - signature.created_at).days
-            
-            # Get owner and building info
-            from app.models.unit import Unit
-            owner = db.query(Owner).filter(Owner.owner_id == signature.owner_id).first()
-            building_id = None
-            if owner and owner.unit_id:
-                # Get building from owner's unit
-                unit = db.query(Unit).filter(Unit.unit_id == owner.unit_id).first()
-                if unit:
-                    building_id = unit.building_id
-            
-            alert = Alert(
-                alert_type="PENDING_APPROVAL",
-                severity="HIGH" if days_pending > 14 else "MEDIUM",
-                title=f"Pending approval for {owner.full_name if owner else 'Owner'}",
-                message=f"Signature approval pending for {days_pending} days",
-                owner_id=signature.owner_id,
-                building_id=building_id,
-                alert_metadata={
-                    "signature_id": str(signature.signature_id),
-                    "days_pending": days_pending,
-                    "signed_at": signature.created_at.isoformat()
-                },
-                delivery_channels=["IN_APP"],
-                status="ACTIVE"
-            )
-            db.add(alert)
-            alerts.append(alert)
-            logger.info(f"Created pending approval alert for signature {signature.signature_id}")
+        DocumentSignature.created_at < cutoff_date,
+        _no_active_alert("PENDING_APPROVAL", Alert.owner_id == DocumentSignature.owner_id)
+    )
+    if since:
+        pending = pending.where(or_(
+            DocumentSignature.created_at >= since - timedelta(days=days_threshold),
+            DocumentSignature.updated_at >= since
+        ))
+    oldest_pending = pending.distinct(DocumentSignature.owner_id).order_by(
+        DocumentSignature.owner_id,
+        DocumentSignature.created_at
+    ).subquery()
+    days_pending = cast(func.floor(func.date_part("day", literal(now) - oldest_pending.c.created_at)), Integer)
     
-    db.commit()
-    return alerts
+    query = select(
+        case((days_pending > 14, "HIGH"), else_="MEDIUM"),
+        "Pending approval for " + func.coalesce(Owner.full_name, "Owner"),
+        "Signature approval pending for " + cast(days_pending, String) + " days",
+        literal(None),
+        Unit.building_id,
+        oldest_pending.c.owner_id,
+        literal(None),
+        literal(None),
+        func.json_build_object(
+            "signature_id", cast(oldest_pending.c.signature_id, String),
+            "days_pending", days_pending,
+            "signed_at", func.to_char(oldest_pending.c.created_at, 'YYYY-MM-DD"T"HH24:MI:SS')
+        ),
+    ).select_from(oldest_pending).outerjoin(
+        Owner, Owner.owner_id == oldest_pending.c.owner_id
+    ).outerjoin(
+        Unit, Unit.unit_id == Owner.unit_id
+    )
+    
+    created = _insert_alerts(db, "PENDING_APPROVAL", query, now)
+    logger.info(f"Created {created} pending approval alerts")
+    return created
+
 
+# Result key, alert type and built-in check, in run order
+ALERT_CHECKS = [
+    ("threshold_violations", "THRESHOLD_VIOLATION", check_threshold_violations),
+    ("agent_inactivity", "AGENT_INACTIVITY", check_agent_inactivity),
+    ("overdue_tasks", "OVERDUE_TASK", check_overdue_tasks),
+    ("pending_approvals", "PENDING_APPROVAL", check_pending_approvals),
+]
 
-def run_alert_checks(db: Session) -> dict:
-    """Run all alert checks and return summary"""
+
+def _needs_full_sweep(mark: Optional[AlertCheckWatermark], started_at: datetime, full_sweep: bool) -> bool:
+    return (
+        full_sweep
+        or mark is None
+        or mark.last_full_sweep_at is None
+        or started_at - mark.last_full_sweep_at >= timedelta(hours=settings.ALERT_FULL_SWEEP_HOURS)
+    )
+
+
+def run_alert_checks(db: Session, full_sweep: bool = False) -> dict:
+    """
+    Run all alert checks and return summary
+    
+    Each check only evaluates what changed since its previous run, minus
+    ALERT_WATERMARK_OVERLAP_SECONDS for transactions that were still in flight
+    then. It sweeps everything when full_sweep is set, on its first run, and
+    every ALERT_FULL_SWEEP_HOURS. For a type with active alert rules, the rules
+    run instead of the built-in check (all of them in one statement, under the
+    watermark "rules:<TYPE>"), and a new or edited rule forces a full sweep.
+    """
     logger.info("Running alert checks...")
     
-    threshold_alerts = check_threshold_violations(db)
-    inactivity_alerts = check_agent_inactivity(db)
-    overdue_alerts = check_overdue_tasks(db)
-    approval_alerts = check_pending_approvals(db)
+    watermarks = {mark.check_name: mark for mark in db.query(AlertCheckWatermark).all()}
+    rules_by_type = {}
+    for compiled in get_compiled_rules(db):
+        rules_by_type.setdefault(compiled.rule_type, []).append(compiled)
+    summary = {"total": 0, "full_sweeps": [], "rules_evaluated": 0}
     
-    total_alerts = len(threshold_alerts) + len(inactivity_alerts) + len(overdue_alerts) + len(approval_alerts)
+    for check_name, alert_type, check in ALERT_CHECKS:
+        rules = rules_by_type.get(alert_type)
+        watermark_name = f"rules:{alert_type}" if rules else check_name
+        started_at = datetime.utcnow()
+        mark = watermarks.get(watermark_name)
+        sweep = _needs_full_sweep(mark, started_at, full_sweep) or bool(rules) and any(
+            compiled.updated_at is None or compiled.updated_at >= mark.last_run_at for compiled in rules
+        )
+        since = None if sweep else mark.last_run_at - timedelta(seconds=settings.ALERT_WATERMARK_OVERLAP_SECONDS)
+        
+        start = time.monotonic()
+        if rules:
+            created = evaluate_rules(db, rules, since=since)
+            summary["rules_evaluated"] += len(rules)
+        else:
+            created = check(db, since=since)
+        duration_ms = int((time.monotonic() - start) * 1000)
+        
+        if mark is None:
+            mark = AlertCheckWatermark(check_name=watermark_name)
+            db.add(mark)
+        mark.last_run_at = started_at
+        if sweep:
+            mark.last_full_sweep_at = started_at
+        mark.last_created = created
+        mark.last_duration_ms = duration_ms
+        db.commit()
+        
+        summary[check_name] = created
+        summary["total"] += created
+        if sweep:
+            summary["full_sweeps"].append(watermark_name)
     
-    logger.info(f"Alert checks completed: {total_alerts} new alerts created")
+    logger.info(f"Alert checks completed: {summary['total']} new alerts created", extra={"full_sweeps": summary["full_sweeps"]})
     
-    return {
-        "threshold_violations": len(threshold_alerts),
-        "agent_inactivity": len(inactivity_alerts),
-        "overdue_tasks": len(overdue_alerts),
-        "pending_approvals": len(approval_alerts),
-        "total": total_alerts
-    }
-
+    return summary
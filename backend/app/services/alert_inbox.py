@@ -0,0 +1,124 @@
+"""
+Alert Inbox Service
+Maintains per-inbox unread (ACTIVE) alert counters so the alert badge is a
+primary-key read instead of a COUNT over the alerts table.
+
+Agents have their own inbox: alerts addressed to them and alerts on buildings
+assigned to them (the same scope as GET /alerts). Every other role sees every
+alert, so they share the SHARED_INBOX counter.
+
+Counters change in the same transaction as the alerts: add_unread after
+creating alerts, remove_unread before moving ACTIVE alerts to another status.
+Building reassignment moves alerts between agent inboxes, so it rebuilds the
+two agents' counters; a nightly rebuild corrects any other drift.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, union, update, literal, cast, String
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+from typing import Optional, List, Iterable
+from uuid import UUID
+import logging
+
+from app.models.alert import Alert, AlertInboxCounter
+from app.models.building import Building
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+SHARED_INBOX = "ALL"
+
+
+def inbox_key(user: User) -> str:
+    return str(user.user_id) if user.role == "AGENT" else SHARED_INBOX
+
+
+def _inbox_memberships(*alert_filter):
+    """(inbox_key, alert_id) for every inbox each alert matching the filter appears in"""
+    shared = select(
+        literal(SHARED_INBOX).label("inbox_key"),
+        Alert.alert_id.label("alert_id")
+    ).where(*alert_filter)
+    addressed = select(
+        cast(Alert.agent_id, String),
+        Alert.alert_id
+    ).join(User, User.user_id == Alert.agent_id).where(*alert_filter, User.role == "AGENT")
+    assigned = select(
+        cast(Building.assigned_agent_id, String),
+        Alert.alert_id
+    ).join(
+        Building, Building.building_id == Alert.building_id
+    ).join(
+        User, User.user_id == Building.assigned_agent_id
+    ).where(*alert_filter, User.role == "AGENT")
+    # UNION (not ALL): an agent both addressed and assigned counts the alert once
+    return union(shared, addressed, assigned).subquery()
+
+
+def _adjust(db: Session, alert_ids: List[UUID], delta: int) -> None:
+    memberships = _inbox_memberships(Alert.alert_id.in_(alert_ids))
+    counts = select(
+        memberships.c.inbox_key,
+        func.count() * delta,
+        literal(datetime.utcnow())
+    ).group_by(memberships.c.inbox_key).order_by(memberships.c.inbox_key)  # Lock counter rows in a fixed order
+    
+    statement = insert(AlertInboxCounter).from_select(["inbox_key", "unread_count", "updated_at"], counts)
+    statement = statement.on_conflict_do_update(
+        index_elements=[AlertInboxCounter.inbox_key],
+        set_={
+            "unread_count": func.greatest(AlertInboxCounter.unread_count + statement.excluded.unread_count, 0),
+            "updated_at": statement.excluded.updated_at,
+        }
+    )
+    db.execute(statement)
+
+
+def add_unread(db: Session, alert_ids: Iterable[UUID]) -> None:
+    """Count newly created ACTIVE alerts in every inbox they appear in (caller commits)"""
+    alert_ids = list(alert_ids)
+    if alert_ids:
+        _adjust(db, alert_ids, 1)
+
+
+def remove_unread(db: Session, alert_ids: Iterable[UUID]) -> None:
+    """Uncount alerts that are leaving ACTIVE; call before committing the status change"""
+    alert_ids = list(alert_ids)
+    if alert_ids:
+        _adjust(db, alert_ids, -1)
+
+
+def rebuild_unread_counts(db: Session, inbox_keys: Optional[List[str]] = None) -> int:
+    """
+    Recount ACTIVE alerts for the given inboxes (default: all) and return the
+    number of inboxes with unread alerts (caller commits)
+    """
+    memberships = _inbox_memberships(Alert.status == "ACTIVE")
+    counts = select(
+        memberships.c.inbox_key,
+        func.count(),
+        literal(datetime.utcnow())
+    ).group_by(memberships.c.inbox_key).order_by(memberships.c.inbox_key)
+    reset = update(AlertInboxCounter).values(unread_count=0, updated_at=datetime.utcnow())
+    if inbox_keys is not None:
+        counts = counts.where(memberships.c.inbox_key.in_(inbox_keys))
+        reset = reset.where(AlertInboxCounter.inbox_key.in_(inbox_keys))
+    
+    db.execute(reset.execution_options(synchronize_session=False))
+    statement = insert(AlertInboxCounter).from_select(["inbox_key", "unread_count", "updated_at"], counts)
+    statement = statement.on_conflict_do_update(
+        index_elements=[AlertInboxCounter.inbox_key],
+        set_={
+            "unread_count": statement.excluded.unread_count,
+            "updated_at": statement.excluded.updated_at,
+        }
+    )
+    return db.execute(statement).rowcount
+
+
+def get_unread_count(db: Session, user: User) -> int:
+    """Unread alerts in the user's inbox (a primary-key read)"""
+    count = db.query(AlertInboxCounter.unread_count).filter(
+        AlertInboxCounter.inbox_key == inbox_key(user)
+    ).scalar()
+    return max(count or 0, 0)
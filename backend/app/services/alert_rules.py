@@ -0,0 +1,492 @@
+"""
+Alert Rule Compiler
+Compiles AlertRule.condition_logic into SQL predicates and evaluates active
+rules as batched INSERT ... SELECT statements
+
+condition_logic is a JSON condition tree:
+
+    {"all": [<condition>, ...]}      every condition holds
+    {"any": [<condition>, ...]}      at least one condition holds
+    {"not": <condition>}             the condition does not hold
+    {"field": "signature_percentage", "op": "lt", "value": 40}
+    {"field": "signature_percentage", "op": "lt", "value": {"field": "critical_threshold_percent"}}
+
+Operators: eq, ne, lt, lte, gt, gte, in, not_in, is_null, not_null. The fields
+a rule can use depend on its rule_type (see RULE_ENTITIES); project_id and
+building_id are available on every type but AGENT_INACTIVITY, so a rule can be
+scoped to some projects with {"field": "project_id", "op": "in", "value": [...]}.
+
+Compiled rules are cached per rule_id until the row's updated_at changes. All
+active rules of one type are evaluated together in a single INSERT of a
+UNION ALL of one SELECT per rule. An entity that already has an ACTIVE alert
+of the rule's type, from any rule or the built-in checks, is not alerted again.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, not_, func, select, insert, exists, literal, cast, null, union_all, String, Integer, Date
+from sqlalchemy.dialects.postgresql import array, UUID as PG_UUID
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Callable
+import math
+import threading
+import logging
+import uuid
+
+from app.models.alert import Alert, AlertRule
+from app.models.project import Project
+from app.models.building import Building
+from app.models.unit import Unit
+from app.models.task import Task
+from app.models.document import DocumentSignature
+from app.models.interaction import Interaction
+from app.models.user import User
+from app.models.owner import Owner
+from app.services.alert_inbox import add_unread
+
+logger = logging.getLogger(__name__)
+
+# Timestamps are stored as naive UTC, so compare against the database's UTC clock
+UTC_NOW = func.timezone("UTC", func.now())
+UTC_TODAY = cast(UTC_NOW, Date)
+
+RULE_ALERT_COLUMNS = [
+    "alert_id", "alert_type", "severity", "title", "message",
+    "project_id", "building_id", "owner_id", "task_id", "agent_id",
+    "alert_metadata", "delivery_channels", "status", "created_at", "updated_at",
+    "rule_id",
+]
+
+COMPARISONS = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+}
+
+
+class AlertRuleError(ValueError):
+    """Raised when condition_logic can't be compiled"""
+    pass
+
+
+class RuleEntity:
+    """
+    What a rule type evaluates: the rows, the fields conditions can use, and how
+    a matching row becomes an alert
+    
+    `age_fields` are fields that grow with time (days overdue, pending,
+    inactive); incremental runs widen their window by the largest threshold
+    a rule compares them with. `since_filter(since, window)` restricts a run
+    to rows that changed or aged across a threshold since `since`; None means
+    the type is always swept in full. `alert_key` names the ref column that
+    identifies the entity an alert is about (one ACTIVE alert per entity).
+    """
+    
+    def __init__(
+        self,
+        alert_type: str,
+        from_clause,
+        where: list,
+        fields: dict,
+        refs: dict,
+        alert_key: str,
+        title: Callable,
+        message: Callable,
+        metadata,
+        age_fields: tuple = (),
+        since_filter: Optional[Callable] = None,
+        one_alert_per=None,
+        order_by=None,
+    ):
+        self.alert_type = alert_type
+        self.from_clause = from_clause
+        self.where = where
+        self.fields = fields
+        self.refs = refs
+        self.alert_key = alert_key
+        self.title = title
+        self.message = message
+        self.metadata = metadata
+        self.age_fields = age_fields
+        self.since_filter = since_filter
+        self.one_alert_per = one_alert_per
+        self.order_by = order_by
+    
+    def alert_key_match(self):
+        """Condition matching alerts about the current entity row"""
+        return Alert.__table__.c[self.alert_key] == self.refs[self.alert_key]
+
+
+def _building_entity() -> RuleEntity:
+    return RuleEntity(
+        alert_type="THRESHOLD_VIOLATION",
+        from_clause=Building.__table__.join(Project.__table__, Project.project_id == Building.project_id),
+        where=[Building.is_deleted == False],
+        fields={
+            "project_id": Building.project_id,
+            "building_id": Building.building_id,
+            "signature_percentage": Building.signature_percentage,
+            "signature_percentage_by_area": Building.signature_percentage_by_area,
+            "signature_percentage_by_cost": Building.signature_percentage_by_cost,
+            "traffic_light_status": Building.traffic_light_status,
+            "current_status": Building.current_status,
+            "total_units": Building.total_units,
+            "units_signed": Building.units_signed,
+            "units_not_signed": Building.units_not_signed,
+            "units_refused": Building.units_refused,
+            "difficulty_score": Building.difficulty_score,
+            "critical_threshold_percent": Project.critical_threshold_percent,
+            "required_majority_percent": Project.required_majority_percent,
+            "project_type": Project.project_type,
+            "project_stage": Project.project_stage,
+        },
+        refs={"project_id": Building.project_id, "building_id": Building.building_id},
+        alert_key="building_id",
+        title=lambda rule_name: "Building " + Building.building_name + ": " + rule_name,
+        message=lambda rule_name: "Building " + Building.building_name + " matched alert rule '" + rule_name
+        + "' (signature percentage " + cast(func.round(func.coalesce(Building.signature_percentage, 0), 1), String) + "%)",
+        metadata=func.json_build_object(
+            "signature_percentage", Building.signature_percentage,
+            "critical_threshold", Project.critical_threshold_percent,
+            "traffic_light_status", Building.traffic_light_status
+        ),
+        since_filter=lambda since, window: or_(Building.updated_at >= since, Project.updated_at >= since),
+    )
+
+
+def _task_entity() -> RuleEntity:
+    days_overdue = UTC_TODAY - Task.due_date
+    return RuleEntity(
+        alert_type="OVERDUE_TASK",
+        from_clause=Task.__table__.outerjoin(Building.__table__, Building.building_id == Task.building_id),
+        where=[Task.status.in_(["NOT_STARTED", "IN_PROGRESS", "BLOCKED"])],
+        fields={
+            "project_id": Building.project_id,
+            "building_id": Task.building_id,
+            "days_overdue": days_overdue,
+            "priority": Task.priority,
+            "status": Task.status,
+            "task_type": Task.task_type,
+            "assigned_to_agent_id": Task.assigned_to_agent_id,
+        },
+        refs={
+            "project_id": Building.project_id,
+            "building_id": Task.building_id,
+            "owner_id": Task.owner_id,
+            "task_id": Task.task_id,
+            "agent_id": Task.assigned_to_agent_id,
+        },
+        alert_key="task_id",
+        title=lambda rule_name: "Task " + Task.title + ": " + rule_name,
+        message=lambda rule_name: "Task '" + Task.title + "' matched alert rule '" + rule_name + "'",
+        metadata=func.json_build_object(
+            "days_overdue", days_overdue,
+            "priority", Task.priority,
+            "due_date", func.to_char(Task.due_date, "YYYY-MM-DD")
+        ),
+        age_fields=("days_overdue",),
+        since_filter=lambda since, window: or_(
+            Task.due_date >= (since - timedelta(days=window)).date(),
+            Task.updated_at >= since
+        ),
+    )
+
+
+def _signature_entity() -> RuleEntity:
+    days_pending = cast(func.floor(func.date_part("day", UTC_NOW - DocumentSignature.created_at)), Integer)
+    return RuleEntity(
+        alert_type="PENDING_APPROVAL",
+        from_clause=DocumentSignature.__table__.outerjoin(
+            Owner.__table__, Owner.owner_id == DocumentSignature.owner_id
+        ).outerjoin(
+            Unit.__table__, Unit.unit_id == Owner.unit_id
+        ).outerjoin(
+            Building.__table__, Building.building_id == Unit.building_id
+        ),
+        where=[DocumentSignature.signature_status == "SIGNED_PENDING_APPROVAL"],
+        fields={
+            "project_id": Building.project_id,
+            "building_id": Unit.building_id,
+            "days_pending": days_pending,
+            "is_manual_override": DocumentSignature.is_manual_override,
+        },
+        refs={
+            "project_id": Building.project_id,
+            "building_id": Unit.building_id,
+            "owner_id": DocumentSignature.owner_id,
+        },
+        alert_key="owner_id",
+        title=lambda rule_name: "Pending approval for " + func.coalesce(Owner.full_name, "Owner") + ": " + rule_name,
+        message=lambda rule_name: "Signature approval pending for " + cast(days_pending, String)
+        + " days (alert rule '" + rule_name + "')",
+        metadata=func.json_build_object(
+            "signature_id", cast(DocumentSignature.signature_id, String),
+            "days_pending", days_pending,
+            "signed_at", func.to_char(DocumentSignature.created_at, 'YYYY-MM-DD"T"HH24:MI:SS')
+        ),
+        age_fields=("days_pending",),
+        since_filter=lambda since, window: or_(
+            DocumentSignature.created_at >= since - timedelta(days=window),
+            DocumentSignature.updated_at >= since
+        ),
+        one_alert_per=DocumentSignature.owner_id,
+        order_by=DocumentSignature.created_at,
+    )
+
+
+def _agent_entity() -> RuleEntity:
+    last_interactions = select(
+        Interaction.agent_id.label("agent_id"),
+        func.max(Interaction.interaction_date).label("last_interaction_date")
+    ).group_by(Interaction.agent_id).subquery()
+    last_date = last_interactions.c.last_interaction_date
+    # Agents who never logged an interaction count from their account creation
+    days_inactive = UTC_TODAY - func.coalesce(last_date, cast(User.created_at, Date))
+    agent_name = func.coalesce(User.full_name, User.email)
+    return RuleEntity(
+        alert_type="AGENT_INACTIVITY",
+        from_clause=User.__table__.outerjoin(last_interactions, last_interactions.c.agent_id == User.user_id),
+        where=[User.role == "AGENT", User.is_active == True],
+        fields={
+            "agent_id": User.user_id,
+            "days_inactive": days_inactive,
+        },
+        refs={"agent_id": User.user_id},
+        alert_key="agent_id",
+        title=lambda rule_name: "Agent " + agent_name + ": " + rule_name,
+        message=lambda rule_name: "Agent " + agent_name + " has no interactions for "
+        + cast(days_inactive, String) + " days (alert rule '" + rule_name + "')",
+        metadata=func.json_build_object(
+            "days_inactive", days_inactive,
+            "last_interaction_date", func.to_char(last_date, "YYYY-MM-DD")
+        ),
+        age_fields=("days_inactive",),
+    )
+
+
+RULE_ENTITIES: Dict[str, RuleEntity] = {
+    "THRESHOLD_VIOLATION": _building_entity(),
+    "OVERDUE_TASK": _task_entity(),
+    "PENDING_APPROVAL": _signature_entity(),
+    "AGENT_INACTIVITY": _agent_entity(),
+}
+
+
+class CompiledRule:
+    """An alert rule with its condition compiled to a SQL predicate"""
+    
+    def __init__(self, rule: AlertRule, entity: RuleEntity, predicate, incremental: bool, age_window_days: int):
+        self.rule_id = rule.rule_id
+        self.rule_name = rule.rule_name
+        self.rule_type = rule.rule_type
+        self.severity = rule.severity or "MEDIUM"
+        self.delivery_channels = list(rule.delivery_channels or ["IN_APP"])
+        self.updated_at = rule.updated_at
+        self.entity = entity
+        self.predicate = predicate
+        self.incremental = incremental
+        self.age_window_days = age_window_days
+
+
+class _ConditionCompiler:
+    """Walks one condition tree, tracking what incremental evaluation needs"""
+    
+    def __init__(self, entity: RuleEntity):
+        self.entity = entity
+        self.incremental = entity.since_filter is not None
+        self.age_window_days = 0
+    
+    def compile(self, condition):
+        if not isinstance(condition, dict):
+            raise AlertRuleError(f"Condition must be an object, got {condition!r}")
+        if "all" in condition or "any" in condition:
+            key = "all" if "all" in condition else "any"
+            items = condition[key]
+            if not isinstance(items, list) or not items:
+                raise AlertRuleError(f"'{key}' needs a non-empty list of conditions")
+            parts = [self.compile(item) for item in items]
+            return and_(*parts) if key == "all" else or_(*parts)
+        if "not" in condition:
+            return not_(self.compile(condition["not"]))
+        if "field" in condition:
+            return self._comparison(condition)
+        raise AlertRuleError(f"Unrecognized condition: {condition!r}")
+    
+    def _field(self, name):
+        column = self.entity.fields.get(name)
+        if column is None:
+            raise AlertRuleError(
+                f"Unknown field '{name}' for {self.entity.alert_type} rules "
+                f"(available: {', '.join(sorted(self.entity.fields))})"
+            )
+        return column
+    
+    def _value(self, column, value):
+        """Bind a literal, converting UUID strings for UUID columns"""
+        if isinstance(column.type, PG_UUID) and value is not None:
+            try:
+                return uuid.UUID(str(value))
+            except ValueError:
+                raise AlertRuleError(f"Invalid UUID value: {value!r}")
+        return value
+    
+    def _track_age(self, name: str, value) -> None:
+        if name not in self.entity.age_fields:
+            return
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if isinstance(item, bool) or not isinstance(item, (int, float)):
+                # Compared with another field: thresholds vary per row
+                self.incremental = False
+                return
+            self.age_window_days = max(self.age_window_days, math.ceil(item) + 1)
+    
+    def _comparison(self, condition: dict):
+        name = condition["field"]
+        column = self._field(name)
+        op = condition.get("op")
+    
+        if op == "is_null":
+            return column.is_(None)
+        if op == "not_null":
+            return column.isnot(None)
+        if "value" not in condition:
+            raise AlertRuleError(f"Condition on '{name}' needs a value")
+        value = condition["value"]
+    
+        if op in ("in", "not_in"):
+            if not isinstance(value, list) or not value:
+                raise AlertRuleError(f"'{op}' on '{name}' needs a non-empty list")
+            self._track_age(name, value)
+            values = [self._value(column, item) for item in value]
+            return column.in_(values) if op == "in" else column.notin_(values)
+    
+        if op not in COMPARISONS:
+            raise AlertRuleError(f"Unknown operator '{op}'")
+        if isinstance(value, dict):
+            if "field" not in value:
+                raise AlertRuleError(f"Value of '{name}' must be a literal or {{\"field\": ...}}")
+            if value["field"] in self.entity.age_fields:
+                self.incremental = False
+            self._track_age(name, value)
+            return COMPARISONS[op](column, self._field(value["field"]))
+        if isinstance(value, list):
+            raise AlertRuleError(f"'{op}' on '{name}' needs a single value")
+        self._track_age(name, value)
+        return COMPARISONS[op](column, self._value(column, value))
+
+
+def compile_rule(rule: AlertRule) -> CompiledRule:
+    """Compile a rule's condition_logic; raises AlertRuleError if it is invalid"""
+    entity = RULE_ENTITIES.get(rule.rule_type)
+    if entity is None:
+        raise AlertRuleError(f"Rule type {rule.rule_type} can't be evaluated from conditions")
+    if not rule.condition_logic:
+        raise AlertRuleError("Rule has no condition_logic")
+    
+    compiler = _ConditionCompiler(entity)
+    predicate = compiler.compile(rule.condition_logic)
+    return CompiledRule(rule, entity, predicate, compiler.incremental, compiler.age_window_days)
+
+
+_compiled_rules: Dict[uuid.UUID, CompiledRule] = {}
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_rules(db: Session) -> List[CompiledRule]:
+    """
+    Compile every active rule, reusing cached compilations of unchanged rows
+    
+    Rules that fail to compile are logged and skipped.
+    """
+    rules = db.query(AlertRule).filter(AlertRule.is_active == True).all()
+    compiled = []
+    with _compiled_lock:
+        for rule_id in set(_compiled_rules) - {rule.rule_id for rule in rules}:
+            del _compiled_rules[rule_id]
+        for rule in rules:
+            cached = _compiled_rules.get(rule.rule_id)
+            if cached is None or cached.updated_at != rule.updated_at:
+                try:
+                    cached = compile_rule(rule)
+                except AlertRuleError as e:
+                    _compiled_rules.pop(rule.rule_id, None)
+                    logger.warning(f"Skipping alert rule {rule.rule_id} ({rule.rule_name}): {e}")
+                    continue
+                _compiled_rules[rule.rule_id] = cached
+            compiled.append(cached)
+    return compiled
+
+
+def _rule_select(compiled: CompiledRule, now: datetime, since: Optional[datetime]):
+    """The SELECT producing one row per new alert for a single rule"""
+    entity = compiled.entity
+    rule_name = literal(compiled.rule_name, String)
+    # Typed NULLs: in a UNION of several rules an untyped NULL column resolves to text
+    refs = [
+        entity.refs.get(column, cast(null(), Alert.__table__.c[column].type))
+        for column in ("project_id", "building_id", "owner_id", "task_id", "agent_id")
+    ]
+    columns = [
+        func.gen_random_uuid(),
+        cast(literal(entity.alert_type), Alert.alert_type.type),
+        cast(literal(compiled.severity), Alert.severity.type),
+        entity.title(rule_name),
+        entity.message(rule_name),
+        *refs,
+        entity.metadata,
+        array([literal(channel) for channel in compiled.delivery_channels]),
+        cast(literal("ACTIVE"), Alert.status.type),
+        literal(now),
+        literal(now),
+        literal(compiled.rule_id, Alert.rule_id.type),
+    ]
+    query = select(
+        *[column.label(name) for column, name in zip(columns, RULE_ALERT_COLUMNS)]
+    ).select_from(entity.from_clause).where(
+        *entity.where,
+        compiled.predicate,
+        # Any ACTIVE alert of the type for the entity, from this rule, another
+        # rule or the built-in checks
+        ~exists().where(
+            Alert.alert_type == entity.alert_type,
+            Alert.status == "ACTIVE",
+            entity.alert_key_match()
+        )
+    )
+    if since is not None and compiled.incremental:
+        query = query.where(entity.since_filter(since, compiled.age_window_days))
+    
+    if entity.one_alert_per is not None:
+        one_per = query.distinct(entity.one_alert_per).order_by(entity.one_alert_per, entity.order_by).subquery()
+        query = select(*one_per.c)
+    return query
+
+
+def evaluate_rules(db: Session, rules: List[CompiledRule], since: Optional[datetime] = None) -> int:
+    """
+    Create the missing alerts for rules of one type in a single statement
+    
+    With `since`, incremental rules only evaluate rows that changed (or aged
+    past one of the rule's thresholds) since then; the others sweep in full.
+    Returns the number of alerts created.
+    """
+    if not rules:
+        return 0
+    now = datetime.utcnow()
+    selects = [_rule_select(compiled, now, since) for compiled in rules]
+    if len(selects) == 1:
+        rows = selects[0]
+    else:
+        # The anti-join only sees alerts committed before this statement, so
+        # when several rules match one entity keep a single alert: the most
+        # severe (alert_severity sorts LOW..CRITICAL), then the lowest rule id
+        union = union_all(*selects).subquery()
+        key = union.c[rules[0].entity.alert_key]
+        rows = select(*union.c).distinct(key).order_by(key, union.c.severity.desc(), union.c.rule_id)
+    
+    alert_ids = db.execute(insert(Alert).from_select(RULE_ALERT_COLUMNS, rows).returning(Alert.alert_id)).scalars().all()
+    add_unread(db, alert_ids)
+    db.commit()
+    return len(alert_ids)
@@ -0,0 +1,269 @@
+"""
+Analytics Engine Service
+Runs heavy report scans with DuckDB over the Parquet snapshot exported by
+analytics_snapshot, instead of against the operational Postgres database.
+
+Only the scan, join and aggregation happen in DuckDB. Display fields that are
+deliberately kept out of the snapshot (owner names and phones, agent names,
+call summaries) are resolved from Postgres per chunk with primary-key IN
+lookups, so OLTP traffic only sees cheap indexed reads.
+"""
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Iterator, Dict
+import threading
+import logging
+
+from app.core.config import settings
+from app.models.user import User
+from app.models.owner import Owner
+from app.models.interaction import Interaction
+from app.services.analytics_snapshot import load_manifest, snapshot_dir
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_FETCH_SIZE = 1000
+
+_local = threading.local()
+
+
+class SnapshotUnavailableError(Exception):
+    """Raised when the snapshot is missing, stale or lacks a required table"""
+
+
+def snapshot_cutoff(tables: List[str]) -> Optional[date]:
+    """
+    First day not fully covered by the snapshot, or None if it can't be used
+    
+    The snapshot is usable when every table was exported within
+    ANALYTICS_SNAPSHOT_MAX_AGE_HOURS. Tables are exported separately, so the
+    oldest of them decides: only days before its export date are complete.
+    """
+    manifest_tables = load_manifest()["tables"]
+    exported = [manifest_tables.get(table, {}).get("exported_at") for table in tables]
+    if not exported or not all(exported):
+        return None
+    
+    exported_at = min(datetime.fromisoformat(value) for value in exported)
+    if datetime.utcnow() - exported_at > timedelta(hours=settings.ANALYTICS_SNAPSHOT_MAX_AGE_HOURS):
+        return None
+    return exported_at.date()
+
+
+def _connection():
+    """Per-thread in-memory DuckDB connection"""
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        try:
+            import duckdb
+        except ImportError:
+            logger.error("duckdb not installed. Install with: pip install duckdb")
+            raise SnapshotUnavailableError("Analytics engine not available. Please install duckdb.")
+        connection = duckdb.connect(database=":memory:")
+        connection.execute(f"SET threads TO {int(settings.ANALYTICS_ENGINE_THREADS)}")
+        _local.connection = connection
+    return connection
+
+
+@contextmanager
+def _reading_snapshot():
+    """Report DuckDB and file errors (corrupt or half-written Parquet) as SnapshotUnavailableError"""
+    import duckdb
+    
+    try:
+        yield
+    except (duckdb.Error, OSError) as e:
+        raise SnapshotUnavailableError(f"Snapshot could not be read: {e}") from e
+
+
+def _parquet_source(table_name: str, start_date: Optional[date] = None, end_date: Optional[date] = None) -> str:
+    """
+    read_parquet() over the manifest's partitions of a table
+    
+    Monthly partitions outside [start_date, end_date] are skipped, which only
+    holds for tables partitioned by the same date the range filters on.
+    """
+    partitions = load_manifest()["tables"].get(table_name, {}).get("partitions", {})
+    if not partitions:
+        raise SnapshotUnavailableError(f"Snapshot has no data for {table_name}")
+    
+    first_month = start_date.strftime("%Y-%m") if start_date else None
+    last_month = end_date.strftime("%Y-%m") if end_date else None
+    paths = []
+    for month, entry in sorted(partitions.items()):
+        if month != "none" and ((first_month and month < first_month) or (last_month and month > last_month)):
+            continue
+        paths.append(str(snapshot_dir() / entry["path"]).replace("'", "''"))
+    
+    if not paths:
+        # No partition overlaps the range: keep the schema so the query still runs and returns nothing
+        any_path = str(snapshot_dir() / next(iter(partitions.values()))["path"]).replace("'", "''")
+        return f"(SELECT * FROM read_parquet(['{any_path}']) WHERE false)"
+    return "read_parquet([" + ", ".join(f"'{path}'" for path in paths) + "])"
+
+
+def iter_interaction_history_rows(
+    db: Session,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    agent_id: Optional[str] = None,
+    scope_agent_id: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    Interaction history rows scanned from the snapshot, newest first
+    
+    Yields the same row dicts as the Postgres report path. Read errors before
+    the first row raise SnapshotUnavailableError; once rows have been handed
+    out they propagate as-is, since falling back would repeat them.
+    """
+    conditions = ["o.is_deleted = false"]
+    params = []
+    if start_date:
+        conditions.append("i.interaction_date >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("i.interaction_date <= ?")
+        params.append(end_date)
+    for agent in (agent_id, scope_agent_id):
+        if agent:
+            conditions.append("i.agent_id = ?")
+            params.append(str(agent))
+    
+    sql = (
+        "SELECT i.log_id, i.owner_id, i.agent_id, i.interaction_type, i.interaction_date, i.sentiment "
+        f"FROM {_parquet_source('interactions', start_date, end_date)} i "
+        f"JOIN {_parquet_source('owners')} o ON o.owner_id = i.owner_id "
+        f"WHERE {' AND '.join(conditions)} "
+        "ORDER BY i.interaction_date DESC"
+    )
+    cursor = _connection().cursor()
+    try:
+        with _reading_snapshot():
+            cursor.execute(sql, params)
+            chunk = cursor.fetchmany(ANALYTICS_FETCH_SIZE)
+        while chunk:
+            yield from _interaction_history_rows(chunk, db)
+            chunk = cursor.fetchmany(ANALYTICS_FETCH_SIZE)
+    finally:
+        cursor.close()
+
+
+def _interaction_history_rows(chunk: List[tuple], db: Session) -> List[dict]:
+    """Resolve display fields of a chunk of snapshot interactions from Postgres"""
+    log_ids = {row[0] for row in chunk}
+    owner_ids = {row[1] for row in chunk}
+    agent_ids = {row[2] for row in chunk if row[2]}
+    
+    texts = {
+        str(i.log_id): i
+        for i in db.query(Interaction.log_id, Interaction.call_summary, Interaction.next_action).filter(Interaction.log_id.in_(log_ids))
+    }
+    owners = {
+        str(o.owner_id): o
+        for o in db.query(Owner.owner_id, Owner.full_name, Owner.phone_for_contact).filter(Owner.owner_id.in_(owner_ids))
+    }
+    agents = {
+        str(u.user_id): u.full_name
+        for u in db.query(User.user_id, User.full_name).filter(User.user_id.in_(agent_ids))
+    }
+    
+    rows = []
+    for log_id, owner_id, agent_id, interaction_type, interaction_date, sentiment in chunk:
+        text = texts.get(log_id)
+        owner = owners.get(owner_id)
+        rows.append({
+            "interaction_date": interaction_date.isoformat() if interaction_date else None,
+            "interaction_type": interaction_type,
+            "owner_name": owner.full_name if owner else "Unknown",
+            "owner_phone": owner.phone_for_contact if owner else None,
+            "agent_name": agents.get(agent_id) or "Unknown",
+            "summary": text.call_summary if text else None,
+            "sentiment": sentiment,
+            "next_action": text.next_action if text else None
+        })
+    return rows
+
+
+def agent_performance_rows(
+    db: Session,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    agent_id: Optional[str] = None
+) -> List[dict]:
+    """
+    Agent KPI rows aggregated from the snapshot
+    
+    Mirrors the Postgres query: interactions in range, FINALIZED signatures
+    approved in range, current owners and buildings assigned per agent.
+    The agent list itself (active AGENT users) comes from Postgres.
+    """
+    interaction_conditions = ["true"]
+    interaction_params = []
+    if start_date:
+        interaction_conditions.append("interaction_date >= ?")
+        interaction_params.append(start_date)
+    if end_date:
+        interaction_conditions.append("interaction_date <= ?")
+        interaction_params.append(end_date)
+    
+    signed_conditions = ["s.signature_status = 'FINALIZED'"]
+    signed_params = []
+    if start_date:
+        signed_conditions.append("s.approved_at >= ?")
+        signed_params.append(datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        signed_conditions.append("s.approved_at < ?")
+        signed_params.append(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    
+    sql = (
+        "WITH i AS ("
+        "  SELECT agent_id, count(*) AS total_interactions"
+        f"  FROM {_parquet_source('interactions', start_date, end_date)}"
+        f"  WHERE {' AND '.join(interaction_conditions)} GROUP BY agent_id"
+        "), o AS ("
+        "  SELECT o.assigned_agent_id AS agent_id,"
+        "    count(DISTINCT o.owner_id) FILTER (WHERE o.is_deleted = false AND o.is_current_owner = true) AS assigned_owners,"
+        f"    count(s.signature_id) FILTER (WHERE {' AND '.join(signed_conditions)}) AS signed_documents"
+        f"  FROM {_parquet_source('owners')} o"
+        f"  LEFT JOIN {_parquet_source('signatures')} s ON s.owner_id = o.owner_id"
+        "  WHERE o.assigned_agent_id IS NOT NULL GROUP BY o.assigned_agent_id"
+        "), b AS ("
+        "  SELECT assigned_agent_id AS agent_id, count(*) AS assigned_buildings"
+        f"  FROM {_parquet_source('buildings')}"
+        "  WHERE is_deleted = false AND assigned_agent_id IS NOT NULL GROUP BY assigned_agent_id"
+        "), agents AS (SELECT agent_id FROM i UNION SELECT agent_id FROM o UNION SELECT agent_id FROM b) "
+        "SELECT agents.agent_id, coalesce(i.total_interactions, 0), coalesce(o.signed_documents, 0),"
+        "  coalesce(b.assigned_buildings, 0), coalesce(o.assigned_owners, 0) "
+        "FROM agents LEFT JOIN i USING (agent_id) LEFT JOIN o USING (agent_id) LEFT JOIN b USING (agent_id)"
+    )
+    cursor = _connection().cursor()
+    try:
+        with _reading_snapshot():
+            stats: Dict[str, tuple] = {
+                row[0]: row[1:]
+                for row in cursor.execute(sql, interaction_params + signed_params).fetchall()
+            }
+    finally:
+        cursor.close()
+    
+    query = db.query(User.user_id, User.full_name, User.email).filter(
+        User.role == "AGENT",
+        User.is_active == True
+    )
+    if agent_id:
+        query = query.filter(User.user_id == agent_id)
+    
+    rows = []
+    for user_id, full_name, email in query.order_by(User.full_name).all():
+        total_interactions, signed_documents, assigned_buildings, assigned_owners = stats.get(str(user_id), (0, 0, 0, 0))
+        rows.append({
+            "agent_name": full_name or email,
+            "email": email,
+            "total_interactions": total_interactions,
+            "signed_documents": signed_documents,
+            "assigned_buildings": assigned_buildings,
+            "assigned_owners": assigned_owners,
+            "success_rate": (signed_documents / assigned_owners * 100) if assigned_owners > 0 else 0.0
+        })
+    return rows
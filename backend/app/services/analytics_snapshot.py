@@ -0,0 +1,287 @@
+"""
+Analytics Snapshot Service
+Exports the operational tables to partitioned Parquet files under
+STORAGE_PATH/analytics for offline analysis.
+
+Every table is partitioned by month of created_at (interaction_date for
+interactions) into <table>/month=YYYY-MM/data.parquet. A manifest.json records each partition's
+row count and latest change time; on the next export one grouped query per
+table compares those fingerprints and only partitions that changed are
+rewritten. Each table also records when it was last exported (exported_at),
+since exports can cover only some tables or stop part way. Owners are exported without PII (names, ID numbers, contact details
+and free-text notes stay in the database).
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, literal
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.types import Integer, Numeric, Boolean, Date, DateTime
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Optional, List
+import json
+import os
+import uuid
+import threading
+import logging
+
+from app.core.config import settings
+from app.models.project import Project
+from app.models.building import Building
+from app.models.unit import Unit
+from app.models.owner import Owner
+from app.models.interaction import Interaction
+from app.models.document import DocumentSignature
+from app.models.task import Task
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+SNAPSHOT_FETCH_SIZE = 5000
+UNPARTITIONED = "none"
+
+# table name -> (model, exported columns, partition column, change-time column)
+SNAPSHOT_TABLES = {
+    "projects": (Project, [
+        Project.project_id, Project.project_name, Project.project_code, Project.project_type,
+        Project.location_city, Project.project_stage, Project.budget_total_ils, Project.budget_consumed_ils,
+        Project.required_majority_percent, Project.majority_calc_type, Project.critical_threshold_percent,
+        Project.launch_date, Project.estimated_completion_date, Project.actual_completion_date,
+        Project.project_manager_id, Project.created_at, Project.updated_at, Project.is_deleted,
+    ], Project.created_at, Project.updated_at),
+    "buildings": (Building, [
+        Building.building_id, Building.project_id, Building.building_name, Building.building_code,
+        Building.floor_count, Building.total_units, Building.total_area_sqm, Building.construction_year,
+        Building.structure_type, Building.seismic_rating, Building.current_status,
+        Building.signature_percentage, Building.signature_percentage_by_area, Building.traffic_light_status,
+        Building.units_signed, Building.units_partially_signed, Building.units_not_signed, Building.units_refused,
+        Building.assigned_agent_id, Building.difficulty_score,
+        Building.created_at, Building.updated_at, Building.is_deleted,
+    ], Building.created_at, Building.updated_at),
+    "units": (Unit, [
+        Unit.unit_id, Unit.building_id, Unit.floor_number, Unit.unit_number, Unit.area_sqm, Unit.room_count,
+        Unit.unit_status, Unit.total_owners, Unit.owners_signed, Unit.signature_percentage,
+        Unit.is_co_owned, Unit.is_rented, Unit.first_contact_date, Unit.last_contact_date,
+        Unit.days_since_contact, Unit.created_at, Unit.updated_at, Unit.is_deleted,
+    ], Unit.created_at, Unit.updated_at),
+    "owners": (Owner, [
+        Owner.owner_id, Owner.unit_id, Owner.id_type, Owner.preferred_contact_method, Owner.preferred_language,
+        Owner.ownership_share_percent, Owner.ownership_type, Owner.is_primary_contact, Owner.owner_status,
+        Owner.refusal_reason, Owner.signature_date, Owner.assigned_agent_id, Owner.is_current_owner,
+        Owner.ownership_start_date, Owner.ownership_end_date, Owner.created_at, Owner.updated_at, Owner.is_deleted,
+    ], Owner.created_at, Owner.updated_at),
+    "interactions": (Interaction, [
+        Interaction.log_id, Interaction.owner_id, Interaction.agent_id, Interaction.interaction_type,
+        Interaction.interaction_date, Interaction.interaction_timestamp, Interaction.duration_minutes,
+        Interaction.outcome, Interaction.key_objection, Interaction.follow_up_type, Interaction.sentiment,
+        Interaction.is_escalated, Interaction.attempted, Interaction.contact_method_used, Interaction.source,
+        Interaction.created_at,
+    ], Interaction.interaction_date, Interaction.created_at),
+    "signatures": (DocumentSignature, [
+        DocumentSignature.signature_id, DocumentSignature.document_id, DocumentSignature.owner_id,
+        DocumentSignature.signature_status, DocumentSignature.signed_at, DocumentSignature.task_id,
+        DocumentSignature.approved_by_user_id, DocumentSignature.approved_at,
+        DocumentSignature.rejected_by_user_id, DocumentSignature.rejected_at,
+        DocumentSignature.is_manual_override, DocumentSignature.created_at, DocumentSignature.updated_at,
+    ], DocumentSignature.created_at, DocumentSignature.updated_at),
+    "tasks": (Task, [
+        Task.task_id, Task.building_id, Task.owner_id, Task.task_type, Task.assigned_to_agent_id,
+        Task.assigned_by_user_id, Task.due_date, Task.status, Task.priority, Task.estimated_hours,
+        Task.actual_hours, Task.created_at, Task.updated_at, Task.completed_at,
+    ], Task.created_at, Task.updated_at),
+}
+
+_export_lock = threading.Lock()
+
+
+def snapshot_dir() -> Path:
+    """Root directory of the Parquet snapshot"""
+    path = Path(settings.STORAGE_PATH) / "analytics"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def load_manifest() -> dict:
+    """Read the snapshot manifest (an empty manifest if nothing was exported yet)"""
+    manifest_path = snapshot_dir() / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {"generated_at": None, "tables": {}}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest: dict) -> None:
+    manifest_path = snapshot_dir() / MANIFEST_NAME
+    part_path = manifest_path.with_name(MANIFEST_NAME + ".part")
+    with open(part_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(part_path, manifest_path)
+
+
+def _partition_expression(partition_column):
+    """Partition label of a row: the YYYY-MM of its partition column"""
+    return func.coalesce(func.to_char(partition_column, 'YYYY-MM'), literal(UNPARTITIONED))
+
+
+def _arrow_schema(columns: List):
+    """Parquet schema for the exported columns, so every partition has identical types"""
+    import pyarrow as pa
+    
+    fields = []
+    for column in columns:
+        column_type = column.type
+        if isinstance(column_type, PG_UUID):
+            arrow_type = pa.string()
+        elif isinstance(column_type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column_type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column_type, Numeric):
+            arrow_type = pa.float64()
+        elif isinstance(column_type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column_type, Date):
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.key, arrow_type))
+    return pa.schema(fields)
+
+
+def _plain_value(value):
+    """Convert DB values Parquet can't hold directly (UUID, Decimal)"""
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _partition_fingerprints(db: Session, partition_column, changed_column) -> dict:
+    """Row count and latest change time of every partition, in one grouped query"""
+    label = _partition_expression(partition_column)
+    rows = db.query(label, func.count(), func.max(changed_column)).group_by(label).all()
+    return {
+        partition: {"rows": count, "changed_at": changed_at.isoformat() if changed_at else None}
+        for partition, count, changed_at in rows
+    }
+
+
+def _write_partition(db: Session, table_name: str, columns: List, partition_column, partition: str, schema) -> str:
+    """Write one partition to Parquet (atomically) and return its path relative to the snapshot root"""
+    import pandas as pd
+    
+    relative_path = f"{table_name}/month={partition}/data.parquet"
+    target = snapshot_dir() / relative_path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    
+    query = db.query(*columns).filter(_partition_expression(partition_column) == partition)
+    records = [
+        [_plain_value(value) for value in row]
+        for row in query.yield_per(SNAPSHOT_FETCH_SIZE)
+    ]
+    df = pd.DataFrame.from_records(records, columns=[column.key for column in columns])
+    
+    part_path = target.with_name(target.name + ".part")
+    df.to_parquet(part_path, engine="pyarrow", index=False, schema=schema)
+    os.replace(part_path, target)
+    return relative_path
+
+
+def export_analytics_snapshot(db: Session, tables: Optional[List[str]] = None, full: bool = False) -> dict:
+    """
+    Export tables to the Parquet snapshot, rewriting only changed partitions
+    
+    full=True rewrites every partition regardless of the manifest.
+    Returns per-table counts of written, unchanged and removed partitions.
+    """
+    try:
+        import pandas  # noqa: F401
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.error("pyarrow not installed. Install with: pip install pyarrow")
+        raise RuntimeError("Parquet export not available. Please install pyarrow.")
+    
+    table_names = tables or list(SNAPSHOT_TABLES)
+    unknown = [name for name in table_names if name not in SNAPSHOT_TABLES]
+    if unknown:
+        raise ValueError(f"Unknown snapshot tables: {', '.join(unknown)}")
+    
+    with _export_lock:
+        manifest = load_manifest()
+        summary = {}
+    
+        for table_name in table_names:
+            model, columns, partition_column, changed_column = SNAPSHOT_TABLES[table_name]
+            schema = _arrow_schema(columns)
+            previous = manifest["tables"].get(table_name, {})
+            previous_partitions = previous.get("partitions", {}) if previous.get("columns") == schema.names else {}
+    
+            # The table's data is as of the fingerprint query, not the end of the export
+            exported_at = datetime.utcnow()
+            fingerprints = _partition_fingerprints(db, partition_column, changed_column)
+            partitions = {}
+            written = 0
+    
+            for partition, fingerprint in sorted(fingerprints.items()):
+                entry = previous_partitions.get(partition)
+                unchanged = (
+                    not full
+                    and entry is not None
+                    and entry["rows"] == fingerprint["rows"]
+                    and entry["changed_at"] == fingerprint["changed_at"]
+                    and (snapshot_dir() / entry["path"]).exists()
+                )
+                if unchanged:
+                    partitions[partition] = entry
+                    continue
+    
+                path = _write_partition(db, table_name, columns, partition_column, partition, schema)
+                partitions[partition] = {
+                    **fingerprint,
+                    "path": path,
+                    "written_at": datetime.utcnow().isoformat(),
+                }
+                written += 1
+    
+            # Partitions whose rows are all gone
+            removed = 0
+            for partition, entry in previous_partitions.items():
+                if partition not in fingerprints:
+                    try:
+                        (snapshot_dir() / entry["path"]).unlink()
+                    except FileNotFoundError:
+                        pass
+                    removed += 1
+    
+            manifest["tables"][table_name] = {
+                "columns": schema.names,
+                "partition_by": f"month({partition_column.key})",
+                "rows": sum(entry["rows"] for entry in partitions.values()),
+                "partitions": partitions,
+                "exported_at": exported_at.isoformat(),
+            }
+            summary[table_name] = {
+                "written": written,
+                "unchanged": len(partitions) - written,
+                "removed": removed,
+                "rows": manifest["tables"][table_name]["rows"],
+            }
+    
+            # Persist after each table so an interrupted export keeps its progress
+            manifest["generated_at"] = datetime.utcnow().isoformat()
+            _write_manifest(manifest)
+            logger.info(f"Analytics snapshot: {table_name}", extra=summary[table_name])
+    
+    return summary
+
+
+def snapshot_file_path(table_name: str, partition: str) -> Optional[Path]:
+    """Absolute path of an exported partition listed in the manifest, or None"""
+    entry = load_manifest()["tables"].get(table_name, {}).get("partitions", {}).get(partition)
+    if not entry:
+        return None
+    path = snapshot_dir() / entry["path"]
+    return path if path.exists() else None
@@ -0,0 +1,127 @@
+"""
+Idempotency Service
+Stores the response of a write request under the client's Idempotency-Key so
+that a retry of the same request gets the original response back instead of
+creating a second interaction, document or approval task.
+
+Keys are scoped per user and expire after IDEMPOTENCY_KEY_TTL_HOURS. The first
+request with a key claims it (IN_PROGRESS) with a single INSERT ... ON CONFLICT,
+so concurrent retries cannot both run; its response is then stored
+(COMPLETED). A key left IN_PROGRESS by a crashed request can be taken over
+after IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from uuid import UUID
+import hashlib
+import logging
+
+from app.core.config import settings
+from app.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of begin_request
+STARTED = "STARTED"  # Key claimed: run the request, then complete_request or abandon_request
+REPLAY = "REPLAY"  # Completed before: return the stored response
+IN_PROGRESS = "IN_PROGRESS"  # Another request with the key is still running
+MISMATCH = "MISMATCH"  # Key already used for a different request
+
+# Response headers stored with the body and replayed
+REPLAYED_HEADERS = ("content-type", "etag", "location")
+
+
+def request_fingerprint(method: str, path: str, query: str, body: Optional[bytes]) -> str:
+    """SHA-256 over the parts of the request that must match for a retry (body None = not compared)"""
+    digest = hashlib.sha256()
+    for part in (method.upper(), path, query):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    if body is not None:
+        digest.update(body)
+    return digest.hexdigest()
+
+
+def begin_request(db: Session, user_id: UUID, key: str, fingerprint: str) -> Tuple[str, Optional[IdempotencyKey]]:
+    """
+    Claim the key for a new request, or report why the request must not run.
+    
+    Returns (outcome, stored record); the record is set for REPLAY. Commits.
+    """
+    now = datetime.utcnow()
+    values = {
+        "user_id": user_id,
+        "idempotency_key": key,
+        "request_fingerprint": fingerprint,
+        "status": "IN_PROGRESS",
+        "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_IN_PROGRESS_TIMEOUT_SECONDS),
+        "response_status_code": None,
+        "response_headers": None,
+        "response_body": None,
+        "created_at": now,
+        "expires_at": now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    }
+    statement = insert(IdempotencyKey).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.idempotency_key],
+        set_={name: statement.excluded[name] for name in values if name not in ("user_id", "idempotency_key")},
+        # Expired keys and abandoned in-progress ones start over
+        where=or_(
+            IdempotencyKey.expires_at <= now,
+            and_(IdempotencyKey.status == "IN_PROGRESS", IdempotencyKey.locked_until <= now)
+        )
+    ).returning(IdempotencyKey.idempotency_key)
+    claimed = db.execute(statement).scalar() is not None
+    db.commit()
+    if claimed:
+        return STARTED, None
+    
+    record = db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.idempotency_key == key
+    ).first()
+    if record is None:
+        # Purged between the two statements; treat as taken by a concurrent request
+        return IN_PROGRESS, None
+    if record.request_fingerprint != fingerprint:
+        return MISMATCH, record
+    if record.status == "IN_PROGRESS":
+        return IN_PROGRESS, record
+    return REPLAY, record
+
+
+def complete_request(db: Session, user_id: UUID, key: str, status_code: int, headers: dict, body: bytes) -> None:
+    """Store the response for replay and commit"""
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.idempotency_key == key
+    ).update({
+        IdempotencyKey.status: "COMPLETED",
+        IdempotencyKey.locked_until: None,
+        IdempotencyKey.response_status_code: status_code,
+        IdempotencyKey.response_headers: {name: value for name, value in headers.items() if name in REPLAYED_HEADERS},
+        IdempotencyKey.response_body: body,
+    }, synchronize_session=False)
+    db.commit()
+
+
+def abandon_request(db: Session, user_id: UUID, key: str) -> None:
+    """Release a claimed key without a stored response (server error, response too large) and commit"""
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.idempotency_key == key,
+        IdempotencyKey.status == "IN_PROGRESS"
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def purge_expired_keys(db: Session) -> int:
+    """Delete keys past their TTL and commit"""
+    deleted = db.query(IdempotencyKey).filter(
+        IdempotencyKey.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
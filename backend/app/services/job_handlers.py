@@ -0,0 +1,147 @@
+"""
+Job Handlers
+Built-in background job types. Each handler receives its own session and the
+job payload; see job_queue.job_handler.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import datetime
+import logging
+
+from app.services.job_queue import job_handler, purge_finished_jobs
+
+logger = logging.getLogger(__name__)
+
+
+@job_handler("alerts.run_checks", queue="alerts")
+def run_alert_checks_job(db: Session, payload: dict) -> dict:
+    """Run every alert check (payload: full=True forces a full sweep), then queue delivery of new alerts"""
+    from app.services.alert_engine import run_alert_checks
+    from app.services.job_queue import enqueue_job
+    result = run_alert_checks(db, full_sweep=bool(payload.get("full")))
+    if result["total"]:
+        enqueue_job(db, "alerts.deliver", queue="alerts", dedupe_key="alerts.deliver")
+    return result
+
+
+@job_handler("alerts.deliver", queue="alerts")
+def deliver_alerts_job(db: Session, payload: dict) -> dict:
+    """Deliver pending alerts over their channels (payload: max_batches, optional)"""
+    from app.services.alert_delivery import deliver_pending_alerts
+    return deliver_pending_alerts(db, max_batches=payload.get("max_batches"))
+
+
+@job_handler("progress.recalculate", queue="recalculations")
+def recalculate_progress_job(db: Session, payload: dict) -> dict:
+    """
+    Recalculate unit statuses, then building and project majority, each once
+    
+    Payload: unit_ids, building_ids and project_ids (lists, each optional);
+    queued by majority.queue_progress_recalculation.
+    """
+    from app.services.majority import recalculate_progress
+    
+    result = recalculate_progress(
+        db,
+        unit_ids=payload.get("unit_ids") or [],
+        building_ids=payload.get("building_ids") or [],
+        project_ids=payload.get("project_ids") or []
+    )
+    return {
+        "units": result["units"],
+        "buildings": len(result["buildings"]),
+        "projects": len(result["projects"]),
+    }
+
+
+@job_handler("progress.recalculate_all", queue="recalculations")
+def recalculate_all_progress_job(db: Session, payload: dict) -> dict:
+    """Refresh the building and project progress rollups of every active project"""
+    from app.models.project import Project
+    from app.services.majority import calculate_project_majority
+    
+    project_ids = [
+        str(project_id)
+        for (project_id,) in db.query(Project.project_id).filter(Project.is_deleted == False)
+    ]
+    failed = []
+    for project_id in project_ids:
+        try:
+            calculate_project_majority(project_id, db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Progress rollup failed for project {project_id}: {e}", exc_info=True)
+            failed.append(project_id)
+    if failed and len(failed) == len(project_ids):
+        raise RuntimeError(f"Progress rollup failed for all {len(failed)} projects")
+    return {"projects": len(project_ids), "failed": failed}
+
+
+@job_handler("maintenance.refresh_contact_counters")
+def refresh_contact_counters_job(db: Session, payload: dict) -> dict:
+    """Bring units.days_since_contact up to date with last_contact_date, in one UPDATE"""
+    from app.models.unit import Unit
+    
+    days_since = func.current_date() - Unit.last_contact_date
+    updated = db.query(Unit).filter(
+        Unit.last_contact_date.isnot(None),
+        Unit.days_since_contact.is_distinct_from(days_since)
+    ).update({Unit.days_since_contact: days_since}, synchronize_session=False)
+    db.commit()
+    return {"units_updated": updated}
+
+
+@job_handler("maintenance.rebuild_alert_inbox")
+def rebuild_alert_inbox_job(db: Session, payload: dict) -> dict:
+    """Recount every alert inbox counter from the alerts table"""
+    from app.services.alert_inbox import rebuild_unread_counts
+    inboxes = rebuild_unread_counts(db)
+    db.commit()
+    return {"inboxes": inboxes}
+
+
+@job_handler("maintenance.expire_wizard_drafts")
+def expire_wizard_drafts_job(db: Session, payload: dict) -> dict:
+    """Delete wizard drafts past their expiry date"""
+    from app.models.wizard import WizardDraft
+    
+    deleted = db.query(WizardDraft).filter(
+        WizardDraft.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return {"drafts_deleted": deleted}
+
+
+@job_handler("maintenance.purge_idempotency_keys")
+def purge_idempotency_keys_job(db: Session, payload: dict) -> dict:
+    """Delete Idempotency-Key responses past IDEMPOTENCY_KEY_TTL_HOURS"""
+    from app.services.idempotency import purge_expired_keys
+    return {"deleted": purge_expired_keys(db)}
+
+
+@job_handler("reports.run_subscriptions", queue="reports")
+def run_report_subscriptions_job(db: Session, payload: dict) -> dict:
+    """Render and deliver due report subscriptions (payload: force)"""
+    from app.services.report_subscriptions import run_due_subscriptions
+    return run_due_subscriptions(force=bool(payload.get("force")))
+
+
+@job_handler("reports.cleanup_jobs", queue="reports")
+def cleanup_report_jobs_job(db: Session, payload: dict) -> dict:
+    """Expire report job artifacts past their retention window"""
+    from app.services.report_jobs import cleanup_expired_report_jobs
+    return {"expired": cleanup_expired_report_jobs(db)}
+
+
+@job_handler("analytics.export_snapshot", queue="reports")
+def export_analytics_snapshot_job(db: Session, payload: dict) -> dict:
+    """Refresh the Parquet analytics snapshot (payload: tables, full)"""
+    from app.services.analytics_snapshot import export_analytics_snapshot
+    return export_analytics_snapshot(db, payload.get("tables"), bool(payload.get("full")))
+
+
+@job_handler("jobs.purge")
+def purge_jobs_job(db: Session, payload: dict) -> dict:
+    """Delete finished background jobs past JOB_QUEUE_RETENTION_DAYS"""
+    return {"deleted": purge_finished_jobs(db)}
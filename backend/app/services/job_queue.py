@@ -0,0 +1,400 @@
+"""
+Job Queue Service
+Background work queued in the background_jobs table and executed by job
+workers (scripts/run_job_worker.py). Only Postgres is required.
+
+Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, highest priority
+first, so any number of them can poll the same queues without blocking each
+other. Claims on a queue are serialized by a transaction-level advisory lock,
+which lets JOB_QUEUE_CONCURRENCY cap the jobs running per queue across all
+workers. Failed jobs are retried with exponential backoff until max_attempts,
+and jobs whose worker stopped renewing its lease are handed out again.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, timedelta
+from typing import Optional, List, Callable, Dict, Set
+from uuid import UUID
+import importlib
+import os
+import random
+import socket
+import threading
+import uuid
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.background_job import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, dict], Optional[dict]]
+
+# Modules whose import registers the built-in handlers
+HANDLER_MODULES = ["app.services.job_handlers"]
+
+_handlers: Dict[str, JobHandler] = {}
+_handlers_loaded = False
+
+
+class UnknownJobTypeError(Exception):
+    """Raised when enqueueing a job type no handler is registered for"""
+
+
+def job_handler(job_type: str, queue: str = "default"):
+    """
+    Register a function as the handler of a job type
+    
+    The handler is called with its own session and the job payload; it commits
+    its own work and may return a JSON-serializable result to store on the job.
+    `queue` is the default queue for jobs of this type.
+    """
+    def decorator(handler: JobHandler) -> JobHandler:
+        handler.default_queue = queue
+        _handlers[job_type] = handler
+        return handler
+    return decorator
+
+
+def get_job_handler(job_type: str) -> JobHandler:
+    """Handler registered for a job type (raises UnknownJobTypeError)"""
+    global _handlers_loaded
+    if not _handlers_loaded:
+        for module in HANDLER_MODULES:
+            importlib.import_module(module)
+        _handlers_loaded = True
+    if job_type not in _handlers:
+        raise UnknownJobTypeError(f"No handler registered for job type {job_type}")
+    return _handlers[job_type]
+
+
+def enqueue_job(
+    db: Session,
+    job_type: str,
+    payload: Optional[dict] = None,
+    queue: Optional[str] = None,
+    priority: int = 0,
+    run_at: Optional[datetime] = None,
+    max_attempts: Optional[int] = None,
+    dedupe_key: Optional[str] = None,
+    commit: bool = True
+) -> UUID:
+    """
+    Queue a job and return its id
+    
+    With a dedupe_key, a job that is still QUEUED under the same key is reused
+    instead of adding another (e.g. several edits to one building recalculate
+    it once). commit=False leaves the insert in the caller's transaction, so the
+    job only becomes visible if the caller's own changes commit.
+    """
+    handler = get_job_handler(job_type)
+    values = {
+        "job_id": uuid.uuid4(),
+        "queue": queue or handler.default_queue,
+        "job_type": job_type,
+        "payload": payload or {},
+        "status": "QUEUED",
+        "priority": priority,
+        "dedupe_key": dedupe_key,
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.JOB_QUEUE_MAX_ATTEMPTS,
+        "run_at": run_at or datetime.utcnow(),
+        "created_at": datetime.utcnow(),
+    }
+    
+    statement = insert(BackgroundJob).values(**values)
+    if dedupe_key:
+        statement = statement.on_conflict_do_nothing(
+            index_elements=[BackgroundJob.dedupe_key],
+            index_where=BackgroundJob.status == "QUEUED"
+        )
+    inserted = db.execute(statement.returning(BackgroundJob.job_id)).scalar()
+    if inserted is None:
+        inserted = db.query(BackgroundJob.job_id).filter(
+            BackgroundJob.dedupe_key == dedupe_key,
+            BackgroundJob.status == "QUEUED"
+        ).scalar()
+    if commit:
+        db.commit()
+    return inserted
+
+
+def queue_concurrency(queue: str) -> int:
+    """Maximum jobs of a queue running at once across all workers"""
+    return settings.JOB_QUEUE_CONCURRENCY.get(queue, settings.JOB_QUEUE_CONCURRENCY.get("default", 1))
+
+
+def claim_job(db: Session, queue: str, worker_id: str) -> Optional[BackgroundJob]:
+    """
+    Claim the next ready job of a queue, or None
+    
+    Returns None when nothing is ready or the queue already runs its maximum
+    number of jobs.
+    """
+    now = datetime.utcnow()
+    try:
+        db.execute(func.pg_advisory_xact_lock(func.hashtext(f"job_queue:{queue}")).select())
+        running = db.query(func.count(BackgroundJob.job_id)).filter(
+            BackgroundJob.queue == queue,
+            BackgroundJob.status == "RUNNING"
+        ).scalar()
+        if running >= queue_concurrency(queue):
+            db.commit()
+            return None
+    
+        job = db.query(BackgroundJob).filter(
+            BackgroundJob.queue == queue,
+            BackgroundJob.status == "QUEUED",
+            BackgroundJob.run_at <= now
+        ).order_by(
+            BackgroundJob.priority.desc(),
+            BackgroundJob.run_at
+        ).with_for_update(skip_locked=True).limit(1).first()
+    
+        if job:
+            job.status = "RUNNING"
+            job.attempts += 1
+            job.locked_by = worker_id
+            job.locked_at = now
+            job.started_at = now
+            job.dedupe_key = None  # Edits from now on need a new run
+        db.commit()
+        return job
+    except Exception:
+        db.rollback()
+        raise
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with jitter after the given number of failed attempts"""
+    delay = min(settings.JOB_QUEUE_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_QUEUE_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _finish_job(db: Session, job_id: UUID, worker_id: str, values: dict) -> bool:
+    """
+    Record a job outcome if the worker still holds the job, and commit
+    
+    A job whose lease expired may have been requeued and claimed by another
+    worker meanwhile; its new run's state must not be overwritten.
+    """
+    finished = db.query(BackgroundJob).filter(
+        BackgroundJob.job_id == job_id,
+        BackgroundJob.locked_by == worker_id,
+        BackgroundJob.status == "RUNNING"
+    ).update(
+        dict(values, locked_by=None, locked_at=None),
+        synchronize_session=False
+    )
+    db.commit()
+    if not finished:
+        logger.warning(f"Job {job_id} was taken over by another worker; outcome of {worker_id} discarded")
+    return bool(finished)
+
+
+def execute_job(job_id: UUID, worker_id: str) -> str:
+    """
+    Run a claimed job and record the outcome; returns the final status
+    
+    The handler gets its own session, so a failing handler can't leave the
+    bookkeeping session in a broken transaction. Returns "LOST" if the lease
+    was lost while the handler ran.
+    """
+    db = SessionLocal()
+    work_db = SessionLocal()
+    try:
+        job = db.query(BackgroundJob).filter(BackgroundJob.job_id == job_id).first()
+        if not job or job.status != "RUNNING" or job.locked_by != worker_id:
+            return job.status if job else "MISSING"
+        job_type, payload = job.job_type, job.payload or {}
+        attempts, max_attempts = job.attempts, job.max_attempts
+        queue, started_at = job.queue, job.started_at
+        db.commit()  # Don't sit idle in a transaction while the handler runs
+    
+        try:
+            result = get_job_handler(job_type)(work_db, payload)
+            work_db.commit()
+        except Exception as e:
+            work_db.rollback()
+            logger.error(f"Job {job_id} ({job_type}) failed on attempt {attempts}: {e}", exc_info=True)
+            values = {"last_error": str(e)[:2000]}
+            if attempts < max_attempts and not isinstance(e, UnknownJobTypeError):
+                values.update(status="QUEUED", run_at=datetime.utcnow() + retry_delay(attempts))
+            else:
+                values.update(status="FAILED", finished_at=datetime.utcnow())
+            if not _finish_job(db, job_id, worker_id, values):
+                return "LOST"
+            return values["status"]
+    
+        finished_at = datetime.utcnow()
+        if not _finish_job(db, job_id, worker_id, {"status": "COMPLETED", "result": result, "finished_at": finished_at}):
+            return "LOST"
+        logger.info(
+            "Background job completed",
+            extra={
+                "job_id": str(job_id),
+                "job_type": job_type,
+                "queue": queue,
+                "duration_ms": int((finished_at - started_at).total_seconds() * 1000),
+            }
+        )
+        return "COMPLETED"
+    finally:
+        work_db.close()
+        db.close()
+
+
+def renew_leases(db: Session, job_ids: Set[UUID]) -> None:
+    """Extend the lease of jobs a worker is still running"""
+    if not job_ids:
+        return
+    db.query(BackgroundJob).filter(
+        BackgroundJob.job_id.in_(job_ids),
+        BackgroundJob.status == "RUNNING"
+    ).update({"locked_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+def recover_stale_jobs(db: Session) -> int:
+    """
+    Handle RUNNING jobs whose worker stopped renewing the lease (crashed or killed)
+    
+    Attempts count from the claim, so a job that keeps killing its worker (OOM,
+    a crash in a native renderer) fails after max_attempts like any other job;
+    the rest are requeued with the usual backoff.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.JOB_QUEUE_LEASE_SECONDS)
+    stale = db.query(BackgroundJob).filter(
+        BackgroundJob.status == "RUNNING",
+        BackgroundJob.locked_at < cutoff
+    ).with_for_update(skip_locked=True).all()
+    
+    failed = 0
+    for job in stale:
+        job.locked_by = None
+        job.locked_at = None
+        job.last_error = "Worker lease expired"
+        if job.attempts >= job.max_attempts:
+            job.status = "FAILED"
+            job.finished_at = now
+            failed += 1
+        else:
+            job.status = "QUEUED"
+            job.run_at = now + retry_delay(job.attempts)
+    db.commit()
+    if stale:
+        logger.warning(
+            f"Recovered {len(stale)} background jobs with expired leases",
+            extra={"requeued": len(stale) - failed, "failed": failed}
+        )
+    return len(stale)
+
+
+def purge_finished_jobs(db: Session) -> int:
+    """Delete COMPLETED and CANCELLED jobs older than JOB_QUEUE_RETENTION_DAYS (failures are kept)"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.JOB_QUEUE_RETENTION_DAYS)
+    deleted = db.query(BackgroundJob).filter(
+        BackgroundJob.status.in_(["COMPLETED", "CANCELLED"]),
+        BackgroundJob.created_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+def get_job_queue_metrics(db: Session) -> dict:
+    """Job counts per queue and status, plus the age of the oldest ready job per queue"""
+    queues: Dict[str, dict] = {}
+    for queue, job_status, count in db.query(
+        BackgroundJob.queue, BackgroundJob.status, func.count(BackgroundJob.job_id)
+    ).group_by(BackgroundJob.queue, BackgroundJob.status):
+        queues.setdefault(queue, {"concurrency": queue_concurrency(queue), "jobs_by_status": {}})
+        queues[queue]["jobs_by_status"][job_status] = count
+    
+    now = datetime.utcnow()
+    for queue, oldest in db.query(BackgroundJob.queue, func.min(BackgroundJob.run_at)).filter(
+        BackgroundJob.status == "QUEUED",
+        BackgroundJob.run_at <= now
+    ).group_by(BackgroundJob.queue):
+        queues[queue]["oldest_ready_seconds"] = int((now - oldest).total_seconds())
+    
+    return {"queues": queues}
+
+
+class JobWorker:
+    """
+    Runs jobs from a set of queues until stopped
+    
+    Each queue gets as many polling threads as its concurrency limit, and one
+    maintenance thread renews the leases of running jobs and requeues jobs
+    abandoned by dead workers.
+    """
+    
+    def __init__(self, queues: List[str]):
+        self.queues = queues
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stop_event = threading.Event()
+        self._running: Set[UUID] = set()
+        self._running_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+    
+    def _poll(self, queue: str, slot: int) -> None:
+        worker_id = f"{self.worker_id}:{queue}:{slot}"
+        while not self.stop_event.is_set():
+            db = SessionLocal()
+            try:
+                job = claim_job(db, queue, worker_id)
+                job_id = job.job_id if job else None
+            except Exception as e:
+                logger.error(f"Claiming a job from {queue} failed: {e}", exc_info=True)
+                job_id = None
+            finally:
+                db.close()
+    
+            if job_id is None:
+                self.stop_event.wait(settings.JOB_QUEUE_POLL_SECONDS)
+                continue
+    
+            with self._running_lock:
+                self._running.add(job_id)
+            try:
+                execute_job(job_id, worker_id)
+            except Exception as e:
+                logger.error(f"Job {job_id} could not be recorded: {e}", exc_info=True)
+            finally:
+                with self._running_lock:
+                    self._running.discard(job_id)
+    
+    def _maintain(self) -> None:
+        interval = max(settings.JOB_QUEUE_LEASE_SECONDS / 3, 1)
+        while not self.stop_event.wait(interval):
+            db = SessionLocal()
+            try:
+                with self._running_lock:
+                    running = set(self._running)
+                renew_leases(db, running)
+                recover_stale_jobs(db)
+            except Exception as e:
+                logger.error(f"Job worker maintenance failed: {e}", exc_info=True)
+            finally:
+                db.close()
+    
+    def start(self) -> None:
+        for queue in self.queues:
+            for slot in range(queue_concurrency(queue)):
+                thread = threading.Thread(target=self._poll, args=(queue, slot), name=f"job-{queue}-{slot}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        maintenance = threading.Thread(target=self._maintain, name="job-maintenance", daemon=True)
+        maintenance.start()
+        self._threads.append(maintenance)
+        logger.info(f"Job worker {self.worker_id} started", extra={"queues": self.queues})
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop polling and wait for running jobs to finish"""
+        self.stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
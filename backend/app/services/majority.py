@@ -6,20 +6,25 @@ PARTIALLY_SIGNED units count as 0% for progress calculation.
 """
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from typing import Iterable, Optional
+from uuid import UUID
 from app.models.building import Building
 from app.models.unit import Unit
 from app.models.owner import Owner
 from app.models.project import Project
-from app.services.unit_status import update_unit_status
+from app.services.unit_status import update_unit_status, update_unit_statuses
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def calculate_building_majority(building_id: str, db: Session) -> dict:
+def calculate_building_majority(building_id: str, db: Session, refresh_units: bool = True) -> dict:
     """
     Calculate signature percentage for a building based on SIGNED units.
     
+    With refresh_units=False the unit statuses are taken as already up to date
+    (see recalculate_progress).
+    
     HEADCOUNT method: (fully signed units) / (total units) × 100
     AREA method: (sum area of fully signed units) / (total area) × 100
     
@@ -50,15 +55,16 @@ def calculate_building_majority(building_id: str, db: Session) -> dict:
         Unit.is_deleted == False
     ).all()
     
-    # Update unit statuses first
-    for unit in units:
-        update_unit_status(str(unit.unit_id), db)
-    
-    # Re-query units to get updated statuses
-    units = db.query(Unit).filter(
-        Unit.building_id == building_id,
-        Unit.is_deleted == False
-    ).all()
+    if refresh_units:
+        # Update unit statuses first
+        for unit in units:
+            update_unit_status(str(unit.unit_id), db)
+        
+        # Re-query units to get updated statuses
+        units = db.query(Unit).filter(
+            Unit.building_id == building_id,
+            Unit.is_deleted == False
+        ).all()
     
     # Count units by status
     units_signed = 0  # All owners signed
@@ -163,10 +169,13 @@ def calculate_building_majority(building_id: str, db: Session) -> dict:
     }
 
 
-def calculate_project_majority(project_id: str, db: Session) -> dict:
+def calculate_project_majority(project_id: str, db: Session, refresh_buildings: bool = True) -> dict:
     """
     Calculate signature percentage for a project based on SIGNED units across all buildings.
     
+    With refresh_buildings=False the building rollups are taken as already up
+    to date (see recalculate_progress).
+    
     HEADCOUNT: (fully signed units in project) / (total units in project) × 100
     AREA: (sum area of fully signed units) / (total area) × 100
     
@@ -198,8 +207,9 @@ def calculate_project_majority(project_id: str, db: Session) -> dict:
     signed_area = 0.0
     
     for building in buildings:
-        # Recalculate building majority first
-        calculate_building_majority(str(building.building_id), db)
+        if refresh_buildings:
+            # Recalculate building majority first
+            calculate_building_majority(str(building.building_id), db)
         
         # Get units in this building
         units = db.query(Unit).filter(
@@ -251,3 +261,59 @@ def calculate_project_majority(project_id: str, db: Session) -> dict:
         "units_not_signed": units_not_signed,
     }
 
+
+def recalculate_progress(
+    db: Session,
+    unit_ids: Iterable = (),
+    building_ids: Iterable = (),
+    project_ids: Iterable = ()
+) -> dict:
+    """
+    Recalculate each given unit, building and project exactly once, bottom-up.
+    
+    Chaining update_unit_status, calculate_building_majority and
+    calculate_project_majority recalculates everything below each level again;
+    here buildings reuse the fresh unit statuses and projects the fresh
+    building rollups. Use it after changing many owners at once.
+    
+    Returns: {"units": {unit_id: status}, "buildings": {building_id: result}, "projects": {project_id: result}}
+    """
+    unit_statuses = update_unit_statuses({str(unit_id) for unit_id in unit_ids}, db)
+    db.commit()
+    
+    buildings = {
+        building_id: calculate_building_majority(building_id, db, refresh_units=False)
+        for building_id in sorted({str(building_id) for building_id in building_ids})
+    }
+    projects = {
+        project_id: calculate_project_majority(project_id, db, refresh_buildings=False)
+        for project_id in sorted({str(project_id) for project_id in project_ids})
+    }
+    
+    return {"units": unit_statuses, "buildings": buildings, "projects": projects}
+
+
+def queue_progress_recalculation(
+    db: Session,
+    unit_ids: Iterable = (),
+    building_ids: Iterable = (),
+    project_ids: Iterable = ()
+) -> Optional[UUID]:
+    """
+    Queue a progress.recalculate job (see recalculate_progress) instead of
+    recalculating inside the request.
+    
+    The job is added to the caller's transaction without committing, so it only
+    runs if the caller's changes commit. Returns the job id, or None if there
+    is nothing to recalculate.
+    """
+    from app.services.job_queue import enqueue_job
+    
+    payload = {
+        "unit_ids": sorted({str(unit_id) for unit_id in unit_ids}),
+        "building_ids": sorted({str(building_id) for building_id in building_ids}),
+        "project_ids": sorted({str(project_id) for project_id in project_ids}),
+    }
+    if not any(payload.values()):
+        return None
+    return enqueue_job(db, "progress.recalculate", payload, commit=False)
@@ -0,0 +1,220 @@
+"""
+Matrix Export Service
+Builds the per-building "matrix" workbook field teams work from: one row per
+unit with its owners pivoted into columns, statuses and interaction counts.
+
+All data comes from one joined query ordered by unit, which is pivoted while
+streaming into a write-only workbook, so a whole project exports in seconds.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, and_, or_
+from itertools import groupby
+from typing import Optional, List
+import logging
+
+from app.models.user import User
+from app.models.project import Project
+from app.models.building import Building
+from app.models.unit import Unit
+from app.models.owner import Owner
+from app.models.interaction import Interaction
+
+logger = logging.getLogger(__name__)
+
+MATRIX_FETCH_SIZE = 2000
+# Owner column groups are sized to the busiest unit, up to this many
+MATRIX_MAX_OWNER_COLUMNS = 10
+
+UNIT_HEADERS = [
+    "Project", "Building", "Address", "Floor", "Unit", "Area (sqm)", "Unit Status",
+    "Owners", "Signed Owners", "Interactions", "Last Contact",
+]
+OWNER_HEADERS = ["Owner {n}", "Owner {n} Share %", "Owner {n} Status", "Owner {n} Phone"]
+
+
+def _scope_buildings(query, project_id: Optional[str], building_id: Optional[str], current_user: User):
+    """Restrict a query joined to Building to the requested scope and the user's visibility"""
+    query = query.filter(Building.is_deleted == False)
+    if project_id:
+        query = query.filter(Building.project_id == project_id)
+    if building_id:
+        query = query.filter(Building.building_id == building_id)
+    
+    # Role-based filtering (same visibility as the building progress report)
+    if current_user.role == "AGENT":
+        query = query.filter(
+            or_(
+                Building.assigned_agent_id == current_user.user_id,
+                Building.assigned_agent_id.is_(None)
+            )
+        )
+    return query
+
+
+def _owner_filter():
+    return and_(Owner.unit_id == Unit.unit_id, Owner.is_deleted == False, Owner.is_current_owner == True)
+
+
+def _matrix_query(db: Session, project_id: Optional[str], building_id: Optional[str], current_user: User):
+    """Units left-joined to their current owners and per-owner interaction counts, ordered by unit"""
+    interactions_sq = _scope_buildings(
+        db.query(
+            Interaction.owner_id.label("owner_id"),
+            func.count(Interaction.log_id).label("interaction_count")
+        ).join(
+            Owner, Owner.owner_id == Interaction.owner_id
+        ).join(
+            Unit, Unit.unit_id == Owner.unit_id
+        ).join(
+            Building, Building.building_id == Unit.building_id
+        ),
+        project_id, building_id, current_user
+    ).group_by(Interaction.owner_id).subquery()
+    
+    query = db.query(
+        Project.project_name,
+        Building.building_name,
+        Building.address,
+        Unit.unit_id,
+        Unit.floor_number,
+        Unit.unit_number,
+        Unit.area_sqm,
+        Unit.unit_status,
+        Unit.last_contact_date,
+        Owner.owner_id,
+        Owner.full_name,
+        Owner.ownership_share_percent,
+        Owner.owner_status,
+        Owner.phone_for_contact,
+        func.coalesce(interactions_sq.c.interaction_count, 0),
+    ).select_from(Unit).join(
+        Building, Building.building_id == Unit.building_id
+    ).join(
+        Project, Project.project_id == Building.project_id
+    ).outerjoin(
+        Owner, _owner_filter()
+    ).outerjoin(
+        interactions_sq, interactions_sq.c.owner_id == Owner.owner_id
+    ).filter(Unit.is_deleted == False)
+    
+    return _scope_buildings(query, project_id, building_id, current_user).order_by(
+        Project.project_name,
+        Building.building_name,
+        Unit.building_id,
+        Unit.floor_number,
+        Unit.unit_number,
+        Unit.unit_id,
+        Owner.is_primary_contact.desc(),
+        Owner.full_name
+    )
+
+
+def _max_owners_per_unit(db: Session, project_id: Optional[str], building_id: Optional[str], current_user: User) -> int:
+    """Largest number of current owners on one unit in scope (sizes the owner column groups)"""
+    per_unit = _scope_buildings(
+        db.query(func.count(Owner.owner_id).label("owners")).select_from(Unit).join(
+            Building, Building.building_id == Unit.building_id
+        ).join(
+            Owner, _owner_filter()
+        ).filter(Unit.is_deleted == False),
+        project_id, building_id, current_user
+    ).group_by(Unit.unit_id).subquery()
+    
+    return db.query(func.coalesce(func.max(per_unit.c.owners), 0)).scalar() or 0
+
+
+def _matrix_row(unit_rows: List[tuple], owner_columns: int) -> list:
+    """Pivot the joined rows of one unit into a single matrix row"""
+    (project_name, building_name, address, _, floor_number, unit_number, area_sqm,
+     unit_status, last_contact_date) = unit_rows[0][:9]
+    owners = [row[9:] for row in unit_rows if row[9] is not None]
+    
+    names = [owner[1] for owner in owners]
+    signed = sum(1 for owner in owners if owner[3] == "SIGNED")
+    interactions = sum(owner[5] for owner in owners)
+    
+    values = [
+        project_name,
+        building_name,
+        address or "",
+        floor_number,
+        unit_number,
+        float(area_sqm) if area_sqm is not None else None,
+        unit_status,
+        f"({len(owners)}) {', '.join(names)}" if owners else "(0)",
+        f"{signed}/{len(owners)}",
+        interactions,
+        last_contact_date.isoformat() if last_contact_date else "",
+    ]
+    for index in range(owner_columns):
+        if index < len(owners):
+            _, full_name, share_percent, owner_status, phone, _ = owners[index]
+            values.extend([
+                full_name,
+                float(share_percent) if share_percent is not None else None,
+                owner_status,
+                phone or "",
+            ])
+        else:
+            values.extend([None, None, None, None])
+    return values
+
+
+def write_matrix_workbook(
+    db: Session,
+    current_user: User,
+    destination,
+    project_id: Optional[str] = None,
+    building_id: Optional[str] = None
+) -> int:
+    """
+    Write the units × owners matrix for a project or building to an .xlsx file
+    
+    Returns the number of unit rows written. Raises ValueError without a scope.
+    """
+    if not project_id and not building_id:
+        raise ValueError("project_id or building_id is required")
+    
+    try:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        from openpyxl.utils import get_column_letter
+    except ImportError:
+        logger.error("openpyxl not installed. Install with: pip install openpyxl")
+        raise RuntimeError("Excel generation not available. Please install openpyxl.")
+    
+    owner_columns = min(_max_owners_per_unit(db, project_id, building_id, current_user), MATRIX_MAX_OWNER_COLUMNS)
+    headers = UNIT_HEADERS + [
+        header.format(n=n)
+        for n in range(1, owner_columns + 1)
+        for header in OWNER_HEADERS
+    ]
+    
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Matrix")
+    ws.freeze_panes = "F2"
+    for idx, header in enumerate(headers, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = 30 if header == "Owners" else max(len(header) + 2, 12)
+    
+    header_fill = PatternFill(start_color="0D9488", end_color="0D9488", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=11)
+    border = Side(style='thin')
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.border = Border(left=border, right=border, top=border, bottom=border)
+        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    query = _matrix_query(db, project_id, building_id, current_user)
+    row_count = 0
+    for _, unit_rows in groupby(query.yield_per(MATRIX_FETCH_SIZE), key=lambda row: row[3]):
+        ws.append(_matrix_row(list(unit_rows), owner_columns))
+        row_count += 1
+    
+    wb.save(destination)
+    return row_count
@@ -0,0 +1,231 @@
+"""
+Report Cache Service
+Keeps rendered report artifacts on disk under STORAGE_PATH/report_cache so
+identical report requests are served without querying and rendering again.
+
+Entries are keyed by report type, format, filters, the requesting user and a
+data version stamp (latest updated_at/created_at and delete counter of every
+table the report reads), so any write to those tables makes older entries
+unreachable. Rendered PDFs and workbooks print who generated them and when,
+so entries are never shared between users. Total size is bounded by REPORT_CACHE_MAX_BYTES with least-recently-used
+eviction, using file mtimes as the access clock.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, table, column
+from pathlib import Path
+from typing import Optional, BinaryIO
+import hashlib
+import json
+import os
+import threading
+import logging
+
+from app.core.config import settings
+from app.models.user import User
+from app.models.project import Project
+from app.models.building import Building
+from app.models.owner import Owner
+from app.models.interaction import Interaction
+from app.models.document import DocumentSignature
+from app.services.report_generation import ReportType, ReportRequest, REPORT_FILE_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Tables (and their change-time column) each report type reads from
+_VERSION_SOURCES = {
+    ReportType.BUILDING_PROGRESS: [
+        (Building, Building.updated_at),
+        (Project, Project.updated_at),
+    ],
+    ReportType.AGENT_PERFORMANCE: [
+        (User, User.updated_at),
+        (Interaction, Interaction.created_at),
+        (Owner, Owner.updated_at),
+        (DocumentSignature, DocumentSignature.updated_at),
+        (Building, Building.updated_at),
+    ],
+    ReportType.INTERACTION_HISTORY: [
+        (Interaction, Interaction.created_at),
+        (Owner, Owner.updated_at),
+        (User, User.updated_at),
+    ],
+    ReportType.COMPLIANCE_AUDIT: [
+        (DocumentSignature, DocumentSignature.updated_at),
+        (Owner, Owner.updated_at),
+        (User, User.updated_at),
+    ],
+}
+
+# Postgres' per-table write statistics; n_tup_del catches hard deletes, which
+# leave no trace in the change-time columns
+_TABLE_STATS = table("pg_stat_user_tables", column("relname"), column("n_tup_del"))
+
+_metrics = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "evicted_bytes": 0}
+_metrics_lock = threading.Lock()
+_evict_lock = threading.Lock()
+
+
+def _count(metric: str, amount: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[metric] += amount
+
+
+def report_cache_dir() -> Path:
+    """Directory holding cached report artifacts"""
+    path = Path(settings.STORAGE_PATH) / "report_cache"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def is_cacheable(request: ReportRequest) -> bool:
+    """Only rendered (PDF/Excel) reports are cached; CSV/NDJSON are streamed"""
+    extension, _ = REPORT_FILE_TYPES[request.format]
+    return settings.REPORT_CACHE_ENABLED and extension in ("pdf", "xlsx")
+
+
+def data_version_stamp(report_type: ReportType, db: Session) -> str:
+    """
+    Version stamp of the data behind a report type, read in one statement
+    
+    Combines the latest change time (an index lookup) and the delete counter
+    of each source table, so inserts, updates, soft deletes (which touch
+    updated_at) and hard deletes all change the stamp without scanning rows.
+    """
+    columns = []
+    for model, changed_at in _VERSION_SOURCES[report_type]:
+        columns.append(db.query(func.max(changed_at)).scalar_subquery())
+        columns.append(
+            select(_TABLE_STATS.c.n_tup_del).where(_TABLE_STATS.c.relname == model.__tablename__).scalar_subquery()
+        )
+    
+    values = db.query(*columns).one()
+    return "|".join(value.isoformat() if hasattr(value, "isoformat") else str(value) for value in values)
+
+
+def report_cache_key(request: ReportRequest, db: Session, current_user: User) -> str:
+    """
+    Cache key for a report request as seen by the current user
+    
+    Keyed per user rather than per role scope: the rendered header names the
+    requester, and its "Generated" time is that of the first render of the
+    unchanged data.
+    """
+    payload = {
+        "request": request.model_dump(mode="json"),
+        "user_id": str(current_user.user_id),
+        "data_version": data_version_stamp(request.report_type, db),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str, request: ReportRequest) -> Path:
+    extension, _ = REPORT_FILE_TYPES[request.format]
+    return report_cache_dir() / f"{key}.{extension}"
+
+
+def open_cached_report(key: str, request: ReportRequest) -> Optional[BinaryIO]:
+    """
+    Open a cached artifact for reading, or return None on a miss
+    
+    The file is opened (and its mtime bumped for LRU) before returning, so a
+    concurrent eviction can't pull it out from under the caller.
+    """
+    path = _entry_path(key, request)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        _count("misses")
+        return None
+    
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    _count("hits")
+    return f
+
+
+def store_cached_report(key: str, request: ReportRequest, source_path: str) -> None:
+    """Copy a rendered artifact into the cache and evict old entries if over budget"""
+    path = _entry_path(key, request)
+    part_path = path.with_name(path.name + f".{os.getpid()}.{threading.get_ident()}.part")
+    try:
+        with open(source_path, "rb") as src, open(part_path, "wb") as dst:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        os.replace(part_path, path)
+    except OSError as e:
+        logger.warning(f"Could not store report in cache: {e}")
+        if part_path.exists():
+            part_path.unlink()
+        return
+    
+    _count("stores")
+    evict_report_cache()
+
+
+def evict_report_cache(max_bytes: Optional[int] = None) -> int:
+    """
+    Remove least recently used entries until the cache fits in max_bytes
+    
+    Returns the number of entries removed.
+    """
+    max_bytes = settings.REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _evict_lock:
+        entries = []
+        for path in report_cache_dir().iterdir():
+            if path.name.endswith(".part"):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    
+        total_bytes = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_bytes <= max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict cached report {path}: {e}")
+                continue
+            total_bytes -= size
+            removed += 1
+            _count("evictions")
+            _count("evicted_bytes", size)
+    
+    return removed
+
+
+def get_report_cache_metrics() -> dict:
+    """Hit/miss counters for this process plus the current size of the cache"""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    
+    entries = 0
+    total_bytes = 0
+    for path in report_cache_dir().iterdir():
+        if path.name.endswith(".part"):
+            continue
+        try:
+            total_bytes += path.stat().st_size
+            entries += 1
+        except FileNotFoundError:
+            continue
+    
+    lookups = metrics["hits"] + metrics["misses"]
+    metrics.update({
+        "hit_rate": round(metrics["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": entries,
+        "total_bytes": total_bytes,
+        "max_bytes": settings.REPORT_CACHE_MAX_BYTES,
+    })
+    return metrics
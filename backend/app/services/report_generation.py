@@ -0,0 +1,903 @@
+"""
+Report Generation Service
+Fetches report data and renders it as PDF, Excel, CSV or NDJSON files.
+Used by the reports API both inline and from background report jobs.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import desc, or_, func, distinct
+from datetime import datetime, date, timedelta
+from typing import Optional, List, Iterable, Iterator, Callable, BinaryIO
+from enum import Enum
+from itertools import islice
+from pydantic import BaseModel
+import csv
+import io
+import json
+import logging
+import os
+import pickle
+import tempfile
+import zlib
+
+from app.core.config import settings
+from app.models.user import User
+from app.models.project import Project
+from app.models.building import Building
+from app.models.owner import Owner
+from app.models.interaction import Interaction
+from app.models.document import DocumentSignature
+from app.services.report_pdf import render_pdf, write_rows_file, iter_rows_file
+from app.services import analytics_engine
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per server-side cursor round trip (and per batched lookup of related rows)
+REPORT_CHUNK_SIZE = 1000
+# Rows buffered before the first sheet row is written, used to size Excel columns
+EXCEL_WIDTH_SAMPLE_ROWS = 500
+EXCEL_MAX_COLUMN_WIDTH = 50
+# Spooled report rows kept in memory before spilling to a temporary file
+REPORT_SPOOL_MEMORY_BYTES = 8 * 1024 * 1024
+# Bytes per chunk when streaming a rendered file to the client
+FILE_STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class ReportType(str, Enum):
+    """Available report types"""
+    BUILDING_PROGRESS = "building_progress"
+    AGENT_PERFORMANCE = "agent_performance"
+    INTERACTION_HISTORY = "interaction_history"
+    COMPLIANCE_AUDIT = "compliance_audit"
+
+
+class ReportFormat(str, Enum):
+    """Available export formats"""
+    PDF = "pdf"
+    EXCEL = "excel"
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+class ReportRequest(BaseModel):
+    """Report generation request"""
+    report_type: ReportType
+    format: ReportFormat = ReportFormat.PDF
+    project_id: Optional[str] = None
+    building_id: Optional[str] = None
+    agent_id: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+
+# File name extension and media type per format
+REPORT_FILE_TYPES = {
+    ReportFormat.PDF: ("pdf", "application/pdf"),
+    ReportFormat.EXCEL: ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    ReportFormat.CSV: ("csv", "text/csv; charset=utf-8"),
+    ReportFormat.NDJSON: ("ndjson", "application/x-ndjson"),
+}
+
+# Row-oriented formats that can be streamed straight from the cursor to the client
+STREAMING_FORMATS = {ReportFormat.CSV, ReportFormat.NDJSON}
+
+# Column order of the CSV/NDJSON exports (keys of the rows built by the _iter_*_rows generators)
+REPORT_FIELDS = {
+    ReportType.BUILDING_PROGRESS: [
+        "building_name", "building_code", "project_name", "address", "total_units",
+        "signature_percentage", "traffic_light_status", "current_status", "created_at",
+    ],
+    ReportType.AGENT_PERFORMANCE: [
+        "agent_name", "email", "total_interactions", "signed_documents",
+        "assigned_buildings", "assigned_owners", "success_rate",
+    ],
+    ReportType.INTERACTION_HISTORY: [
+        "interaction_date", "interaction_type", "owner_name", "owner_phone",
+        "agent_name", "summary", "sentiment", "next_action",
+    ],
+    ReportType.COMPLIANCE_AUDIT: [
+        "signature_date", "owner_name", "status", "approved_at", "approver_name", "approval_reason",
+    ],
+}
+
+
+def report_filename(request: ReportRequest, generated_at: Optional[datetime] = None) -> str:
+    """Download file name for a report, e.g. building_progress_20260101_120000.pdf"""
+    extension, _ = REPORT_FILE_TYPES[request.format]
+    generated_at = generated_at or datetime.now()
+    return f"{request.report_type.value}_{generated_at.strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+def render_report(
+    request: ReportRequest,
+    db: Session,
+    current_user: User,
+    destination,
+    on_progress: Optional[Callable[[int], None]] = None,
+    rows_file: Optional[str] = None
+) -> int:
+    """
+    Render a report in the requested format to a path or binary file object
+    
+    on_progress, if given, is called with the number of data rows processed so far.
+    rows_file, if given, is a file of already fetched rows (see write_report_rows_file)
+    that is rendered instead of querying the database.
+    Returns the total number of data rows rendered.
+    """
+    if request.format == ReportFormat.PDF:
+        return write_pdf_report(request, db, current_user, destination, on_progress, rows_file)
+    elif request.format == ReportFormat.EXCEL:
+        return write_excel_report(request, db, current_user, destination, on_progress, rows_file)
+    elif request.format in STREAMING_FORMATS:
+        return write_text_report(request, db, current_user, destination, on_progress, rows_file)
+    raise ValueError(f"Unsupported format: {request.format}")
+
+
+def write_pdf_report(
+    request: ReportRequest,
+    db: Session,
+    current_user: User,
+    destination,
+    on_progress: Optional[Callable[[int], None]] = None,
+    rows_file: Optional[str] = None
+) -> int:
+    """
+    Write a PDF report to a path or binary file object, returning the row count
+    
+    Every matching row is streamed from the server-side cursor into a spool
+    file, the connection is released, and the PDF worker pool then lays the
+    rows out across as many pages as needed. Nothing is truncated and memory
+    stays bounded regardless of the date range.
+    """
+    generated_by = current_user.full_name or current_user.email
+    signature_percentage_total = 0.0
+    row_count = 0
+    
+    def counted(rows):
+        nonlocal signature_percentage_total, row_count
+        for row in rows:
+            yield row
+            row_count += 1
+            signature_percentage_total += row.get("signature_percentage") or 0.0
+            if on_progress and row_count % REPORT_CHUNK_SIZE == 0:
+                on_progress(row_count)
+    
+    output_path = None
+    if rows_file:
+        # Rows were fetched by the caller: only the totals need a pass over them
+        rows_path = None
+        for _ in counted(iter_rows_file(rows_file)):
+            pass
+    else:
+        fd, rows_path = tempfile.mkstemp(suffix=".rows")
+        os.close(fd)
+    try:
+        if rows_path:
+            write_rows_file(counted(iter_report_rows(request, db, current_user)), rows_path)
+            # All rows are spooled: end the read transaction so the connection goes back to the pool
+            db.rollback()
+        if on_progress:
+            on_progress(row_count)
+        
+        summary = _pdf_summary(request, row_count, signature_percentage_total)
+        header = {
+            "title": request.report_type.value.replace('_', ' ').title() + " Report",
+            "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "generated_by": generated_by,
+            "date_range": f"{request.start_date or 'Start'} to {request.end_date or 'End'}" if request.start_date or request.end_date else None,
+        }
+        
+        if isinstance(destination, (str, os.PathLike)):
+            render_pdf(request.report_type.value, header, summary, rows_path or rows_file, str(destination))
+        else:
+            fd, output_path = tempfile.mkstemp(suffix=".pdf")
+            os.close(fd)
+            render_pdf(request.report_type.value, header, summary, rows_path or rows_file, output_path)
+            for chunk in iter_file_chunks(output_path):
+                destination.write(chunk)
+    finally:
+        for path in (rows_path, output_path):
+            if path and os.path.exists(path):
+                os.unlink(path)
+    
+    return row_count
+
+
+def _pdf_summary(request: ReportRequest, row_count: int, signature_percentage_total: float) -> dict:
+    """Totals printed above the PDF tables"""
+    if request.report_type == ReportType.BUILDING_PROGRESS:
+        return {
+            "total_buildings": row_count,
+            "avg_signature_percentage": signature_percentage_total / row_count if row_count else 0.0
+        }
+    elif request.report_type == ReportType.AGENT_PERFORMANCE:
+        return {
+            "total_agents": row_count,
+            "period_start": request.start_date.isoformat() if request.start_date else None,
+            "period_end": request.end_date.isoformat() if request.end_date else None
+        }
+    elif request.report_type == ReportType.INTERACTION_HISTORY:
+        return {"total_interactions": row_count}
+    elif request.report_type == ReportType.COMPLIANCE_AUDIT:
+        return {"total_signatures": row_count}
+    raise ValueError(f"Unsupported report type: {request.report_type}")
+
+
+def write_excel_report(
+    request: ReportRequest,
+    db: Session,
+    current_user: User,
+    destination,
+    on_progress: Optional[Callable[[int], None]] = None,
+    rows_file: Optional[str] = None
+) -> int:
+    """
+    Write an Excel report to a path or binary file object
+    
+    Rows are fetched through a server-side cursor into a disk spool first (see
+    fetch_report_rows), then fed row by row into a write-only workbook, so
+    memory stays flat regardless of how many rows the report has. Column widths
+    are sized from the header and the first EXCEL_WIDTH_SAMPLE_ROWS rows, which
+    are buffered because write-only sheets emit <cols> before the first row.
+    Returns the number of data rows written.
+    """
+    try:
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        from openpyxl.utils import get_column_letter
+    except ImportError:
+        logger.error("openpyxl not installed. Install with: pip install openpyxl")
+        raise RuntimeError("Excel generation not available. Please install openpyxl.")
+    
+    headers, row_builder, _ = _EXCEL_LAYOUTS[request.report_type]
+    generated_by = current_user.full_name or current_user.email
+    
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=request.report_type.value.replace('_', ' ').title())
+    
+    # Header style
+    header_fill = PatternFill(start_color="0D9488", end_color="0D9488", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    
+    # Buffer a sample of rows so column widths are known before anything is written
+    rows = (row_builder(item) for item in _report_rows(request, db, current_user, rows_file))
+    sample = list(islice(rows, EXCEL_WIDTH_SAMPLE_ROWS))
+    
+    widths = [len(header) for header in headers]
+    for values in sample:
+        for idx, value in enumerate(values):
+            if value is not None:
+                widths[idx] = max(widths[idx], len(str(value)))
+    for idx, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = min(width + 2, EXCEL_MAX_COLUMN_WIDTH)
+    
+    # Title row
+    title_cell = WriteOnlyCell(ws, value=request.report_type.value.replace('_', ' ').title() + " Report")
+    title_cell.font = Font(bold=True, size=16, color="0D9488")
+    title_cell.alignment = Alignment(horizontal='center')
+    ws.append([title_cell])
+    ws.merged_cells.add('A1:D1')
+    
+    # Metadata rows
+    ws.append([f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
+    ws.append([f"Generated by: {generated_by}"])
+    if request.start_date or request.end_date:
+        date_range = f"{request.start_date or 'Start'} to {request.end_date or 'End'}"
+        ws.append([f"Date Range: {date_range}"])
+    else:
+        ws.append([])
+    ws.append([])
+    
+    # Headers
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.border = border
+        cell.alignment = header_alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    # Data rows: the buffered sample first, then the rest of the cursor
+    def bordered(values):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.border = border
+            cells.append(cell)
+        return cells
+    
+    row_count = 0
+    for values in sample:
+        ws.append(bordered(values))
+        row_count += 1
+    del sample
+    for values in rows:
+        ws.append(bordered(values))
+        row_count += 1
+        if on_progress and row_count % REPORT_CHUNK_SIZE == 0:
+            on_progress(row_count)
+    
+    if on_progress:
+        on_progress(row_count)
+    
+    wb.save(destination)
+    return row_count
+
+
+def iter_open_file_chunks(f: BinaryIO) -> Iterator[bytes]:
+    """Stream an already opened binary file in FILE_STREAM_CHUNK_BYTES chunks, closing it afterwards"""
+    with f:
+        while True:
+            chunk = f.read(FILE_STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_file_chunks(file_path: str, delete: bool = False) -> Iterator[bytes]:
+    """Stream a file in FILE_STREAM_CHUNK_BYTES chunks, optionally removing it afterwards"""
+    try:
+        yield from iter_open_file_chunks(open(file_path, "rb"))
+    finally:
+        if delete:
+            try:
+                os.unlink(file_path)
+            except OSError:
+                logger.warning(f"Could not remove temporary report file {file_path}")
+
+
+def iter_report_rows(request: ReportRequest, db: Session, current_user: User) -> Iterator[dict]:
+    """Stream the rows of any report type as plain dicts (see REPORT_FIELDS)"""
+    _, _, rows_source = _EXCEL_LAYOUTS[request.report_type]
+    return rows_source(request, db, current_user)
+
+
+def fetch_report_rows(request: ReportRequest, db: Session, current_user: User) -> Iterator[dict]:
+    """
+    Fetch every report row first, then replay them for rendering
+    
+    Rows are drained from the cursor into a temporary spool file (in memory up
+    to REPORT_SPOOL_MEMORY_BYTES, on disk beyond that), after which the read
+    transaction is ended so the connection returns to the pool before any
+    rendering starts. Meant for read-only report sessions.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MEMORY_BYTES) as spool:
+        row_count = 0
+        for row in iter_report_rows(request, db, current_user):
+            pickle.dump(row, spool, protocol=pickle.HIGHEST_PROTOCOL)
+            row_count += 1
+        db.rollback()
+        
+        spool.seek(0)
+        for _ in range(row_count):
+            yield pickle.load(spool)
+
+
+def write_report_rows_file(request: ReportRequest, db: Session, current_user: User, path: str) -> int:
+    """
+    Fetch every row of a report into a rows file once, for rendering several times
+    
+    The file can be passed as rows_file to render_report in any format. Ends the
+    read transaction afterwards and returns the row count.
+    """
+    row_count = write_rows_file(iter_report_rows(request, db, current_user), path)
+    db.rollback()
+    return row_count
+
+
+def _report_rows(request: ReportRequest, db: Session, current_user: User, rows_file: Optional[str]) -> Iterator[dict]:
+    """Rows of a pre-fetched rows file if given, otherwise fetched from the database"""
+    if rows_file:
+        return iter_rows_file(rows_file)
+    return fetch_report_rows(request, db, current_user)
+
+
+def encode_report_rows(report_format: ReportFormat, fields: List[str], rows: Iterable[dict]) -> Iterator[bytes]:
+    """
+    Encode report rows as CSV (with a header line) or NDJSON
+    
+    Output is yielded in chunks of roughly FILE_STREAM_CHUNK_BYTES rather than
+    per row, so a streaming response doesn't turn into one socket write per row.
+    """
+    if report_format not in STREAMING_FORMATS:
+        raise ValueError(f"Format {report_format} is not a row-oriented format")
+    
+    buffer = io.StringIO()
+    writer = None
+    if report_format == ReportFormat.CSV:
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+    
+    for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps({field: row.get(field) for field in fields}, ensure_ascii=False, default=str))
+            buffer.write("\n")
+        if buffer.tell() >= FILE_STREAM_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_text_report(request: ReportRequest, db: Session, current_user: User) -> Iterator[bytes]:
+    """Stream a CSV/NDJSON report straight from the server-side cursor, with no row cap"""
+    return encode_report_rows(
+        request.format,
+        REPORT_FIELDS[request.report_type],
+        iter_report_rows(request, db, current_user)
+    )
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip-compress a byte stream incrementally (for Content-Encoding: gzip)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def write_text_report(
+    request: ReportRequest,
+    db: Session,
+    current_user: User,
+    destination,
+    on_progress: Optional[Callable[[int], None]] = None,
+    rows_file: Optional[str] = None
+) -> int:
+    """Write a CSV/NDJSON report to a path or binary file object, returning the row count"""
+    row_count = 0
+    
+    def counted(rows):
+        nonlocal row_count
+        for row in rows:
+            yield row
+            row_count += 1
+            if on_progress and row_count % REPORT_CHUNK_SIZE == 0:
+                on_progress(row_count)
+    
+    chunks = encode_report_rows(
+        request.format,
+        REPORT_FIELDS[request.report_type],
+        counted(_report_rows(request, db, current_user, rows_file))
+    )
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    else:
+        for chunk in chunks:
+            destination.write(chunk)
+    
+    if on_progress:
+        on_progress(row_count)
+    return row_count
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Group an iterable into lists of at most `size` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Report types that can run on the analytics snapshot, and the snapshot tables they read
+ANALYTICS_ENGINE_TABLES = {
+    ReportType.AGENT_PERFORMANCE: ["interactions", "owners", "signatures", "buildings"],
+    ReportType.INTERACTION_HISTORY: ["interactions", "owners"],
+}
+
+
+def report_engine(request: ReportRequest) -> str:
+    """
+    Pick the engine for a report: "snapshot" (DuckDB over Parquet) or "postgres"
+    
+    Long historical ranges of the scan-heavy report types go to the snapshot,
+    provided it covers the whole range (the range ends before the day it was
+    exported). Anything touching today, short ranges and row-lookup reports
+    stay on Postgres so results are current.
+    """
+    tables = ANALYTICS_ENGINE_TABLES.get(request.report_type)
+    if not tables or not settings.ANALYTICS_ENGINE_ENABLED or not request.end_date:
+        return "postgres"
+    
+    if request.start_date and (request.end_date - request.start_date).days < settings.ANALYTICS_ENGINE_MIN_RANGE_DAYS:
+        return "postgres"
+    
+    cutoff = analytics_engine.snapshot_cutoff(tables)
+    if cutoff is None or request.end_date >= cutoff:
+        return "postgres"
+    return "snapshot"
+
+
+# Data retrieval functions
+#
+# Each streamable report has a query builder, a per-chunk row builder that
+# resolves related rows with one IN lookup per chunk, and an _iter_*_rows
+# generator that walks the query through a server-side cursor (yield_per).
+
+def _building_progress_query(request: ReportRequest, db: Session, current_user: User):
+    """Build the filtered building progress query"""
+    query = db.query(Building).filter(Building.is_deleted == False)
+    
+    if request.project_id:
+        query = query.filter(Building.project_id == request.project_id)
+    if request.building_id:
+        query = query.filter(Building.building_id == request.building_id)
+    
+    # Role-based filtering
+    if current_user.role == "AGENT":
+        query = query.filter(
+            or_(
+                Building.assigned_agent_id == current_user.user_id,
+                Building.assigned_agent_id.is_(None)
+            )
+        )
+    
+    return query.order_by(desc(Building.signature_percentage))
+
+
+def _building_progress_rows(buildings: List[Building], db: Session) -> List[dict]:
+    """Convert a chunk of buildings into report rows"""
+    project_ids = {b.project_id for b in buildings}
+    projects = {
+        p.project_id: p.project_name
+        for p in db.query(Project.project_id, Project.project_name).filter(Project.project_id.in_(project_ids))
+    }
+    
+    return [
+        {
+            "building_name": b.building_name,
+            "building_code": b.building_code,
+            "project_name": projects.get(b.project_id, "Unknown"),
+            "address": b.address,
+            "total_units": b.total_units or 0,
+            "signature_percentage": float(b.signature_percentage) if b.signature_percentage else 0.0,
+            "traffic_light_status": b.traffic_light_status,
+            "current_status": b.current_status,
+            "created_at": b.created_at.isoformat() if b.created_at else None
+        }
+        for b in buildings
+    ]
+
+
+def _iter_building_progress_rows(request: ReportRequest, db: Session, current_user: User) -> Iterator[dict]:
+    """Stream building progress rows"""
+    query = _building_progress_query(request, db, current_user)
+    for buildings in _chunked(query.yield_per(REPORT_CHUNK_SIZE), REPORT_CHUNK_SIZE):
+        yield from _building_progress_rows(buildings, db)
+
+
+def _agent_performance_rows(request: ReportRequest, db: Session) -> List[dict]:
+    """
+    Build one KPI row per agent with a single grouped query
+    
+    Interactions, buildings and owners/signatures are each pre-aggregated per
+    agent and left-joined onto the agent list. Owners and their FINALIZED
+    signatures are counted in one pass with conditional (FILTER) aggregates.
+    Long historical ranges are aggregated from the analytics snapshot instead.
+    """
+    if report_engine(request) == "snapshot":
+        try:
+            return analytics_engine.agent_performance_rows(db, request.start_date, request.end_date, request.agent_id)
+        except analytics_engine.SnapshotUnavailableError as e:
+            logger.warning(f"Analytics snapshot unavailable, using Postgres: {e}")
+    
+    # Interactions in the date range (interaction_date is a DATE column)
+    interaction_conditions = []
+    if request.start_date:
+        interaction_conditions.append(Interaction.interaction_date >= request.start_date)
+    if request.end_date:
+        interaction_conditions.append(Interaction.interaction_date <= request.end_date)
+    interactions_sq = db.query(
+        Interaction.agent_id.label("agent_id"),
+        func.count(Interaction.log_id).label("total_interactions")
+    ).filter(*interaction_conditions).group_by(Interaction.agent_id).subquery()
+    
+    # Signatures approved in the date range (approved_at is a timestamp, end date is inclusive)
+    signed_conditions = [DocumentSignature.signature_status == "FINALIZED"]
+    if request.start_date:
+        signed_conditions.append(DocumentSignature.approved_at >= request.start_date)
+    if request.end_date:
+        signed_conditions.append(DocumentSignature.approved_at < request.end_date + timedelta(days=1))
+    owners_sq = db.query(
+        Owner.assigned_agent_id.label("agent_id"),
+        func.count(distinct(Owner.owner_id)).filter(
+            Owner.is_deleted == False,
+            Owner.is_current_owner == True
+        ).label("assigned_owners"),
+        func.count(DocumentSignature.signature_id).filter(*signed_conditions).label("signed_documents")
+    ).outerjoin(
+        DocumentSignature, DocumentSignature.owner_id == Owner.owner_id
+    ).filter(
+        Owner.assigned_agent_id.isnot(None)
+    ).group_by(Owner.assigned_agent_id).subquery()
+    
+    buildings_sq = db.query(
+        Building.assigned_agent_id.label("agent_id"),
+        func.count(Building.building_id).label("assigned_buildings")
+    ).filter(
+        Building.is_deleted == False,
+        Building.assigned_agent_id.isnot(None)
+    ).group_by(Building.assigned_agent_id).subquery()
+    
+    query = db.query(
+        User.full_name,
+        User.email,
+        func.coalesce(interactions_sq.c.total_interactions, 0),
+        func.coalesce(owners_sq.c.signed_documents, 0),
+        func.coalesce(buildings_sq.c.assigned_buildings, 0),
+        func.coalesce(owners_sq.c.assigned_owners, 0),
+    ).outerjoin(
+        interactions_sq, interactions_sq.c.agent_id == User.user_id
+    ).outerjoin(
+        owners_sq, owners_sq.c.agent_id == User.user_id
+    ).outerjoin(
+        buildings_sq, buildings_sq.c.agent_id == User.user_id
+    ).filter(
+        User.role == "AGENT",
+        User.is_active == True
+    )
+    if request.agent_id:
+        query = query.filter(User.user_id == request.agent_id)
+    
+    return [
+        {
+            "agent_name": full_name or email,
+            "email": email,
+            "total_interactions": total_interactions,
+            "signed_documents": signed_documents,
+            "assigned_buildings": assigned_buildings,
+            "assigned_owners": assigned_owners,
+            "success_rate": (signed_documents / assigned_owners * 100) if assigned_owners > 0 else 0.0
+        }
+        for full_name, email, total_interactions, signed_documents, assigned_buildings, assigned_owners
+        in query.order_by(User.full_name).all()
+    ]
+
+
+def _iter_agent_performance_rows(request: ReportRequest, db: Session, current_user: User) -> Iterator[dict]:
+    """Agent performance rows (one per agent, so built in full)"""
+    return iter(_agent_performance_rows(request, db))
+
+
+def get_agent_performance_data(request: ReportRequest, db: Session, current_user: User) -> dict:
+    """Get agent performance data (shared by the PDF, Excel and JSON report variants)"""
+    agent_stats = _agent_performance_rows(request, db)
+    
+    return {
+        "agents": agent_stats,
+        "total_agents": len(agent_stats),
+        "engine": report_engine(request),
+        "period_start": request.start_date.isoformat() if request.start_date else None,
+        "period_end": request.end_date.isoformat() if request.end_date else None
+    }
+
+
+def _interaction_history_query(request: ReportRequest, db: Session, current_user: User):
+    """Build the filtered interaction history query"""
+    query = db.query(Interaction).join(Owner).filter(Owner.is_deleted == False)
+    
+    if request.start_date:
+        query = query.filter(Interaction.interaction_date >= request.start_date)
+    if request.end_date:
+        query = query.filter(Interaction.interaction_date <= request.end_date)
+    if request.agent_id:
+        query = query.filter(Interaction.agent_id == request.agent_id)
+    
+    # Role-based filtering
+    if current_user.role == "AGENT":
+        query = query.filter(Interaction.agent_id == current_user.user_id)
+    
+    return query.order_by(desc(Interaction.interaction_date))
+
+
+def _interaction_history_rows(interactions: List[Interaction], db: Session) -> List[dict]:
+    """Convert a chunk of interactions into report rows"""
+    owner_ids = {i.owner_id for i in interactions}
+    agent_ids = {i.agent_id for i in interactions if i.agent_id}
+    
+    owners = {
+        o.owner_id: o
+        for o in db.query(Owner.owner_id, Owner.full_name, Owner.phone_for_contact).filter(Owner.owner_id.in_(owner_ids))
+    }
+    agents = {
+        u.user_id: u.full_name
+        for u in db.query(User.user_id, User.full_name).filter(User.user_id.in_(agent_ids))
+    }
+    
+    return [
+        {
+            "interaction_date": i.interaction_date.isoformat() if i.interaction_date else None,
+            "interaction_type": i.interaction_type,
+            "owner_name": owners[i.owner_id].full_name if i.owner_id in owners else "Unknown",
+            "owner_phone": owners[i.owner_id].phone_for_contact if i.owner_id in owners else None,
+            "agent_name": agents.get(i.agent_id) or "Unknown",
+            "summary": i.call_summary,
+            "sentiment": i.sentiment,
+            "next_action": i.next_action
+        }
+        for i in interactions
+    ]
+
+
+def _iter_interaction_history_rows(request: ReportRequest, db: Session, current_user: User) -> Iterator[dict]:
+    """Stream interaction history rows (from the analytics snapshot for long historical ranges)"""
+    if report_engine(request) == "snapshot":
+        try:
+            yield from analytics_engine.iter_interaction_history_rows(
+                db,
+                request.start_date,
+                request.end_date,
+                request.agent_id,
+                current_user.user_id if current_user.role == "AGENT" else None
+            )
+            return
+        except analytics_engine.SnapshotUnavailableError as e:
+            logger.warning(f"Analytics snapshot unavailable, using Postgres: {e}")
+    
+    query = _interaction_history_query(request, db, current_user)
+    for interactions in _chunked(query.yield_per(REPORT_CHUNK_SIZE), REPORT_CHUNK_SIZE):
+        yield from _interaction_history_rows(interactions, db)
+
+
+def _compliance_audit_query(request: ReportRequest, db: Session, current_user: User):
+    """Build the filtered compliance audit query"""
+    query = db.query(DocumentSignature).join(Owner).filter(Owner.is_deleted == False)
+    
+    if request.start_date:
+        query = query.filter(DocumentSignature.created_at >= datetime.combine(request.start_date, datetime.min.time()))
+    if request.end_date:
+        query = query.filter(DocumentSignature.created_at <= datetime.combine(request.end_date, datetime.max.time()))
+    
+    return query.order_by(desc(DocumentSignature.created_at))
+
+
+def _compliance_audit_rows(signatures: List[DocumentSignature], db: Session) -> List[dict]:
+    """Convert a chunk of signatures into report rows"""
+    owner_ids = {s.owner_id for s in signatures}
+    approver_ids = {s.approved_by_user_id for s in signatures if s.approved_by_user_id}
+    
+    owners = {
+        o.owner_id: o.full_name
+        for o in db.query(Owner.owner_id, Owner.full_name).filter(Owner.owner_id.in_(owner_ids))
+    }
+    approvers = {
+        u.user_id: u.full_name
+        for u in db.query(User.user_id, User.full_name).filter(User.user_id.in_(approver_ids))
+    }
+    
+    return [
+        {
+            "signature_date": s.created_at.isoformat() if s.created_at else None,
+            "owner_name": owners.get(s.owner_id) or "Unknown",
+            "status": s.signature_status,
+            "approved_at": s.approved_at.isoformat() if s.approved_at else None,
+            "approver_name": approvers.get(s.approved_by_user_id) if s.approved_by_user_id else None,
+            "approval_reason": s.approval_reason
+        }
+        for s in signatures
+    ]
+
+
+def _iter_compliance_audit_rows(request: ReportRequest, db: Session, current_user: User) -> Iterator[dict]:
+    """Stream compliance audit rows"""
+    query = _compliance_audit_query(request, db, current_user)
+    for signatures in _chunked(query.yield_per(REPORT_CHUNK_SIZE), REPORT_CHUNK_SIZE):
+        yield from _compliance_audit_rows(signatures, db)
+
+
+# Excel row builders
+#
+# Write-only worksheets are append-only, so each report type is described by
+# its header row, a function turning one data row into cell values, and the
+# row source that streams the data.
+
+BUILDING_PROGRESS_HEADERS = ["Building Name", "Project", "Address", "Units", "Signature %", "Status"]
+AGENT_PERFORMANCE_HEADERS = ["Agent Name", "Email", "Interactions", "Signed Docs", "Buildings", "Owners", "Success Rate"]
+INTERACTION_HISTORY_HEADERS = ["Date", "Type", "Owner", "Agent", "Summary", "Sentiment"]
+COMPLIANCE_AUDIT_HEADERS = ["Date", "Owner", "Status", "Approved At", "Approver", "Reason"]
+
+
+def _building_progress_excel_row(building: dict) -> list:
+    """Excel cell values for a building progress row"""
+    return [
+        building['building_name'],
+        building['project_name'],
+        building['address'] or "",
+        building['total_units'],
+        f"{building['signature_percentage']:.1f}%",
+        building['traffic_light_status'],
+    ]
+
+
+def _agent_performance_excel_row(agent: dict) -> list:
+    """Excel cell values for an agent performance row"""
+    return [
+        agent['agent_name'],
+        agent['email'],
+        agent['total_interactions'],
+        agent['signed_documents'],
+        agent['assigned_buildings'],
+        agent['assigned_owners'],
+        f"{agent['success_rate']:.1f}%",
+    ]
+
+
+def _interaction_history_excel_row(interaction: dict) -> list:
+    """Excel cell values for an interaction history row"""
+    return [
+        interaction['interaction_date'][:10] if interaction['interaction_date'] else "",
+        interaction['interaction_type'],
+        interaction['owner_name'],
+        interaction['agent_name'],
+        interaction.get('summary', ''),
+        interaction.get('sentiment', ''),
+    ]
+
+
+def _compliance_audit_excel_row(signature: dict) -> list:
+    """Excel cell values for a compliance audit row"""
+    return [
+        signature['signature_date'][:10] if signature['signature_date'] else "",
+        signature['owner_name'],
+        signature['status'],
+        signature['approved_at'][:10] if signature['approved_at'] else "",
+        signature['approver_name'] or "",
+        signature.get('approval_reason', ''),
+    ]
+
+
+_EXCEL_LAYOUTS = {
+    ReportType.BUILDING_PROGRESS: (BUILDING_PROGRESS_HEADERS, _building_progress_excel_row, _iter_building_progress_rows),
+    ReportType.AGENT_PERFORMANCE: (AGENT_PERFORMANCE_HEADERS, _agent_performance_excel_row, _iter_agent_performance_rows),
+    ReportType.INTERACTION_HISTORY: (INTERACTION_HISTORY_HEADERS, _interaction_history_excel_row, _iter_interaction_history_rows),
+    ReportType.COMPLIANCE_AUDIT: (COMPLIANCE_AUDIT_HEADERS, _compliance_audit_excel_row, _iter_compliance_audit_rows),
+}
+
+
+
+# Query builders of the report types that produce one row per database row
+_ROW_QUERIES = {
+    ReportType.BUILDING_PROGRESS: _building_progress_query,
+    ReportType.INTERACTION_HISTORY: _interaction_history_query,
+    ReportType.COMPLIANCE_AUDIT: _compliance_audit_query,
+}
+
+
+def estimate_report_rows(request: ReportRequest, db: Session, current_user: User) -> Optional[int]:
+    """
+    Estimate how many rows a report will produce (used for job progress)
+    
+    Streamed report types use the planner's row estimate (EXPLAIN), which costs
+    one planning round trip however long the range is; agent performance has
+    one row per active agent.
+    """
+    if request.report_type == ReportType.AGENT_PERFORMANCE:
+        if request.agent_id:
+            return 1
+        return db.query(func.count(User.user_id)).filter(User.role == "AGENT", User.is_active == True).scalar()
+    
+    query = _ROW_QUERIES[request.report_type](request, db, current_user).order_by(None)
+    compiled = query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
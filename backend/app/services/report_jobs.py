@@ -0,0 +1,363 @@
+"""
+Report Job Service
+Renders reports in a background worker pool into STORAGE_PATH/reports and
+tracks progress, timings and retention in the report_jobs table.
+
+Every process resubmits QUEUED jobs on startup, so a worker claims a job with
+a single conditional UPDATE (QUEUED -> RUNNING) and only one process renders
+it. While rendering, the worker refreshes heartbeat_at; a RUNNING job whose
+heartbeat is older than REPORT_JOB_STALE_SECONDS belongs to a dead process.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, update, or_, and_
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+from uuid import UUID
+import threading
+import time
+import os
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal, ReportSessionLocal
+from app.models.report_job import ReportJob
+from app.models.user import User
+from app.services.report_generation import (
+    ReportRequest,
+    REPORT_FILE_TYPES,
+    estimate_report_rows,
+    render_report,
+    report_filename,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_JOB_STATUSES = ["QUEUED", "RUNNING"]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class ReportJobLimitError(Exception):
+    """Raised when a user already has the maximum number of active report jobs"""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Lazily create the shared report worker pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.REPORT_JOB_WORKERS,
+                thread_name_prefix="report-job",
+            )
+        return _executor
+
+
+def shutdown_report_workers() -> None:
+    """Stop accepting report jobs (running jobs are left to finish)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def report_storage_dir() -> Path:
+    """Directory where finished report artifacts are kept"""
+    path = Path(settings.STORAGE_PATH) / "reports"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def submit_report_job(request: ReportRequest, current_user: User, db: Session) -> ReportJob:
+    """
+    Queue a report for background rendering.
+    
+    Raises ReportJobLimitError if the user already has
+    REPORT_JOB_MAX_ACTIVE_PER_USER queued or running jobs.
+    """
+    active_jobs = db.query(func.count(ReportJob.job_id)).filter(
+        ReportJob.requested_by_user_id == current_user.user_id,
+        ReportJob.status.in_(ACTIVE_JOB_STATUSES)
+    ).scalar()
+    
+    if active_jobs >= settings.REPORT_JOB_MAX_ACTIVE_PER_USER:
+        raise ReportJobLimitError(
+            f"You already have {active_jobs} report jobs in progress "
+            f"(limit {settings.REPORT_JOB_MAX_ACTIVE_PER_USER})"
+        )
+    
+    job = ReportJob(
+        requested_by_user_id=current_user.user_id,
+        report_type=request.report_type.value,
+        report_format=request.format.value,
+        parameters=request.model_dump(mode="json"),
+        status="QUEUED",
+        progress_percent=0,
+        rows_processed=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    _get_executor().submit(run_report_job, job.job_id)
+    
+    logger.info(
+        "Report job queued",
+        extra={
+            "job_id": str(job.job_id),
+            "report_type": job.report_type,
+            "format": job.report_format,
+            "user_id": str(current_user.user_id),
+        }
+    )
+    
+    return job
+
+
+def _update_job(db: Session, job_id: UUID, **values) -> None:
+    """Write job bookkeeping fields and commit immediately"""
+    db.query(ReportJob).filter(ReportJob.job_id == job_id).update(values, synchronize_session=False)
+    db.commit()
+
+
+def _claim_job(db: Session, job_id: UUID, now: datetime):
+    """Move a QUEUED job to RUNNING and return it, or None if another worker has it"""
+    job = db.execute(
+        update(ReportJob).where(
+            ReportJob.job_id == job_id,
+            ReportJob.status == "QUEUED"
+        ).values(
+            status="RUNNING",
+            started_at=now,
+            heartbeat_at=now,
+            progress_percent=0,
+        ).returning(
+            ReportJob.created_at,
+            ReportJob.requested_by_user_id,
+            ReportJob.parameters,
+        ).execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    return job
+
+
+def _heartbeat(job_id: UUID, stop: threading.Event) -> None:
+    """Refresh the job's heartbeat until stopped (runs beside the render)"""
+    db = SessionLocal()
+    try:
+        while not stop.wait(settings.REPORT_JOB_HEARTBEAT_SECONDS):
+            try:
+                _update_job(db, job_id, heartbeat_at=datetime.utcnow())
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Report job {job_id} heartbeat failed: {e}")
+    finally:
+        db.close()
+
+
+def run_report_job(job_id: UUID) -> None:
+    """
+    Render one queued report job (runs in a worker thread).
+    
+    Job bookkeeping and report data use separate sessions, so progress commits
+    never close the server-side cursor the renderer is reading from.
+    """
+    started_at = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        job = _claim_job(db, job_id, started_at)
+    except Exception:
+        db.close()
+        raise
+    if job is None:
+        db.close()
+        return
+    
+    data_db = ReportSessionLocal()
+    part_path = None
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop_heartbeat), daemon=True).start()
+    try:
+        user = data_db.query(User).filter(User.user_id == job.requested_by_user_id).first()
+        if not user:
+            raise ValueError("Requesting user no longer exists")
+        
+        request = ReportRequest(**job.parameters)
+        extension, _ = REPORT_FILE_TYPES[request.format]
+        final_path = report_storage_dir() / f"{job_id}.{extension}"
+        part_path = final_path.with_name(final_path.name + ".part")
+        
+        try:
+            rows_estimated = estimate_report_rows(request, data_db, user)
+        except Exception as e:
+            logger.warning(f"Could not estimate rows for report job {job_id}: {e}")
+            data_db.rollback()
+            rows_estimated = None
+        _update_job(
+            db, job_id,
+            queue_wait_ms=int((started_at - job.created_at).total_seconds() * 1000),
+            rows_estimated=rows_estimated,
+        )
+        
+        def on_progress(rows: int) -> None:
+            values = {"rows_processed": rows}
+            if rows_estimated:
+                # The estimate can be low; 100 is reserved for the finished file
+                values["progress_percent"] = min(99, rows * 100 // rows_estimated)
+            _update_job(db, job_id, **values)
+        
+        render_start = time.monotonic()
+        row_count = render_report(request, data_db, user, str(part_path), on_progress)
+        render_ms = int((time.monotonic() - render_start) * 1000)
+        os.replace(part_path, final_path)
+        part_path = None
+        
+        finished_at = datetime.utcnow()
+        _update_job(
+            db, job_id,
+            status="COMPLETED",
+            progress_percent=100,
+            rows_processed=row_count,
+            file_path=str(final_path),
+            file_name=report_filename(request, started_at),
+            file_size_bytes=final_path.stat().st_size,
+            finished_at=finished_at,
+            render_ms=render_ms,
+            expires_at=finished_at + timedelta(hours=settings.REPORT_JOB_RETENTION_HOURS),
+        )
+        
+        logger.info(
+            "Report job completed",
+            extra={
+                "job_id": str(job_id),
+                "rows": row_count,
+                "render_ms": render_ms,
+                "file_size_bytes": final_path.stat().st_size,
+            }
+        )
+    except Exception as e:
+        logger.error(f"Report job {job_id} failed: {e}", exc_info=True)
+        db.rollback()
+        finished_at = datetime.utcnow()
+        _update_job(
+            db, job_id,
+            status="FAILED",
+            error_message=str(e)[:1000],
+            finished_at=finished_at,
+            expires_at=finished_at + timedelta(hours=settings.REPORT_JOB_RETENTION_HOURS),
+        )
+    finally:
+        stop_heartbeat.set()
+        if part_path is not None and part_path.exists():
+            part_path.unlink()
+        data_db.close()
+        try:
+            cleanup_expired_report_jobs(db)
+        except Exception as e:
+            logger.error(f"Report job retention cleanup failed: {e}")
+        db.close()
+
+
+def cleanup_expired_report_jobs(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Delete artifacts of finished jobs past their retention window.
+    
+    Returns the number of jobs expired.
+    """
+    now = now or datetime.utcnow()
+    jobs = db.query(ReportJob).filter(
+        ReportJob.status.in_(["COMPLETED", "FAILED"]),
+        ReportJob.expires_at <= now
+    ).all()
+    
+    for job in jobs:
+        if job.file_path:
+            try:
+                os.unlink(job.file_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove report artifact {job.file_path}: {e}")
+                continue
+        job.status = "EXPIRED"
+        job.file_path = None
+    
+    db.commit()
+    
+    if jobs:
+        logger.info(f"Expired {len(jobs)} report jobs")
+    return len(jobs)
+
+
+def recover_interrupted_report_jobs(db: Session) -> dict:
+    """
+    Reconcile jobs left behind by a restart: RUNNING jobs whose heartbeat has
+    gone stale are failed and QUEUED jobs are handed to the worker pool again.
+    
+    Other live processes keep their RUNNING jobs' heartbeats fresh, and a
+    QUEUED job submitted by several processes is rendered by the one that
+    claims it first.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.REPORT_JOB_STALE_SECONDS)
+    interrupted = db.query(ReportJob).filter(
+        ReportJob.status == "RUNNING",
+        or_(
+            ReportJob.heartbeat_at < stale_before,
+            and_(ReportJob.heartbeat_at.is_(None), ReportJob.started_at < stale_before)
+        )
+    ).update(
+        {
+            "status": "FAILED",
+            "error_message": "Interrupted by server restart",
+            "finished_at": datetime.utcnow(),
+            "expires_at": datetime.utcnow() + timedelta(hours=settings.REPORT_JOB_RETENTION_HOURS),
+        },
+        synchronize_session=False
+    )
+    db.commit()
+    
+    queued_ids = [row.job_id for row in db.query(ReportJob.job_id).filter(ReportJob.status == "QUEUED")]
+    for job_id in queued_ids:
+        _get_executor().submit(run_report_job, job_id)
+    
+    return {"interrupted": interrupted, "requeued": len(queued_ids)}
+
+
+def get_report_job_metrics(db: Session, hours: int = 24) -> dict:
+    """Job counts and timing aggregates for jobs created in the last `hours` hours"""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    
+    by_status = dict(
+        db.query(ReportJob.status, func.count(ReportJob.job_id))
+        .filter(ReportJob.created_at >= since)
+        .group_by(ReportJob.status)
+        .all()
+    )
+    
+    timings = db.query(
+        func.avg(ReportJob.queue_wait_ms),
+        func.max(ReportJob.queue_wait_ms),
+        func.avg(ReportJob.render_ms),
+        func.max(ReportJob.render_ms),
+        func.sum(ReportJob.rows_processed),
+        func.sum(case((ReportJob.status == "COMPLETED", ReportJob.file_size_bytes), else_=0)),
+    ).filter(
+        ReportJob.created_at >= since,
+        ReportJob.finished_at.isnot(None)
+    ).one()
+    
+    return {
+        "window_hours": hours,
+        "workers": settings.REPORT_JOB_WORKERS,
+        "jobs_by_status": by_status,
+        "avg_queue_wait_ms": float(timings[0]) if timings[0] is not None else None,
+        "max_queue_wait_ms": timings[1],
+        "avg_render_ms": float(timings[2]) if timings[2] is not None else None,
+        "max_render_ms": timings[3],
+        "rows_rendered": int(timings[4] or 0),
+        "bytes_stored": int(timings[5] or 0),
+    }
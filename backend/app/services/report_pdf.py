@@ -0,0 +1,377 @@
+"""
+Report PDF Rendering Service
+Renders report PDFs with ReportLab in a bounded process pool.
+
+Rows are spooled to a file which the worker reads back while laying out the
+document page by page, writing the PDF straight to its destination path. The
+CPU-bound layout work runs on all cores instead of competing for the API
+process's GIL, and memory stays bounded for any number of rows. Each worker
+imports ReportLab and builds its paragraph and table styles once, in the pool
+initializer.
+This module deliberately imports nothing from the database layer so that
+spawned workers stay light.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Optional, Iterable, Iterator
+import multiprocessing
+import os
+import pickle
+import threading
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Rows per table flowable; each table repeats its header row on every page it spans
+PDF_TABLE_CHUNK_ROWS = 40
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pending_slots: Optional[threading.BoundedSemaphore] = None
+
+# Per-process cache of ReportLab styles (built once per worker)
+_styles: Optional[dict] = None
+
+
+def _get_styles() -> dict:
+    """Paragraph and table styles shared by every report, built on first use"""
+    global _styles
+    if _styles is not None:
+        return _styles
+    
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.platypus import TableStyle
+    except ImportError:
+        logger.error("reportlab not installed. Install with: pip install reportlab")
+        raise RuntimeError("PDF generation not available. Please install reportlab.")
+    
+    sample = getSampleStyleSheet()
+    
+    def table_style(header_size: int, body_size: int) -> TableStyle:
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0D9488')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), header_size),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), body_size),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+        ])
+    
+    _styles = {
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=sample['Heading1'],
+            fontSize=18,
+            textColor=colors.HexColor('#0D9488'),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        ),
+        "metadata": ParagraphStyle('Metadata', parent=sample['Normal'], fontSize=10, textColor=colors.grey),
+        "summary": ParagraphStyle('Summary', parent=sample['Normal'], fontSize=11, spaceAfter=12),
+        "table_large": table_style(10, 9),
+        "table_medium": table_style(9, 8),
+        "table_small": table_style(8, 7),
+    }
+    return _styles
+
+
+def _init_pdf_worker() -> None:
+    """Process pool initializer: pay the ReportLab import and style setup once per worker"""
+    _get_styles()
+
+
+def write_rows_file(rows: Iterable[dict], path: str) -> int:
+    """Spool report rows to a file the PDF workers can read back; returns the row count"""
+    row_count = 0
+    with open(path, "wb") as f:
+        for row in rows:
+            pickle.dump(row, f, protocol=pickle.HIGHEST_PROTOCOL)
+            row_count += 1
+    return row_count
+
+
+def iter_rows_file(path: str) -> Iterator[dict]:
+    """Read back rows written by write_rows_file, one at a time"""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+class _StreamingStory(list):
+    """
+    Story list that pulls flowables from an iterator as the document consumes them
+    
+    SimpleDocTemplate.build() works through a list, deleting flowables from the
+    front as they are laid out. Topping the list up on every length check and
+    deletion keeps only a few flowables (and their rows) in memory at a time.
+    """
+    def __init__(self, flowables: Iterable, buffered: int = 4):
+        super().__init__()
+        self._pending = iter(flowables)
+        self._buffered = buffered
+    
+    def _refill(self) -> None:
+        while self._pending is not None and super().__len__() < self._buffered:
+            try:
+                self.append(next(self._pending))
+            except StopIteration:
+                self._pending = None
+    
+    def __len__(self) -> int:
+        self._refill()
+        return super().__len__()
+    
+    def __getitem__(self, index):
+        self._refill()
+        return super().__getitem__(index)
+    
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._refill()
+    
+    def pop(self, index: int = -1):
+        item = super().pop(index)
+        self._refill()
+        return item
+
+
+def render_pdf_file(report_type: str, header: dict, summary: dict, rows_path: str, output_path: str) -> int:
+    """
+    Render a report PDF from spooled rows into output_path, returning its size
+    
+    header holds the title, generated_at, generated_by and optional date_range
+    lines; summary holds the report totals. Rows are read from rows_path and
+    laid out in tables of PDF_TABLE_CHUNK_ROWS (header row repeated on every
+    page), so memory stays bounded however many rows the report has.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    
+    builder = _PDF_BUILDERS.get(report_type)
+    if builder is None:
+        raise ValueError(f"Unsupported report type: {report_type}")
+    
+    styles = _get_styles()
+    doc = SimpleDocTemplate(output_path, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    
+    def story():
+        yield Paragraph(header["title"], styles["title"])
+        yield Spacer(1, 0.2*inch)
+        yield Paragraph(f"Generated: {header['generated_at']}", styles["metadata"])
+        yield Paragraph(f"Generated by: {header['generated_by']}", styles["metadata"])
+        if header.get("date_range"):
+            yield Paragraph(f"Date Range: {header['date_range']}", styles["metadata"])
+        yield Spacer(1, 0.3*inch)
+        yield from builder(summary, iter_rows_file(rows_path), styles)
+    
+    doc.build(_StreamingStory(story()))
+    return os.path.getsize(output_path)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Lazily create the PDF worker pool (spawned, so workers inherit no DB connections)"""
+    global _pool, _pending_slots
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.REPORT_PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_pdf_worker,
+            )
+            _pending_slots = threading.BoundedSemaphore(
+                settings.REPORT_PDF_WORKERS + settings.REPORT_PDF_MAX_QUEUED
+            )
+        return _pool
+
+
+def shutdown_pdf_workers() -> None:
+    """Stop the PDF worker pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def render_pdf(report_type: str, header: dict, summary: dict, rows_path: str, output_path: str) -> int:
+    """
+    Render a report PDF in the worker pool, blocking the calling thread until done
+    
+    At most REPORT_PDF_WORKERS + REPORT_PDF_MAX_QUEUED renders are in flight;
+    further callers wait here. Only file paths cross the process boundary, the
+    rows themselves are read by the worker from rows_path.
+    With REPORT_PDF_WORKERS = 0 rendering happens in the calling thread.
+    """
+    global _pool
+    if settings.REPORT_PDF_WORKERS <= 0:
+        return render_pdf_file(report_type, header, summary, rows_path, output_path)
+    
+    pool = _get_pool()
+    with _pending_slots:
+        try:
+            return pool.submit(render_pdf_file, report_type, header, summary, rows_path, output_path).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM killed); drop the pool so the next call starts fresh
+            logger.error("PDF worker pool broke, restarting it")
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+                    # Stops its management thread and releases its pipes
+                    pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+# PDF building functions
+#
+# Each builder takes the report summary and an iterator of row dicts and
+# yields flowables: summary paragraphs, then one table per chunk of rows.
+
+def _chunked(rows: Iterable[dict], size: int) -> Iterator[list]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _truncate(text: Optional[str], length: int) -> str:
+    if not text:
+        return ""
+    return text[:length] + "..." if len(text) > length else text
+
+
+def _build_building_progress_pdf(summary: dict, rows: Iterable[dict], styles: dict) -> Iterator:
+    """Build PDF content for building progress report"""
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table, Paragraph, Spacer
+    
+    # Summary
+    yield Paragraph(f"Total Buildings: {summary['total_buildings']}", styles["summary"])
+    yield Paragraph(f"Average Signature Percentage: {summary['avg_signature_percentage']:.2f}%", styles["summary"])
+    yield Spacer(1, 0.2*inch)
+    
+    for chunk in _chunked(rows, PDF_TABLE_CHUNK_ROWS):
+        data = [["Building Name", "Project", "Address", "Units", "Signature %", "Status"]]
+        for building in chunk:
+            status_color = {
+                "GREEN": "✓",
+                "YELLOW": "⚠",
+                "RED": "✗"
+            }.get(building['traffic_light_status'], "")
+            
+            data.append([
+                building['building_name'],
+                building['project_name'],
+                building['address'] or "",
+                str(building['total_units']),
+                f"{building['signature_percentage']:.1f}%",
+                f"{status_color} {building['traffic_light_status']}"
+            ])
+        
+        table = Table(data, colWidths=[1.5*inch, 1.2*inch, 1.8*inch, 0.6*inch, 0.8*inch, 1*inch], repeatRows=1)
+        table.setStyle(styles["table_large"])
+        yield table
+
+
+def _build_agent_performance_pdf(summary: dict, rows: Iterable[dict], styles: dict) -> Iterator:
+    """Build PDF content for agent performance report"""
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table, Paragraph, Spacer
+    
+    # Summary
+    yield Paragraph(f"Total Agents: {summary['total_agents']}", styles["summary"])
+    if summary.get('period_start'):
+        yield Paragraph(f"Period: {summary['period_start']} to {summary.get('period_end') or 'Present'}", styles["summary"])
+    yield Spacer(1, 0.2*inch)
+    
+    for chunk in _chunked(rows, PDF_TABLE_CHUNK_ROWS):
+        data = [["Agent Name", "Email", "Interactions", "Signed Docs", "Buildings", "Owners", "Success Rate"]]
+        for agent in chunk:
+            data.append([
+                agent['agent_name'],
+                agent['email'],
+                str(agent['total_interactions']),
+                str(agent['signed_documents']),
+                str(agent['assigned_buildings']),
+                str(agent['assigned_owners']),
+                f"{agent['success_rate']:.1f}%"
+            ])
+        
+        table = Table(data, colWidths=[1.5*inch, 1.5*inch, 0.8*inch, 0.8*inch, 0.7*inch, 0.7*inch, 0.8*inch], repeatRows=1)
+        table.setStyle(styles["table_medium"])
+        yield table
+
+
+def _build_interaction_history_pdf(summary: dict, rows: Iterable[dict], styles: dict) -> Iterator:
+    """Build PDF content for interaction history report"""
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table, Paragraph, Spacer
+    
+    # Summary
+    yield Paragraph(f"Total Interactions: {summary['total_interactions']}", styles["summary"])
+    yield Spacer(1, 0.2*inch)
+    
+    for chunk in _chunked(rows, PDF_TABLE_CHUNK_ROWS):
+        data = [["Date", "Type", "Owner", "Agent", "Summary", "Sentiment"]]
+        for interaction in chunk:
+            data.append([
+                interaction['interaction_date'][:10] if interaction['interaction_date'] else "",
+                interaction['interaction_type'],
+                interaction['owner_name'],
+                interaction['agent_name'],
+                _truncate(interaction.get('summary'), 50),
+                interaction.get('sentiment') or ''
+            ])
+        
+        table = Table(data, colWidths=[0.8*inch, 0.8*inch, 1.2*inch, 1*inch, 2*inch, 0.8*inch], repeatRows=1)
+        table.setStyle(styles["table_small"])
+        yield table
+
+
+def _build_compliance_audit_pdf(summary: dict, rows: Iterable[dict], styles: dict) -> Iterator:
+    """Build PDF content for compliance audit report"""
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table, Paragraph, Spacer
+    
+    # Summary
+    yield Paragraph(f"Total Signatures: {summary['total_signatures']}", styles["summary"])
+    yield Spacer(1, 0.2*inch)
+    
+    for chunk in _chunked(rows, PDF_TABLE_CHUNK_ROWS):
+        data = [["Date", "Owner", "Status", "Approved At", "Approver", "Reason"]]
+        for signature in chunk:
+            data.append([
+                signature['signature_date'][:10] if signature['signature_date'] else "",
+                signature['owner_name'],
+                signature['status'],
+                signature['approved_at'][:10] if signature['approved_at'] else "",
+                signature['approver_name'] or "",
+                _truncate(signature.get('approval_reason'), 40)
+            ])
+        
+        table = Table(data, colWidths=[0.8*inch, 1.2*inch, 0.8*inch, 0.8*inch, 1*inch, 1.5*inch], repeatRows=1)
+        table.setStyle(styles["table_small"])
+        yield table
+
+
+_PDF_BUILDERS = {
+    "building_progress": _build_building_progress_pdf,
+    "agent_performance": _build_agent_performance_pdf,
+    "interaction_history": _build_interaction_history_pdf,
+    "compliance_audit": _build_compliance_audit_pdf,
+}
@@ -0,0 +1,275 @@
+"""
+Report Subscription Service
+Renders recurring reports ahead of time, during an off-peak window, into
+STORAGE_PATH/reports/subscriptions and announces them with in-app alerts.
+Runs hourly as the reports.run_subscriptions job (see services/scheduler.py).
+
+Due subscriptions that ask for the same data (report type, filters, date range
+and visibility scope) are rendered from one shared fetch: the rows are spooled
+to a file once and every subscription in the group renders its own format
+from that file.
+"""
+from sqlalchemy.orm import Session
+from datetime import datetime, date, time, timedelta
+from typing import Optional, List, Dict, Tuple
+import json
+import os
+import tempfile
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal, ReportSessionLocal
+from app.models.report_subscription import ReportSubscription
+from app.models.alert import Alert
+from app.models.user import User
+from app.services.report_generation import (
+    ReportRequest,
+    ReportFormat,
+    REPORT_FILE_TYPES,
+    render_report,
+    report_filename,
+    write_report_rows_file,
+)
+from app.services.report_jobs import report_storage_dir
+from app.services.alert_inbox import add_unread
+
+logger = logging.getLogger(__name__)
+
+# Longest gap between two runs (MONTHLY), bounding the search for the next run day
+MAX_CADENCE_DAYS = 31
+
+
+def next_run_time(cadence: str, after: datetime) -> datetime:
+    """
+    First off-peak start after `after` on a day matching the cadence
+    
+    DAILY runs every day, WEEKLY on Mondays and MONTHLY on the 1st, each at
+    REPORT_SUBSCRIPTION_OFF_PEAK_START_HOUR (UTC), so reports are ready before
+    the working day starts.
+    """
+    run_time = time(hour=settings.REPORT_SUBSCRIPTION_OFF_PEAK_START_HOUR)
+    day = after.date()
+    for _ in range(MAX_CADENCE_DAYS + 1):
+        run_at = datetime.combine(day, run_time)
+        if run_at > after and (
+            cadence == "DAILY"
+            or (cadence == "WEEKLY" and day.weekday() == 0)
+            or (cadence == "MONTHLY" and day.day == 1)
+        ):
+            return run_at
+        day += timedelta(days=1)
+    raise ValueError(f"Unsupported cadence: {cadence}")
+
+
+def in_off_peak_window(now: Optional[datetime] = None) -> bool:
+    """Whether `now` (UTC) falls in the off-peak rendering window"""
+    hour = (now or datetime.utcnow()).hour
+    start = settings.REPORT_SUBSCRIPTION_OFF_PEAK_START_HOUR
+    end = settings.REPORT_SUBSCRIPTION_OFF_PEAK_END_HOUR
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end  # Window spans midnight
+
+
+def subscription_request(subscription: ReportSubscription, run_date: date) -> ReportRequest:
+    """The report request of one run: the saved filters plus a date range ending the day before"""
+    start_date = end_date = None
+    if subscription.lookback_days:
+        end_date = run_date - timedelta(days=1)
+        start_date = end_date - timedelta(days=subscription.lookback_days - 1)
+    
+    return ReportRequest(
+        **(subscription.parameters or {}),
+        report_type=subscription.report_type,
+        format=subscription.report_format,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+
+def subscription_file_path(subscription: ReportSubscription) -> str:
+    """Where the latest rendered report of a subscription is kept"""
+    directory = report_storage_dir() / "subscriptions"
+    directory.mkdir(parents=True, exist_ok=True)
+    extension, _ = REPORT_FILE_TYPES[ReportFormat(subscription.report_format)]
+    return str(directory / f"{subscription.subscription_id}.{extension}")
+
+
+def claim_due_subscriptions(db: Session, now: datetime) -> List[ReportSubscription]:
+    """
+    Lock and claim every subscription due at `now`
+    
+    Claimed subscriptions are moved to their next run time in the same
+    transaction, and rows locked by another process are skipped, so several
+    app instances never render the same subscription twice.
+    """
+    subscriptions = db.query(ReportSubscription).filter(
+        ReportSubscription.is_active == True,
+        ReportSubscription.next_run_at <= now
+    ).with_for_update(skip_locked=True).all()
+    
+    for subscription in subscriptions:
+        subscription.next_run_at = next_run_time(subscription.cadence, now)
+        subscription.last_status = "RUNNING"
+    db.commit()
+    return subscriptions
+
+
+def _data_key(request: ReportRequest, user: User) -> str:
+    """Subscriptions with equal keys read exactly the same rows"""
+    return json.dumps({
+        "report_type": request.report_type.value,
+        "project_id": request.project_id,
+        "building_id": request.building_id,
+        "agent_id": request.agent_id,
+        "start_date": request.start_date.isoformat() if request.start_date else None,
+        "end_date": request.end_date.isoformat() if request.end_date else None,
+        # Agents only see their own data; other roles see everything
+        "scope": str(user.user_id) if user.role == "AGENT" else None,
+    }, sort_keys=True)
+
+
+def run_due_subscriptions(now: Optional[datetime] = None, force: bool = False) -> dict:
+    """
+    Render and deliver every due subscription
+    
+    Outside the off-peak window nothing is done unless force=True.
+    Returns counts of subscriptions run, shared data fetches, completions and failures.
+    """
+    now = now or datetime.utcnow()
+    if not force and not in_off_peak_window(now):
+        return {"subscriptions": 0, "data_fetches": 0, "completed": 0, "failed": 0}
+    
+    db = SessionLocal()
+    data_db = ReportSessionLocal()
+    summary = {"subscriptions": 0, "data_fetches": 0, "completed": 0, "failed": 0}
+    try:
+        subscriptions = claim_due_subscriptions(db, now)
+        if not subscriptions:
+            return summary
+        summary["subscriptions"] = len(subscriptions)
+    
+        users = {
+            user.user_id: user
+            for user in db.query(User).filter(
+                User.user_id.in_({s.created_by_user_id for s in subscriptions})
+            )
+        }
+    
+        groups: Dict[str, List[Tuple[ReportSubscription, User, ReportRequest]]] = {}
+        for subscription in subscriptions:
+            user = users.get(subscription.created_by_user_id)
+            if not user or not user.is_active:
+                _record_failure(db, subscription, "Subscription owner is no longer active")
+                summary["failed"] += 1
+                continue
+            request = subscription_request(subscription, now.date())
+            groups.setdefault(_data_key(request, user), []).append((subscription, user, request))
+    
+        for members in groups.values():
+            summary["data_fetches"] += 1
+            completed, failed = _run_group(db, data_db, members, now)
+            summary["completed"] += completed
+            summary["failed"] += failed
+    
+        logger.info("Report subscriptions run", extra=summary)
+        return summary
+    finally:
+        data_db.close()
+        db.close()
+
+
+def _run_group(
+    db: Session,
+    data_db: Session,
+    members: List[Tuple[ReportSubscription, User, ReportRequest]],
+    now: datetime
+) -> Tuple[int, int]:
+    """Fetch the rows shared by a group once, then render and deliver each member"""
+    _, first_user, first_request = members[0]
+    fd, rows_path = tempfile.mkstemp(suffix=".rows")
+    os.close(fd)
+    completed = failed = 0
+    try:
+        try:
+            write_report_rows_file(first_request, data_db, first_user, rows_path)
+        except Exception as e:
+            logger.error(f"Report subscription data fetch failed: {e}", exc_info=True)
+            data_db.rollback()
+            for subscription, _, _ in members:
+                _record_failure(db, subscription, str(e))
+            return 0, len(members)
+    
+        for subscription, user, request in members:
+            final_path = subscription_file_path(subscription)
+            part_path = final_path + ".part"
+            try:
+                row_count = render_report(request, data_db, user, part_path, rows_file=rows_path)
+                os.replace(part_path, final_path)
+    
+                subscription.last_run_at = now
+                subscription.last_status = "COMPLETED"
+                subscription.last_error = None
+                subscription.file_path = final_path
+                subscription.file_name = report_filename(request, now)
+                subscription.file_size_bytes = os.path.getsize(final_path)
+                subscription.rows_rendered = row_count
+                _deliver(db, subscription, request)
+                db.commit()
+                completed += 1
+            except Exception as e:
+                logger.error(f"Report subscription {subscription.subscription_id} failed: {e}", exc_info=True)
+                db.rollback()
+                if os.path.exists(part_path):
+                    os.unlink(part_path)
+                _record_failure(db, subscription, str(e))
+                failed += 1
+    finally:
+        os.unlink(rows_path)
+    
+    return completed, failed
+
+
+def _deliver(db: Session, subscription: ReportSubscription, request: ReportRequest) -> None:
+    """Announce a rendered report to every recipient with an in-app alert"""
+    recipients = subscription.recipient_user_ids or [subscription.created_by_user_id]
+    date_range = f" ({request.start_date} to {request.end_date})" if request.start_date else ""
+    alerts = []
+    for recipient_id in recipients:
+        alerts.append(Alert(
+            alert_type="REPORT_READY",
+            severity="LOW",
+            title=f"Report ready: {subscription.name}",
+            message=f"Your {subscription.cadence.lower()} {request.report_type.value.replace('_', ' ')} report{date_range} is ready to download.",
+            agent_id=recipient_id,
+            project_id=request.project_id,
+            building_id=request.building_id,
+            alert_metadata={
+                "subscription_id": str(subscription.subscription_id),
+                "download_url": f"/api/v1/reports/subscriptions/{subscription.subscription_id}/download",
+                "file_name": subscription.file_name,
+                "rows": subscription.rows_rendered,
+            },
+            delivery_channels=["IN_APP"],
+            delivered_at=datetime.utcnow(),
+            status="ACTIVE"
+        ))
+    db.add_all(alerts)
+    db.flush()
+    add_unread(db, [alert.alert_id for alert in alerts])
+
+
+def _record_failure(db: Session, subscription: ReportSubscription, error: str) -> None:
+    subscription.last_run_at = datetime.utcnow()
+    subscription.last_status = "FAILED"
+    subscription.last_error = error[:1000]
+    db.commit()
+
+
+def can_access_subscription(subscription: ReportSubscription, user: User) -> bool:
+    """Creators, recipients and super admins can see a subscription and its reports"""
+    return (
+        user.role == "SUPER_ADMIN"
+        or subscription.created_by_user_id == user.user_id
+        or user.user_id in (subscription.recipient_user_ids or [])
+    )
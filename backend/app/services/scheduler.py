@@ -0,0 +1,239 @@
+"""
+Periodic Scheduler
+Queues recurring background jobs (alert checks, maintenance, rollups) on
+cron-like schedules. It runs inside the job workers, and only one of them, the
+holder of a Postgres advisory lock, acts as the leader at any time; the others
+keep trying to take over in case the leader goes away.
+
+The scheduler only enqueues jobs (see job_queue); workers run them. Each
+schedule enqueues with a dedupe key, so a run that is still waiting in the queue
+is not queued a second time. Schedule times are in UTC.
+"""
+from sqlalchemy import func, select
+from datetime import datetime, timedelta
+from typing import Optional, List, Set
+import threading
+import logging
+
+from app.core.config import settings
+from app.core.database import engine, SessionLocal
+from app.services.job_queue import enqueue_job
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_NAME = "tama38:scheduler"
+
+
+class CronExpression:
+    """
+    Standard 5-field cron expression: minute hour day-of-month month day-of-week
+    
+    Fields accept *, numbers, ranges (1-5), lists (1,15) and steps (*/15, 0-30/10).
+    Day-of-week is 0-6 with 0 = Sunday. As in cron, when both day fields are
+    restricted a day matches if either does.
+    """
+    
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+    
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse_field(part, low, high)
+            for part, (low, high) in zip(parts, self.FIELD_RANGES)
+        ]
+        self.days_restricted = parts[2] != "*"
+        self.weekdays_restricted = parts[4] != "*"
+    
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for item in field.split(","):
+            step = 1
+            if "/" in item:
+                item, step_text = item.split("/", 1)
+                step = int(step_text)
+            if item == "*":
+                start, end = low, high
+            elif "-" in item:
+                start, end = (int(value) for value in item.split("-", 1))
+            else:
+                start = end = int(item)
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Cron field out of range: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+    
+    def matches(self, moment: datetime) -> bool:
+        """Whether the schedule fires in the minute of `moment`"""
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day_matches = moment.day in self.days
+        weekday_matches = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_matches or weekday_matches
+        return day_matches and weekday_matches
+
+
+class Schedule:
+    """A background job queued whenever its cron expression matches"""
+    
+    def __init__(self, name: str, cron: str, job_type: str, payload: Optional[dict] = None, priority: int = 0):
+        self.name = name
+        self.cron = CronExpression(cron)
+        self.job_type = job_type
+        self.payload = payload or {}
+        self.priority = priority
+
+
+SCHEDULES = [
+    Schedule("alert-checks", "*/15 * * * *", "alerts.run_checks", priority=5),
+    Schedule("alert-delivery", "* * * * *", "alerts.deliver", priority=5),
+    Schedule("report-subscriptions", "0 * * * *", "reports.run_subscriptions"),
+    Schedule("report-job-cleanup", "30 * * * *", "reports.cleanup_jobs"),
+    Schedule("idempotency-key-purge", "40 * * * *", "maintenance.purge_idempotency_keys"),
+    Schedule("contact-counters", "5 0 * * *", "maintenance.refresh_contact_counters"),
+    Schedule("alert-inbox-counters", "10 0 * * *", "maintenance.rebuild_alert_inbox"),
+    Schedule("analytics-snapshot", "0 1 * * *", "analytics.export_snapshot"),
+    Schedule("expired-wizard-drafts", "15 3 * * *", "maintenance.expire_wizard_drafts"),
+    Schedule("progress-rollups", "30 3 * * *", "progress.recalculate_all"),
+    Schedule("purge-jobs", "45 4 * * *", "jobs.purge"),
+]
+
+
+class Scheduler:
+    """
+    Leader-elected scheduler loop
+    
+    The leader holds a session-level advisory lock on its own connection for as
+    long as it leads. If that connection drops, Postgres releases the lock and
+    another worker takes over on its next tick. A new leader only fires
+    schedules for minutes after it took over, so a handover never queues the
+    same minute twice (a minute that passes with no leader is skipped).
+    """
+    
+    def __init__(self, schedules: Optional[List[Schedule]] = None):
+        self.schedules = [
+            schedule for schedule in (schedules if schedules is not None else SCHEDULES)
+            if schedule.name not in settings.SCHEDULER_DISABLED_SCHEDULES
+        ]
+        self.stop_event = threading.Event()
+        self._connection = None
+        self._last_minute: Optional[datetime] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def is_leader(self) -> bool:
+        return self._connection is not None
+    
+    def _acquire_leadership(self) -> bool:
+        connection = engine.connect()
+        try:
+            acquired = connection.execute(
+                select(func.pg_try_advisory_lock(func.hashtext(LEADER_LOCK_NAME)))
+            ).scalar()
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+    
+        self._connection = connection
+        self._last_minute = datetime.utcnow().replace(second=0, microsecond=0)
+        logger.info("Scheduler leadership acquired")
+        return True
+    
+    def _release_leadership(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(select(func.pg_advisory_unlock(func.hashtext(LEADER_LOCK_NAME))))
+            self._connection.commit()
+        except Exception as e:
+            logger.warning(f"Could not release scheduler lock cleanly: {e}")
+        finally:
+            self._connection.close()
+            self._connection = None
+    
+    def _still_leader(self) -> bool:
+        """Check that the lock connection is alive (the lock dies with it)"""
+        try:
+            self._connection.execute(select(1))
+            self._connection.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"Scheduler lost its lock connection: {e}")
+            try:
+                self._connection.invalidate()
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+            return False
+    
+    def due_schedules(self, minute: datetime) -> List[Schedule]:
+        return [schedule for schedule in self.schedules if schedule.cron.matches(minute)]
+    
+    def tick(self, now: Optional[datetime] = None) -> int:
+        """Fire schedules for every minute since the last tick; returns jobs queued"""
+        if not self.is_leader:
+            if not self._acquire_leadership():
+                return 0
+        elif not self._still_leader():
+            return 0
+    
+        current_minute = (now or datetime.utcnow()).replace(second=0, microsecond=0)
+        queued = 0
+        minute = self._last_minute + timedelta(minutes=1)
+        while minute <= current_minute:
+            for schedule in self.due_schedules(minute):
+                queued += self._fire(schedule, minute)
+            self._last_minute = minute
+            minute += timedelta(minutes=1)
+        return queued
+    
+    def _fire(self, schedule: Schedule, minute: datetime) -> int:
+        db = SessionLocal()
+        try:
+            job_id = enqueue_job(
+                db,
+                schedule.job_type,
+                payload=schedule.payload,
+                priority=schedule.priority,
+                dedupe_key=f"schedule:{schedule.name}",
+            )
+            logger.info(
+                "Scheduled job queued",
+                extra={"schedule": schedule.name, "job_id": str(job_id), "minute": minute.isoformat()}
+            )
+            return 1
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Could not queue scheduled job {schedule.name}: {e}", exc_info=True)
+            return 0
+        finally:
+            db.close()
+    
+    def _run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}", exc_info=True)
+            self.stop_event.wait(settings.SCHEDULER_TICK_SECONDS)
+        self._release_leadership()
+    
+    def start(self) -> None:
+        self.stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,263 @@
+"""
+Signature Approval Service
+Approves or rejects signatures waiting for manager approval, one or many at a
+time, in a single transaction.
+
+Managers working the queue together claim disjoint batches of it: a claim is
+a lease on the signature (claimed_by_user_id, claim_expires_at) taken with
+SELECT ... FOR UPDATE SKIP LOCKED, so concurrent claims never wait for or
+overlap each other. While the lease is live only its holder can decide the
+signature; once it expires anyone can claim or decide it again.
+
+Rows are locked in one fixed order: owners, then signatures, then tasks, each
+sorted by primary key. That is the order the owner status endpoints take them
+in too, so managers working the queue at the same time wait for each other
+instead of deadlocking. Progress recalculation is queued with the decisions,
+once per affected unit, building and project.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import or_
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Tuple, Iterable
+from uuid import UUID
+import logging
+
+from app.core.config import settings
+from app.models.document import DocumentSignature
+from app.models.owner import Owner
+from app.models.task import Task
+from app.models.unit import Unit
+from app.models.building import Building
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+APPROVE = "APPROVE"
+REJECT = "REJECT"
+
+
+class SignatureDecisionError(ValueError):
+    """A signature that cannot be approved or rejected"""
+    
+    def __init__(self, message: str, not_found: bool = False, conflict: bool = False):
+        super().__init__(message)
+        self.not_found = not_found
+        self.conflict = conflict  # Claimed by someone else, or changed since the caller read it
+
+
+def claim_conflict(signature: DocumentSignature, user: User, now: Optional[datetime] = None) -> Optional[str]:
+    """Why the user may not decide the signature under its claim, or None if they may"""
+    now = now or datetime.utcnow()
+    if (
+        signature.claimed_by_user_id is not None
+        and signature.claimed_by_user_id != user.user_id
+        and signature.claim_expires_at is not None
+        and signature.claim_expires_at > now
+    ):
+        return f"Signature is claimed by another manager until {signature.claim_expires_at.isoformat()}"
+    return None
+
+
+def claim_signatures(
+    db: Session,
+    user: User,
+    limit: Optional[int] = None,
+    owner_id: Optional[UUID] = None
+) -> List[DocumentSignature]:
+    """
+    Claim up to `limit` signatures pending approval for the user and commit.
+    
+    The user's own live claims are renewed and returned first, then unclaimed
+    or expired ones, oldest signature first. Rows another manager is claiming
+    at this moment are skipped rather than waited for.
+    """
+    now = datetime.utcnow()
+    limit = limit or settings.APPROVAL_CLAIM_BATCH_SIZE
+    query = db.query(DocumentSignature).filter(
+        DocumentSignature.signature_status == "SIGNED_PENDING_APPROVAL",
+        or_(
+            DocumentSignature.claimed_by_user_id.is_(None),
+            DocumentSignature.claimed_by_user_id == user.user_id,
+            DocumentSignature.claim_expires_at.is_(None),
+            DocumentSignature.claim_expires_at <= now
+        )
+    )
+    if owner_id:
+        query = query.filter(DocumentSignature.owner_id == owner_id)
+    
+    signatures = query.order_by(
+        (DocumentSignature.claimed_by_user_id == user.user_id).desc().nulls_last(),
+        DocumentSignature.signed_at.asc().nulls_last(),
+        DocumentSignature.signature_id
+    ).limit(limit).with_for_update(skip_locked=True).all()
+    
+    lease_until = now + timedelta(seconds=settings.APPROVAL_CLAIM_LEASE_SECONDS)
+    for signature in signatures:
+        signature.claimed_by_user_id = user.user_id
+        signature.claim_expires_at = lease_until
+    db.commit()
+    
+    logger.info(
+        "Approval queue claimed",
+        extra={"user_id": str(user.user_id), "claimed": len(signatures), "lease_until": lease_until.isoformat()}
+    )
+    return signatures
+
+
+def release_claims(db: Session, user: User, signature_ids: Optional[Iterable[UUID]] = None) -> int:
+    """Release the user's claims (all of them, or the given signatures) and commit"""
+    query = db.query(DocumentSignature).filter(DocumentSignature.claimed_by_user_id == user.user_id)
+    if signature_ids is not None:
+        query = query.filter(DocumentSignature.signature_id.in_(list(signature_ids)))
+    released = query.update(
+        {DocumentSignature.claimed_by_user_id: None, DocumentSignature.claim_expires_at: None},
+        synchronize_session=False
+    )
+    db.commit()
+    return released
+
+
+def queue_recalculation(db: Session, unit_ids: set) -> int:
+    """Queue recalculation of the units' progress (uncommitted) and return the number of buildings affected"""
+    from app.services.majority import queue_progress_recalculation
+    
+    if not unit_ids:
+        return 0
+    rows = db.query(Unit.unit_id, Unit.building_id, Building.project_id).join(
+        Building, Building.building_id == Unit.building_id
+    ).filter(Unit.unit_id.in_(unit_ids)).all()
+    building_ids = {building_id for _, building_id, _ in rows}
+    queue_progress_recalculation(
+        db,
+        unit_ids=unit_ids,
+        building_ids=building_ids,
+        project_ids={project_id for _, _, project_id in rows}
+    )
+    return len(building_ids)
+
+
+def decide_signatures(
+    db: Session,
+    signature_ids: Iterable[UUID],
+    action: str,
+    user: User,
+    reason: Optional[str] = None,
+    expected_versions: Optional[Dict[UUID, int]] = None
+) -> Tuple[Dict[UUID, DocumentSignature], Dict[UUID, SignatureDecisionError], int]:
+    """
+    Approve (FINALIZED, owner SIGNED) or reject (back to WAIT_FOR_SIGN) the given
+    signatures, complete their approval tasks and commit.
+    
+    Signatures that cannot be decided are skipped; the rest commit together.
+    expected_versions (signature id -> version from the ETag) skips signatures
+    that changed since the caller read them.
+    
+    Returns: (decided signatures, errors by signature id, buildings queued for recalculation)
+    """
+    if action not in (APPROVE, REJECT):
+        raise ValueError(f"Unknown signature decision: {action}")
+    
+    signature_ids = sorted(set(signature_ids))
+    if not signature_ids:
+        return {}, {}, 0
+    
+    owner_ids = sorted({
+        owner_id for (owner_id,) in db.query(DocumentSignature.owner_id).filter(
+            DocumentSignature.signature_id.in_(signature_ids)
+        )
+    })
+    owners = {
+        owner.owner_id: owner
+        for owner in db.query(Owner).filter(
+            Owner.owner_id.in_(owner_ids)
+        ).order_by(Owner.owner_id).with_for_update()
+    } if owner_ids else {}
+    signatures = {
+        signature.signature_id: signature
+        for signature in db.query(DocumentSignature).filter(
+            DocumentSignature.signature_id.in_(signature_ids)
+        ).order_by(DocumentSignature.signature_id).with_for_update()
+    }
+    task_ids = sorted({signature.task_id for signature in signatures.values() if signature.task_id})
+    tasks = {
+        task.task_id: task
+        for task in db.query(Task).filter(
+            Task.task_id.in_(task_ids)
+        ).order_by(Task.task_id).with_for_update()
+    } if task_ids else {}
+    
+    now = datetime.utcnow()
+    decided = {}
+    errors = {}
+    unit_ids = set()
+    for signature_id in signature_ids:
+        signature = signatures.get(signature_id)
+        if not signature:
+            errors[signature_id] = SignatureDecisionError("Signature not found", not_found=True)
+            continue
+        if signature.signature_status != "SIGNED_PENDING_APPROVAL":
+            errors[signature_id] = SignatureDecisionError(
+                f"Signature is not pending approval. Current status: {signature.signature_status}"
+            )
+            continue
+        conflict = claim_conflict(signature, user, now)
+        if conflict:
+            errors[signature_id] = SignatureDecisionError(conflict, conflict=True)
+            continue
+        expected_version = (expected_versions or {}).get(signature_id)
+        if expected_version is not None and expected_version != signature.version:
+            errors[signature_id] = SignatureDecisionError(
+                f"Signature was modified by another request (now at version {signature.version})",
+                conflict=True
+            )
+            continue
+    
+        signature.claimed_by_user_id = None
+        signature.claim_expires_at = None
+        signature.version = signature.version + 1  # Rows are locked above, so plain increments are safe
+        if action == APPROVE:
+            signature.signature_status = "FINALIZED"
+            signature.approved_by_user_id = user.user_id
+            signature.approved_at = now
+            signature.approval_reason = reason if reason else None
+            owner_status = "SIGNED"
+            notes_label = "Approval Notes"
+        else:
+            signature.signature_status = "WAIT_FOR_SIGN"
+            signature.rejected_by_user_id = user.user_id
+            signature.rejected_at = now
+            signature.rejection_reason = reason
+            owner_status = "WAIT_FOR_SIGN"
+            notes_label = "Rejection Notes"
+    
+        # Mark linked task as completed if exists
+        task = tasks.get(signature.task_id)
+        if task:
+            task.status = "COMPLETED"
+            task.completed_at = now
+            if reason:
+                task.notes = (task.notes or "") + f"\n[{notes_label}]: {reason}"
+    
+        owner = owners.get(signature.owner_id)
+        if owner:
+            owner.owner_status = owner_status
+            owner.version = owner.version + 1
+            unit_ids.add(owner.unit_id)
+    
+        decided[signature_id] = signature
+    
+    buildings_recalculated = queue_recalculation(db, unit_ids)
+    db.commit()
+    
+    logger.info(
+        "Signature decisions applied",
+        extra={
+            "action": action,
+            "decided_by": str(user.user_id),
+            "requested": len(signature_ids),
+            "decided": len(decided),
+            "buildings_recalculated": buildings_recalculated,
+        }
+    )
+    
+    return decided, errors, buildings_recalculated
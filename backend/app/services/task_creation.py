@@ -1,28 +1,183 @@
 """
 Task Creation Service
 Creates approval tasks for managers/admins
+
+Approval (MANAGER_REVIEW) tasks go to the active manager/admin with the fewest
+open review tasks. With APPROVAL_TASKS_PREFER_PROJECT_MANAGER they go to the
+building's project manager instead, when that manager is active.
+rebalance_review_tasks spreads an existing backlog the same way.
 """
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update
+from app.core.config import settings
 from app.models.task import Task
 from app.models.user import User
 from app.models.building import Building
+from app.models.project import Project
 from app.models.owner import Owner
 from uuid import UUID
 from datetime import datetime, timedelta
+from typing import Optional, Dict, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+REVIEWER_ROLES = ("PROJECT_MANAGER", "SUPER_ADMIN")
+OPEN_TASK_STATUSES = ("NOT_STARTED", "IN_PROGRESS", "BLOCKED", "OVERDUE")
+MOVABLE_TASK_STATUSES = ("NOT_STARTED", "OVERDUE")  # Not yet picked up by their assignee
+
+
+def _open_review_counts():
+    """Open MANAGER_REVIEW tasks per assignee (one grouped count, as a subquery)"""
+    return select(
+        Task.assigned_to_agent_id.label("user_id"),
+        func.count(Task.task_id).label("open_tasks")
+    ).where(
+        Task.task_type == "MANAGER_REVIEW",
+        Task.status.in_(OPEN_TASK_STATUSES)
+    ).group_by(Task.assigned_to_agent_id).subquery()
+
+
+def _project_manager_for(building_id: UUID, db: Session) -> Optional[User]:
+    """The building's project manager, if they are an active reviewer"""
+    return db.query(User).join(
+        Project, Project.project_manager_id == User.user_id
+    ).join(
+        Building, Building.project_id == Project.project_id
+    ).filter(
+        Building.building_id == building_id,
+        User.role.in_(REVIEWER_ROLES),
+        User.is_active == True
+    ).first()
+
+
+def pick_review_manager(building_id: UUID, db: Session) -> User:
+    """
+    Choose the manager/admin for a new approval task: the project manager when
+    APPROVAL_TASKS_PREFER_PROJECT_MANAGER is set and they are active, otherwise
+    the reviewer with the fewest open review tasks (project managers before
+    admins on ties).
+    """
+    if settings.APPROVAL_TASKS_PREFER_PROJECT_MANAGER:
+        project_manager = _project_manager_for(building_id, db)
+        if project_manager:
+            return project_manager
+    
+    counts = _open_review_counts()
+    manager = db.query(User).outerjoin(
+        counts, counts.c.user_id == User.user_id
+    ).filter(
+        User.role.in_(REVIEWER_ROLES),
+        User.is_active == True
+    ).order_by(
+        func.coalesce(counts.c.open_tasks, 0),
+        (User.role == "PROJECT_MANAGER").desc(),
+        User.user_id
+    ).first()
+    
+    if not manager:
+        raise ValueError("No managers or admins found to assign task")
+    return manager
+
+
+def rebalance_review_tasks(db: Session, dry_run: bool = False) -> dict:
+    """
+    Redistribute open MANAGER_REVIEW tasks so every active reviewer carries a
+    similar load, then commit (unless dry_run).
+    
+    Only tasks nobody has started (NOT_STARTED, OVERDUE) move; tasks already in
+    progress count toward their assignee's load. With
+    APPROVAL_TASKS_PREFER_PROJECT_MANAGER, tasks of a project with an active
+    project manager go to that manager. The rest go, oldest due first, to
+    whoever currently has the fewest. Moves are written with one UPDATE per
+    receiving manager.
+    
+    Returns: {"tasks": open tasks, "moved": moved tasks, "load": {user_id: open tasks after}}
+    """
+    managers = {
+        user_id: role for user_id, role in db.query(User.user_id, User.role).filter(
+            User.role.in_(REVIEWER_ROLES),
+            User.is_active == True
+        )
+    }
+    if not managers:
+        raise ValueError("No managers or admins found to assign tasks")
+    
+    tasks = db.query(
+        Task.task_id, Task.assigned_to_agent_id, Task.status, Project.project_manager_id
+    ).outerjoin(
+        Building, Building.building_id == Task.building_id
+    ).outerjoin(
+        Project, Project.project_id == Building.project_id
+    ).filter(
+        Task.task_type == "MANAGER_REVIEW",
+        Task.status.in_(OPEN_TASK_STATUSES)
+    ).order_by(Task.due_date.asc().nulls_last(), Task.created_at, Task.task_id).all()
+    
+    load = {user_id: 0 for user_id in managers}
+    assignments: Dict[UUID, UUID] = {}
+    flexible = []
+    for task_id, assignee, task_status, project_manager_id in tasks:
+        if task_status not in MOVABLE_TASK_STATUSES:
+            # Already being worked on: stays with its assignee
+            assignments[task_id] = assignee
+            if assignee in load:
+                load[assignee] += 1
+        elif settings.APPROVAL_TASKS_PREFER_PROJECT_MANAGER and project_manager_id in managers:
+            assignments[task_id] = project_manager_id
+            load[project_manager_id] += 1
+        else:
+            flexible.append((task_id, assignee))
+    
+    def rank(user_id):
+        # Least-loaded first; project managers before admins on ties
+        return (load[user_id], managers[user_id] != "PROJECT_MANAGER", str(user_id))
+    
+    for task_id, assignee in flexible:
+        target = min(load, key=rank)
+        # Don't move a task just to swap it between equally loaded managers
+        if assignee in managers and load[assignee] == load[target]:
+            target = assignee
+        assignments[task_id] = target
+        load[target] += 1
+    
+    moves: Dict[UUID, List[UUID]] = {}
+    for task_id, assignee, _, _ in tasks:
+        if assignments[task_id] != assignee:
+            moves.setdefault(assignments[task_id], []).append(task_id)
+    moved = sum(len(task_ids) for task_ids in moves.values())
+    
+    if not dry_run:
+        now = datetime.utcnow()
+        for user_id, task_ids in moves.items():
+            db.execute(
+                update(Task).where(
+                    Task.task_id.in_(task_ids),
+                    Task.status.in_(MOVABLE_TASK_STATUSES)  # Skip tasks started meanwhile
+                ).values(assigned_to_agent_id=user_id, updated_at=now).execution_options(synchronize_session=False)
+            )
+        db.commit()
+    
+    logger.info(
+        "Review tasks rebalanced",
+        extra={"tasks": len(tasks), "moved": moved, "managers": len(managers), "dry_run": dry_run}
+    )
+    return {"tasks": len(tasks), "moved": moved, "load": {str(user_id): count for user_id, count in load.items()}}
+
 
 def create_signature_approval_task(
     owner_id: UUID,
     building_id: UUID,
     requested_by_agent_id: UUID,
-    db: Session
+    db: Session,
+    commit: bool = True
 ) -> Task:
     """
     Create an approval task for managers/admins to approve owner signature.
     
+    With commit=False the task is only flushed, so it commits (or rolls back)
+    with the caller's transaction.
+    
     Returns the created task.
     """
     # Get owner and building info for task description
@@ -37,17 +192,8 @@ def create_signature_approval_task(
     unit = db.query(Unit).filter(Unit.unit_id == owner.unit_id).first()
     unit_number = unit.unit_number if unit else 'N/A'
     
-    # Get all managers and admins
-    managers = db.query(User).filter(
-        User.role.in_(["PROJECT_MANAGER", "SUPER_ADMIN"]),
-        User.is_active == True
-    ).all()
-    
-    if not managers:
-        raise ValueError("No managers or admins found to assign task")
-    
-    # For now, assign to first manager/admin (could be enhanced to assign to all or distribute)
-    assigned_manager = managers[0]
+    # Project manager or least-loaded manager/admin
+    assigned_manager = pick_review_manager(building_id, db)
     
     # Create task
     task = Task(
@@ -64,8 +210,11 @@ def create_signature_approval_task(
     )
     
     db.add(task)
-    db.commit()
-    db.refresh(task)
+    if commit:
+        db.commit()
+        db.refresh(task)
+    else:
+        db.flush()
     
     logger.info(
         "Signature approval task created",
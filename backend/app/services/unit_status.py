@@ -3,6 +3,9 @@ Unit Status Calculation Service
 Calculates unit status based on owner signatures: SIGNED, PARTIALLY_SIGNED, or NOT_SIGNED
 """
 from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import Iterable, Dict
+from uuid import UUID
 from app.models.unit import Unit
 from app.models.owner import Owner
 import logging
@@ -134,3 +137,47 @@ def update_unit_status(unit_id: str, db: Session) -> str:
     
     return new_status
 
+
+def update_unit_statuses(unit_ids: Iterable[str], db: Session) -> Dict[str, str]:
+    """
+    Batch form of update_unit_status for many units: one query for the units
+    and one grouped count of their owners. Does not commit (caller commits).
+    Returns the calculated status per unit_id.
+    """
+    unit_ids = [UUID(str(unit_id)) for unit_id in unit_ids]
+    if not unit_ids:
+        return {}
+    
+    units = db.query(Unit).filter(Unit.unit_id.in_(unit_ids)).all()
+    counts = {
+        unit_id: (total, signed)
+        for unit_id, total, signed in db.query(
+            Owner.unit_id,
+            func.count(),
+            func.count().filter(Owner.owner_status == 'SIGNED')
+        ).filter(
+            Owner.unit_id.in_(unit_ids),
+            Owner.is_deleted == False,
+            Owner.is_current_owner == True
+        ).group_by(Owner.unit_id)
+    }
+    
+    statuses = {}
+    for unit in units:
+        unit.total_owners, unit.owners_signed = counts.get(unit.unit_id, (0, 0))
+        
+        if not unit.total_owners:
+            new_status = 'NOT_CONTACTED'
+        elif unit.owners_signed == unit.total_owners:
+            new_status = 'SIGNED'
+        elif unit.owners_signed > 0:
+            new_status = 'PARTIALLY_SIGNED'
+        else:
+            new_status = 'NOT_CONTACTED'
+        
+        # Same rule as update_unit_status: keep workflow statuses unless all owners signed
+        if new_status == 'SIGNED' or unit.unit_status in ['NOT_CONTACTED', 'SIGNED', 'PARTIALLY_SIGNED']:
+            unit.unit_status = new_status
+        statuses[str(unit.unit_id)] = new_status
+    
+    return statuses
@@ -0,0 +1,93 @@
+"""
+Benchmark concurrent report PDF rendering with different process pool sizes
+
+Renders the same synthetic building progress report many times concurrently,
+first in-thread (REPORT_PDF_WORKERS=0) and then through pools of 1..N workers,
+and prints reports/second for each. No database is needed.
+
+Usage: python scripts/benchmark_pdf_rendering.py [--reports 16] [--rows 300] [--max-workers N]
+"""
+import sys
+import os
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.services import report_pdf
+
+
+def sample_rows(rows: int) -> list:
+    return [
+        {
+            "building_name": f"Building {i}",
+            "project_name": f"Project {i % 7}",
+            "address": f"{i} Herzl St, Tel Aviv",
+            "total_units": 24,
+            "signature_percentage": (i * 37) % 100 + 0.5,
+            "traffic_light_status": ("GREEN", "YELLOW", "RED")[i % 3],
+        }
+        for i in range(rows)
+    ]
+
+
+def run(workers: int, reports: int, rows_path: str, summary: dict, output_dir: str) -> float:
+    """Render `reports` PDFs concurrently and return reports per second"""
+    settings.REPORT_PDF_WORKERS = workers
+    report_pdf.shutdown_pdf_workers()
+    header = {"title": "Building Progress Report", "generated_at": "benchmark", "generated_by": "benchmark"}
+    
+    def render(index: int) -> int:
+        output_path = os.path.join(output_dir, f"report_{index}.pdf")
+        return report_pdf.render_pdf("building_progress", header, summary, rows_path, output_path)
+    
+    # Warm up (spawns workers and builds their styles outside the timed section)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as warmup:
+        list(warmup.map(render, range(max(workers, 1))))
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=reports) as clients:
+        sizes = list(clients.map(render, range(reports)))
+    elapsed = time.perf_counter() - start
+    
+    assert all(size > 0 for size in sizes)
+    return reports / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    
+    rows = sample_rows(args.rows)
+    summary = {
+        "total_buildings": len(rows),
+        "avg_signature_percentage": sum(row["signature_percentage"] for row in rows) / len(rows),
+    }
+    settings.REPORT_PDF_MAX_QUEUED = args.reports
+    
+    with tempfile.TemporaryDirectory() as output_dir:
+        rows_path = os.path.join(output_dir, "rows.bin")
+        report_pdf.write_rows_file(rows, rows_path)
+        
+        print(f"Rendering {args.reports} concurrent reports of {args.rows} rows ({os.cpu_count()} CPUs)")
+        baseline = run(0, args.reports, rows_path, summary, output_dir)
+        print(f"  in-thread      {baseline:7.2f} reports/s")
+        
+        workers = 1
+        while workers <= args.max_workers:
+            throughput = run(workers, args.reports, rows_path, summary, output_dir)
+            print(f"  {workers:2d} worker(s)   {throughput:7.2f} reports/s  ({throughput / baseline:.2f}x)")
+            workers *= 2
+    
+    report_pdf.shutdown_pdf_workers()
+    print("✓ Benchmark complete")
+
+
+if __name__ == "__main__":
+    main()
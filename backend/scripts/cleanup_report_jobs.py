@@ -0,0 +1,23 @@
+"""
+Remove expired report job artifacts from the storage directory
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.database import SessionLocal
+from app.services.report_jobs import cleanup_expired_report_jobs
+
+
+def main():
+    db = SessionLocal()
+    try:
+        expired = cleanup_expired_report_jobs(db)
+        print(f"✓ Expired {expired} report jobs")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Export the operational tables to the Parquet analytics snapshot
+
+Meant to run nightly (e.g. from cron); only partitions that changed since the
+previous export are rewritten unless --full is given.
+
+Usage: python scripts/export_analytics_snapshot.py [--full] [--tables interactions signatures ...]
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.database import ReportSessionLocal
+from app.services.analytics_snapshot import SNAPSHOT_TABLES, export_analytics_snapshot, snapshot_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Parquet analytics snapshot")
+    parser.add_argument("--full", action="store_true", help="Rewrite every partition")
+    parser.add_argument("--tables", nargs="+", choices=list(SNAPSHOT_TABLES), help="Tables to export (default: all)")
+    args = parser.parse_args()
+    
+    db = ReportSessionLocal()
+    try:
+        summary = export_analytics_snapshot(db, args.tables, args.full)
+        for table_name, result in summary.items():
+            print(
+                f"✓ {table_name}: {result['rows']} rows, {result['written']} partitions written, "
+                f"{result['unchanged']} unchanged, {result['removed']} removed"
+            )
+        print(f"✓ Snapshot written to {snapshot_dir()}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
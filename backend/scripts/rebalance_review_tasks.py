@@ -0,0 +1,34 @@
+"""
+Spread open signature approval (MANAGER_REVIEW) tasks evenly across active
+managers/admins, honoring APPROVAL_TASKS_PREFER_PROJECT_MANAGER
+
+Usage: python scripts/rebalance_review_tasks.py [--dry-run]
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.database import SessionLocal
+from app.services.task_creation import rebalance_review_tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true", help="Show the resulting load without moving any task")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        result = rebalance_review_tasks(db, dry_run=args.dry_run)
+        verb = "Would move" if args.dry_run else "Moved"
+        print(f"✓ {verb} {result['moved']} of {result['tasks']} open review tasks")
+        for user_id, count in sorted(result["load"].items(), key=lambda item: -item[1]):
+            print(f"  {user_id}: {count}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
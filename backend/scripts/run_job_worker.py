@@ -0,0 +1,61 @@
+"""
+Run a background job worker
+
+Polls the given queues of the background_jobs table and runs jobs until
+interrupted (SIGINT/SIGTERM), letting running jobs finish first. Start as many
+workers as needed; per-queue concurrency limits hold across all of them.
+Every worker also runs the periodic scheduler, which only the elected leader
+acts on (disable with --no-scheduler or SCHEDULER_ENABLED=false).
+
+Usage: python scripts/run_job_worker.py [--queues default,alerts,recalculations,reports] [--no-scheduler]
+"""
+import sys
+import os
+import argparse
+import signal
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import settings
+from app.core.logging import setup_logging
+from app.services.job_queue import JobWorker
+from app.services.scheduler import Scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--queues",
+        default=",".join(settings.JOB_QUEUE_CONCURRENCY),
+        help="Comma-separated queues to poll (default: all configured queues)"
+    )
+    parser.add_argument("--no-scheduler", action="store_true", help="Don't take part in scheduler leader election")
+    args = parser.parse_args()
+    
+    setup_logging()
+    queues = [queue.strip() for queue in args.queues.split(",") if queue.strip()]
+    worker = JobWorker(queues)
+    scheduler = Scheduler() if settings.SCHEDULER_ENABLED and not args.no_scheduler else None
+    stop = threading.Event()
+    
+    def handle_signal(signum, frame):
+        print("Stopping worker, waiting for running jobs...")
+        stop.set()
+    
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+    
+    worker.start()
+    if scheduler:
+        scheduler.start()
+    print(f"✓ Job worker {worker.worker_id} polling: {', '.join(queues)}")
+    stop.wait()
+    if scheduler:
+        scheduler.stop()
+    worker.stop()
+    print("✓ Job worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Render and deliver due report subscriptions
+
+The job worker's scheduler already does this hourly in the off-peak window;
+use this script when the scheduler is disabled, or with --force to run outside it.
+
+Usage: python scripts/run_report_subscriptions.py [--force]
+"""
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.report_subscriptions import run_due_subscriptions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--force", action="store_true", help="Run even outside the off-peak window")
+    args = parser.parse_args()
+    
+    summary = run_due_subscriptions(force=args.force)
+    print(
+        f"✓ Rendered {summary['completed']} of {summary['subscriptions']} due subscriptions "
+        f"from {summary['data_fetches']} data fetches ({summary['failed']} failed)"
+    )
+
+
+if __name__ == "__main__":
+    main()
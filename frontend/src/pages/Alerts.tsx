@@ -113,6 +113,7 @@ export default function Alerts() {
       PENDING_APPROVAL: '✍️',
       OWNERSHIP_TRANSFER: '🔄',
       SYSTEM_ERROR: '❌',
+      REPORT_READY: '📄',
     };
     return icons[type] || '🔔';
   };
@@ -188,6 +189,7 @@ export default function Alerts() {
               <option value="PENDING_APPROVAL">Pending Approval</option>
               <option value="OWNERSHIP_TRANSFER">Ownership Transfer</option>
               <option value="SYSTEM_ERROR">System Error</option>
+              <option value="REPORT_READY">Report Ready</option>
             </select>
           </div>
 